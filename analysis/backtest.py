@@ -0,0 +1,169 @@
+import itertools
+import numpy as np
+import pandas as pd
+from core.indicators import ema, mid_prices
+
+exit_reasons = np.array(['REVERSAL', 'TAKE PROFIT', 'STOP LOSS'])
+REVERSAL, TAKE_PROFIT, STOP_LOSS = 0, 1, 2
+
+
+def crossings(fast, slow):
+    # oanda.trade.ema_crossings as an array: one signal per row after the first
+    fast = np.asarray(fast, dtype='float64')
+    slow = np.asarray(slow, dtype='float64')
+    up = (fast[:-1] < slow[:-1]) & (fast[1:] > slow[1:])
+    down = (fast[:-1] > slow[:-1]) & (fast[1:] < slow[1:])
+    return up.astype(np.int8) - down.astype(np.int8)
+
+
+def segments(signals):
+    # calc_chunks: a trade runs from one crossing up to the next crossing of the
+    # other direction and trades in the direction of the first one
+    positions = np.flatnonzero(signals)
+    directions = np.asarray(signals)[positions]
+    reversals = directions[1:] != directions[:-1]
+    return positions[:-1][reversals], positions[1:][reversals], directions[:-1][reversals].astype(np.int64)
+
+
+def segment_rows(entries, exits):
+    # every row of every trade, plus where each trade starts in that list
+    lengths = exits - entries
+    starts = np.cumsum(lengths) - lengths
+    rows = np.arange(lengths.sum()) - np.repeat(starts - entries, lengths)
+    return rows, starts, lengths
+
+
+def first_hits(hits, starts, lengths):
+    # position of the first True of every trade in the flat row list, -1 if none
+    if len(hits) == 0:
+        return np.full(len(starts), -1)
+    positions = np.where(hits, np.arange(len(hits)), len(hits))
+    first = np.minimum.reduceat(positions, starts)
+    return np.where(first < starts + lengths, first, -1)
+
+
+class Backtest:
+    def __init__(self, data, volume=2000, use_extremes=False):
+        # use_extremes also checks TP/SL against the candle highs and lows,
+        # otherwise only against closes like oanda.trade.Trade
+        self.data = data
+        self.volume = volume
+        self.use_extremes = use_extremes
+        self.prices = {name: data[name].to_numpy(dtype='float64')
+                       for name in ('ask_close', 'bid_close', 'ask_high', 'bid_high', 'ask_low', 'bid_low')}
+
+    def prepare(self, signals):
+        entries, exits, types = segments(signals)
+        rows, starts, lengths = segment_rows(entries, exits)
+        prices = self.prices
+        buy = types == 1
+        open_price = np.where(buy, prices['ask_close'][entries], prices['bid_close'][entries])
+        buy_rows = np.repeat(buy, lengths)
+        open_rows = np.repeat(open_price, lengths)
+        if self.use_extremes:
+            favourable = np.where(buy_rows, prices['bid_high'][rows], prices['ask_low'][rows])
+            adverse = np.where(buy_rows, prices['bid_low'][rows], prices['ask_high'][rows])
+        else:
+            favourable = np.where(buy_rows, prices['bid_close'][rows], prices['ask_close'][rows])
+            adverse = favourable
+        return {
+            'entries': entries, 'exits': exits, 'types': types, 'buy': buy,
+            'rows': rows, 'starts': starts, 'lengths': lengths,
+            'open_price': open_price, 'buy_rows': buy_rows, 'open_rows': open_rows,
+            'favourable': favourable, 'adverse': adverse,
+        }
+
+    def outcomes(self, trades, tp, sl):
+        buy_rows = trades['buy_rows']
+        open_rows = trades['open_rows']
+        hits_tp = np.where(buy_rows, trades['favourable'] > open_rows + tp, trades['favourable'] < open_rows - tp)
+        hits_sl = np.where(buy_rows, trades['adverse'] < open_rows - sl, trades['adverse'] > open_rows + sl)
+        first_tp = first_hits(hits_tp, trades['starts'], trades['lengths'])
+        first_sl = first_hits(hits_sl, trades['starts'], trades['lengths'])
+
+        entries, exits, types = trades['entries'], trades['exits'], trades['types']
+        ask_close, bid_close = self.prices['ask_close'], self.prices['bid_close']
+        close_price = np.where(trades['buy'], ask_close[exits - 1], bid_close[exits - 1])
+        diff = ((close_price - trades['open_price']) * types) * self.volume
+        initial_spread = ask_close[entries] - bid_close[entries]
+
+        # a candle whose high and low hit both levels counts as a stop loss
+        take_profit = (first_tp >= 0) & ((first_sl < 0) | (first_tp < first_sl))
+        stop_loss = (first_sl >= 0) & ~take_profit
+        reason = np.where(take_profit, TAKE_PROFIT, np.where(stop_loss, STOP_LOSS, REVERSAL))
+        # as in Trade, the spread of a reversal is not scaled by the volume
+        realized = np.where(take_profit, (tp - initial_spread) * self.volume,
+                            np.where(stop_loss, ((sl + initial_spread) * self.volume) * -1,
+                                     diff - initial_spread))
+        rows = trades['rows']
+        return {
+            'close_price': close_price, 'diff': diff, 'initial_spread': initial_spread,
+            'hit_tp_pos': np.where(first_tp >= 0, rows[first_tp], -1),
+            'hit_sl_pos': np.where(first_sl >= 0, rows[first_sl], -1),
+            'reason': reason, 'realized': realized,
+        }
+
+    def run(self, signals, tp=0.0009, sl=0.0003):
+        # signals[i] belongs to row i, as calc_chunks reads them
+        trades = self.prepare(signals)
+        outcome = self.outcomes(trades, tp, sl)
+        entries, exits, buy, starts = trades['entries'], trades['exits'], trades['buy'], trades['starts']
+        ask_rows = self.prices['ask_close'][trades['rows']]
+        bid_rows = self.prices['bid_close'][trades['rows']]
+        if len(starts):
+            best = np.where(buy, np.maximum.reduceat(bid_rows, starts), np.minimum.reduceat(ask_rows, starts))
+            worst = np.where(buy, np.minimum.reduceat(bid_rows, starts), np.maximum.reduceat(ask_rows, starts))
+        else:
+            best = worst = np.zeros(0)
+        index = self.data.index
+        return pd.DataFrame({
+            'entry': entries,
+            'exit': exits,
+            'entry_time': index[entries],
+            'exit_time': index[exits - 1],
+            'trade_type': trades['types'],
+            'open_price': trades['open_price'],
+            'close_price': outcome['close_price'],
+            'diff': outcome['diff'],
+            'initial_spread': outcome['initial_spread'],
+            'best_diff': np.abs(trades['open_price'] - best),
+            'worst_diff': np.abs(trades['open_price'] - worst),
+            'hit_tp_pos': outcome['hit_tp_pos'],
+            'hit_sl_pos': outcome['hit_sl_pos'],
+            'exit_reason': pd.Categorical.from_codes(outcome['reason'], exit_reasons),
+            'realized': outcome['realized'],
+        })
+
+    def ema_signals(self, fast, slow):
+        close = mid_prices(self.prices)[2]
+        return crossings(ema(close, fast), ema(close, slow))
+
+
+def summarize(realized, reason):
+    return {
+        'trades': len(realized),
+        'take_profits': int((reason == TAKE_PROFIT).sum()),
+        'stop_losses': int((reason == STOP_LOSS).sum()),
+        'wins': int((realized > 0).sum()),
+        'realized': float(realized.sum()),
+    }
+
+
+def sweep(days, tps=(0.0009,), sls=(0.0003,), spans=((13, 35),), volume=2000, use_extremes=False):
+    # every (fast, slow) span, tp and sl combination over one or more trading days;
+    # trades never cross from one day into the next
+    if isinstance(days, pd.DataFrame):
+        days = [days]
+    backtests = [Backtest(day, volume, use_extremes) for day in days]
+    results = []
+    for fast, slow in spans:
+        prepared = [(backtest, backtest.prepare(backtest.ema_signals(fast, slow))) for backtest in backtests]
+        for tp, sl in itertools.product(tps, sls):
+            outcomes = [backtest.outcomes(trades, tp, sl) for backtest, trades in prepared]
+            realized = np.concatenate([outcome['realized'] for outcome in outcomes])
+            reason = np.concatenate([outcome['reason'] for outcome in outcomes])
+            results.append(dict(fast=fast, slow=slow, tp=tp, sl=sl, **summarize(realized, reason)))
+    results = pd.DataFrame(results, columns=['fast', 'slow', 'tp', 'sl', 'trades', 'take_profits',
+                                             'stop_losses', 'wins', 'realized'])
+    results['mean_realized'] = results['realized'] / results['trades'].where(results['trades'] > 0)
+    return results
@@ -0,0 +1,225 @@
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing as mp
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from oanda.episode_store import MappedDays, save_days
+from . backtest import Backtest, summarize
+
+
+def grid(**values):
+    return [dict(zip(values, combination)) for combination in itertools.product(*values.values())]
+
+
+def random_search(space, count, seed=0):
+    # lists are sampled from, (low, high) tuples drawn uniformly, as integers when both ends are
+    rng = np.random.default_rng(seed)
+    trials = []
+    for _ in range(count):
+        trial = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                low, high = values
+                if isinstance(low, int) and isinstance(high, int):
+                    trial[name] = int(rng.integers(low, high + 1))
+                else:
+                    trial[name] = float(rng.uniform(low, high))
+            else:
+                trial[name] = values[rng.integers(len(values))]
+        trials.append(trial)
+    return trials
+
+
+def trial_id(params):
+    encoded = json.dumps(params, sort_keys=True, default=float).encode()
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+
+def file_digest(path, chunk=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(chunk), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def function_name(function):
+    return '%s.%s' % (function.__module__, getattr(function, '__qualname__', repr(function)))
+
+
+def backtest_trial(days, params):
+    outcomes = []
+    for day in days:
+        backtest = Backtest(day, use_extremes=params.get('use_extremes', False))
+        trades = backtest.prepare(backtest.ema_signals(params['fast'], params['slow']))
+        outcomes.append(backtest.outcomes(trades, params['tp'], params['sl']))
+    realized = np.concatenate([outcome['realized'] for outcome in outcomes])
+    reason = np.concatenate([outcome['reason'] for outcome in outcomes])
+    return summarize(realized, reason)
+
+
+# set once per worker process by start_worker
+worker_days = None
+worker_evaluate = None
+
+
+def start_worker(path, evaluate):
+    # every worker maps the same file, the prices are shared read-only through the page cache
+    global worker_days, worker_evaluate
+    worker_days = MappedDays(path)
+    worker_evaluate = evaluate
+
+
+def run_trial(params):
+    started = time.perf_counter()
+    result = worker_evaluate(worker_days, params)
+    return params, result, time.perf_counter() - started
+
+
+class SweepRunner:
+    def __init__(self, episodes, directory, evaluate=backtest_trial, processes=None,
+                 flush_every=64, start_method=None):
+        # episodes is an episode file or a list of trading days, which get saved next to the results;
+        # evaluate(days, params) returns a dict of metrics and must be importable by the workers
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.evaluate = evaluate
+        if isinstance(episodes, str):
+            self.check_sweep(episodes)
+        else:
+            # staged first, a refused resume leaves the directory's days alone
+            path = os.path.join(directory, 'days.bin')
+            save_days(episodes, path + '.new')
+            try:
+                self.check_sweep(path + '.new')
+            except ValueError:
+                os.unlink(path + '.new')
+                raise
+            os.replace(path + '.new', path)
+            episodes = path
+        self.episodes = episodes
+        self.processes = os.cpu_count() if processes is None else processes
+        self.flush_every = flush_every
+        self.start_method = start_method
+
+    def check_sweep(self, episodes):
+        # trial ids only cover the parameters, so a directory is bound to the episodes and
+        # the evaluate function it was first swept with
+        sweep = {'episodes': file_digest(episodes), 'evaluate': function_name(self.evaluate)}
+        path = os.path.join(self.directory, 'sweep.json')
+        if os.path.exists(path):
+            with open(path) as source:
+                stored = json.load(source)
+            for name in ('episodes', 'evaluate'):
+                if stored.get(name) != sweep[name]:
+                    raise ValueError('%s holds results for other %s (%s), use a new directory'
+                                     % (self.directory, name, stored.get(name)))
+        else:
+            with open(path, 'w') as out:
+                json.dump(sweep, out)
+
+    def parts(self):
+        return sorted(os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                      if name.startswith('part-') and name.endswith('.parquet'))
+
+    def results(self):
+        parts = self.parts()
+        if not parts:
+            return pd.DataFrame(columns=['trial_id'])
+        return pd.concat([pq.read_table(part).to_pandas() for part in parts], ignore_index=True)
+
+    def completed(self):
+        parts = self.parts()
+        if not parts:
+            return set()
+        return set(pq.read_table(parts, columns=['trial_id']).column('trial_id').to_pylist())
+
+    def write_part(self, rows):
+        # one new file per flush, an interrupted run loses at most the unflushed rows
+        path = os.path.join(self.directory, 'part-%05d.parquet' % len(self.parts()))
+        table = pa.Table.from_pandas(pd.DataFrame(rows), preserve_index=False)
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(handle)
+        try:
+            pq.write_table(table, temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def pending(self, trials):
+        done = self.completed()
+        pending = {}
+        for params in trials:
+            key = trial_id(params)
+            if key not in done:
+                pending.setdefault(key, params)
+        return pending
+
+    def run(self, trials):
+        pending = self.pending(trials)
+        rows = []
+
+        def record(params, result, seconds):
+            rows.append(dict(trial_id=trial_id(params), **params, **result, seconds=seconds))
+            if len(rows) >= self.flush_every:
+                self.write_part(rows)
+                del rows[:]
+
+        try:
+            if self.processes == 0:
+                start_worker(self.episodes, self.evaluate)
+                for params in pending.values():
+                    record(*run_trial(params))
+            elif pending:
+                context = mp.get_context(self.start_method)
+                chunksize = max(1, len(pending) // (self.processes * 8))
+                with context.Pool(self.processes, initializer=start_worker,
+                                  initargs=(self.episodes, self.evaluate)) as pool:
+                    for outcome in pool.imap_unordered(run_trial, pending.values(), chunksize):
+                        record(*outcome)
+        finally:
+            if rows:
+                self.write_part(rows)
+        return self.results()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='backtest parameter sweep')
+    parser.add_argument('episodes', help='episode file written by oanda.episode_store')
+    parser.add_argument('results', help='directory for the results, rerun to resume')
+    parser.add_argument('--fast', type=int, nargs='+', default=[13])
+    parser.add_argument('--slow', type=int, nargs='+', default=[35])
+    parser.add_argument('--tp', type=float, nargs='+', default=[0.0009])
+    parser.add_argument('--sl', type=float, nargs='+', default=[0.0003])
+    parser.add_argument('--use-extremes', action='store_true')
+    parser.add_argument('--random', type=int, default=0,
+                        help='draw this many trials between the smallest and largest values instead of the grid')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.random:
+        space = {name: (min(values), max(values)) for name, values in
+                 (('fast', args.fast), ('slow', args.slow), ('tp', args.tp), ('sl', args.sl))}
+        trials = random_search(space, args.random, args.seed)
+    else:
+        trials = grid(fast=args.fast, slow=args.slow, tp=args.tp, sl=args.sl)
+    for trial in trials:
+        trial['use_extremes'] = args.use_extremes
+
+    runner = SweepRunner(args.episodes, args.results, processes=args.processes)
+    results = runner.run(trials)
+    print(results.sort_values('realized', ascending=False).head(20).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+import timeit
+import numpy as np
+from oanda.oanda_env import Account, quote_signals
+
+
+def session(count, seed=0):
+    rng = np.random.default_rng(seed)
+    bid_close = 1.2 + np.cumsum(rng.normal(0, 0.0003, count))
+    wick = np.abs(rng.normal(0, 0.0003, (2, count)))
+    rows = np.column_stack([bid_close + 0.0001, bid_close, bid_close + wick[0] + 0.0001, bid_close + wick[0],
+                            bid_close - wick[1] + 0.0001, bid_close - wick[1]])
+    actions = rng.choice([0, 0, 0, 1, -1], count)
+    return rows, actions
+
+
+def run(count=20000, accounts=256, repeat=3):
+    rows, actions = session(count)
+    markets = [dict(zip(quote_signals, row)) for row in rows.tolist()]
+
+    def accounts_loop():
+        account = Account(1000, 20)
+        for market, action in zip(markets, actions.tolist()):
+            if action == 0:
+                account.update(market)
+            else:
+                account.place_order(market, action)
+
+    seconds = min(timeit.repeat(accounts_loop, number=1, repeat=repeat))
+    print('Account:          %8.2f us/step' % (seconds / count * 1e6))
+
+    try:
+        from oanda.ledger import Ledger
+    except ImportError:
+        return
+    quotes = np.repeat(rows[:, None, :], accounts, axis=1)
+    batched = np.random.default_rng(1).choice([0, 0, 0, 1, -1], (count, accounts))
+
+    def ledger_loop():
+        ledger = Ledger(accounts)
+        for step in range(count // 10):
+            ledger.step(batched[step], quotes[step])
+
+    seconds = min(timeit.repeat(ledger_loop, number=1, repeat=repeat))
+    print('Ledger of %d:    %8.3f us/account step' % (accounts, seconds / (count // 10) / accounts * 1e6))
+
+
+if __name__ == '__main__':
+    run()
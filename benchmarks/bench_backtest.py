@@ -0,0 +1,41 @@
+import timeit
+import numpy as np
+import pandas as pd
+from analysis.backtest import Backtest, sweep
+from core.indicators import ema, mid_prices
+from oanda.synthetic import make_day
+from oanda.trade import calc_chunks, ema_crossings
+
+
+def run(rows=20000, repeat=3):
+    day = make_day(rows, seed=1)
+    close = mid_prices(day)[2].to_numpy()
+    emas = pd.DataFrame({'ema_fast': ema(close, 13), 'ema_slow': ema(close, 35)}, index=day.index)
+
+    def legacy():
+        signals = ema_crossings(emas)
+        return calc_chunks(day.iloc[:len(signals)], signals, 0)
+
+    def vectorized():
+        backtest = Backtest(day)
+        return backtest.run(backtest.ema_signals(13, 35))
+
+    trades = len(vectorized())
+    assert trades == len(legacy())
+    loop = min(timeit.repeat(legacy, number=1, repeat=1))
+    fast = min(timeit.repeat(vectorized, number=1, repeat=repeat))
+    print('%d candles, %d trades' % (rows, trades))
+    print('  ema_crossings + calc_chunks: %8.3f s' % loop)
+    print('  Backtest:                    %8.3f s  (%.0fx)' % (fast, loop / fast))
+
+    tps = np.linspace(0.0003, 0.0015, 5)
+    sls = np.linspace(0.0002, 0.0010, 5)
+    spans = [(5, 13), (8, 21), (13, 35), (21, 55)]
+    seconds = min(timeit.repeat(lambda: sweep(day, tps, sls, spans), number=1, repeat=repeat))
+    combinations = len(tps) * len(sls) * len(spans)
+    print('  sweep of %d combinations:    %8.3f s  (%.1f ms each)' % (combinations, seconds,
+                                                                    seconds / combinations * 1e3))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,35 @@
+import timeit
+import arrow as time
+import pandas as pd
+from oanda.oanda_candles_api import decode_candles
+from oanda.synthetic import make_candles
+
+
+def legacy_decode(values, time_format='YYYY-MM-DDTHH:mm:ss.SSSSSSSSZ'):
+    signals = [
+        pd.Series([int(time.get(candle['time'], time_format).format('HHmmss'))
+                   for candle in values]).rename('time_of_day')
+    ]
+    for side, field, name in [('ask', 'o', 'ask_open'), ('bid', 'o', 'bid_open'),
+                              ('ask', 'c', 'ask_close'), ('bid', 'c', 'bid_close'),
+                              ('ask', 'h', 'ask_high'), ('bid', 'h', 'bid_high'),
+                              ('ask', 'l', 'ask_low'), ('bid', 'l', 'bid_low')]:
+        signals.append(pd.Series([float(candle[side][field])
+                                  for candle in values]).rename(name))
+    return pd.concat(signals, axis=1).set_index('time_of_day')
+
+
+def run(count=17280, repeat=3):
+    candles = make_candles(count, seconds=5)
+    pd.testing.assert_frame_equal(legacy_decode(candles), decode_candles(candles))
+
+    legacy = min(timeit.repeat(lambda: legacy_decode(candles), number=1, repeat=repeat))
+    vectorized = min(timeit.repeat(lambda: decode_candles(candles), number=1, repeat=repeat))
+    print('candles per day:  %d' % count)
+    print('legacy decode:    %.4fs' % legacy)
+    print('vectorized:       %.4fs' % vectorized)
+    print('speedup:          %.1fx' % (legacy / vectorized))
+
+
+if __name__ == '__main__':
+    run()
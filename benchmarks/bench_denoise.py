@@ -0,0 +1,28 @@
+import timeit
+import numpy as np
+from core.dataprep import Denoiser
+
+
+def per_signal(denoiser, windows):
+    return np.stack([
+        np.column_stack([denoiser.denoise(window[:, j]) for j in range(window.shape[1])])
+        for window in windows
+    ])
+
+
+def run(count=2000, signals=8, repeat=3):
+    denoiser = Denoiser()
+    rng = np.random.default_rng(0)
+    for length in (33, 65, 129):
+        windows = rng.normal(size=(count, length, signals)).cumsum(axis=1)
+        np.testing.assert_array_equal(per_signal(denoiser, windows[:50]),
+                                      denoiser.denoise_array(windows[:50], axis=1))
+        loop = min(timeit.repeat(lambda: per_signal(denoiser, windows), number=1, repeat=repeat))
+        batched = min(timeit.repeat(lambda: denoiser.denoise_array(windows, axis=1), number=1, repeat=repeat))
+        print('window %3d x %d signals' % (length, signals))
+        print('  per signal: %10.0f windows/s' % (count / loop))
+        print('  batched:    %10.0f windows/s  (%.1fx)' % (count / batched, loop / batched))
+
+
+if __name__ == '__main__':
+    run()
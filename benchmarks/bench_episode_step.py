@@ -0,0 +1,35 @@
+import contextlib
+import io
+import time as clock
+import numpy as np
+from oanda.oanda_env import Episode, ArrayEpisode
+from oanda.preprocessing import add_indicators
+from oanda.rewards import FinishedTradeRewards
+from oanda.synthetic import make_day
+
+
+def steps_per_second(episode_type, day, actions, window_size=32):
+    with contextlib.redirect_stdout(io.StringIO()):
+        episode = episode_type(day, window_size, FinishedTradeRewards())
+    start = clock.perf_counter()
+    steps = 0
+    for action in actions:
+        if episode.done:
+            break
+        episode.step(action)
+        steps += 1
+    return steps / (clock.perf_counter() - start)
+
+
+def run(rows=2000):
+    day = add_indicators(make_day(rows, seconds=5))
+    actions = np.random.default_rng(0).choice([0, 1, -1], size=rows, p=[0.8, 0.1, 0.1])
+    frame = steps_per_second(Episode, day, actions)
+    array = steps_per_second(ArrayEpisode, day, actions)
+    print('Episode:       %8.0f steps/s' % frame)
+    print('ArrayEpisode:  %8.0f steps/s' % array)
+    print('speedup:       %8.1fx' % (array / frame))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,47 @@
+import timeit
+import numpy as np
+import pandas as pd
+import ta
+from core.indicators import LiveIndicators
+from oanda.preprocessing import add_indicators, add_indicators_to_days
+from oanda.synthetic import make_day
+
+
+def ta_indicators(day):
+    high = ((day['ask_high'] + day['bid_high']) / 2).rename('high')
+    low = ((day['ask_low'] + day['bid_low']) / 2).rename('low')
+    close = ((day['ask_close'] + day['bid_close']) / 2).rename('close')
+    ao = ta.momentum.ao(high, low, s=13, l=35, fillna=False).rename('ao')
+    rsi = ta.momentum.rsi(close, n=13, fillna=False).rename('rsi')
+    atr = ta.volatility.average_true_range(high, low, close, n=13, fillna=False).rename('atr')
+    ema13 = ta.trend.ema_indicator(close, n=13, fillna=False).rename('ema13')
+    ema35 = ta.trend.ema_indicator(close, n=35, fillna=False).rename('ema35')
+    return pd.concat([day, ao, rsi, atr, ema13, ema35], axis=1).dropna()
+
+
+def run(days=20, candles=288, repeat=3):
+    data = [make_day(candles, seed=seed) for seed in range(days)]
+    np.testing.assert_allclose(add_indicators_to_days(data)[0].to_numpy(), ta_indicators(data[0]).to_numpy(),
+                               rtol=1e-9, atol=1e-12)
+    total = days * candles
+    with_ta = min(timeit.repeat(lambda: [ta_indicators(day) for day in data], number=1, repeat=repeat))
+    per_day = min(timeit.repeat(lambda: [add_indicators(day) for day in data], number=1, repeat=repeat))
+    stacked = min(timeit.repeat(lambda: add_indicators_to_days(data), number=1, repeat=repeat))
+    print('%d days of %d candles' % (days, candles))
+    print('  ta:            %10.0f candles/s' % (total / with_ta))
+    print('  per day:       %10.0f candles/s  (%.1fx)' % (total / per_day, with_ta / per_day))
+    print('  stacked days:  %10.0f candles/s  (%.1fx)' % (total / stacked, with_ta / stacked))
+
+    records = data[0].to_dict('records')
+
+    def live():
+        indicators = LiveIndicators()
+        for candle in records:
+            indicators.update_candle(candle)
+
+    seconds = min(timeit.repeat(live, number=1, repeat=repeat))
+    print('  live update:   %10.1f us/candle' % (seconds / len(records) * 1e6))
+
+
+if __name__ == '__main__':
+    run()
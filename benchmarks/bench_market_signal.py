@@ -0,0 +1,36 @@
+import contextlib
+import io
+import time as clock
+from oanda.oanda_env import ArrayEpisode
+from oanda.preprocessing import add_indicators, scale_array
+from oanda.rewards import FinishedTradeRewards
+from oanda.synthetic import make_day
+
+
+def latency(day, window_size, mode, steps=1500):
+    with contextlib.redirect_stdout(io.StringIO()):
+        episode = ArrayEpisode(day, window_size, FinishedTradeRewards(), signal_mode=mode)
+    steps = min(steps, episode.length - 1)
+    start = clock.perf_counter()
+    for step in range(1, steps + 1):
+        episode.current_step = step
+        if mode is None:
+            scale_array(episode.get_market_signal())
+        else:
+            episode.signal.at(step)
+    return (clock.perf_counter() - start) / steps * 1e6
+
+
+def run():
+    day = add_indicators(make_day(2000, seed=1))
+    for window_size in (32, 64):
+        full = latency(day, window_size, None)
+        print('window %d' % window_size)
+        print('  full window:  %7.1f us/step' % full)
+        for mode in ('exact', 'approximate'):
+            incremental = latency(day, window_size, mode)
+            print('  %-12s  %7.1f us/step  (%.1fx)' % (mode + ':', incremental, full / incremental))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,40 @@
+import contextlib
+import io
+import os
+import time as clock
+import numpy as np
+from oanda.oanda_env import OandaEnv
+from oanda.parallel_env import ParallelEnvRunner
+from oanda.preprocessing import add_indicators
+from oanda.synthetic import make_day
+
+
+def make_env(window_size=64):
+    env = OandaEnv(None, window_size=window_size)
+    env.episodes = [add_indicators(make_day(2000, seed=seed)) for seed in range(4)]
+    return env
+
+
+def steps_per_second(num_workers, steps=300):
+    actions = np.random.default_rng(0).choice([0, 1, -1], size=(steps, num_workers), p=[0.8, 0.1, 0.1])
+    with ParallelEnvRunner(make_env, num_workers) as runner:
+        runner.reset()
+        start = clock.perf_counter()
+        for batch in actions:
+            runner.step(batch)
+        return steps * num_workers / (clock.perf_counter() - start)
+
+
+def run():
+    cores = os.cpu_count() or 1
+    counts = sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)))
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = [(count, steps_per_second(count)) for count in counts]
+    base = results[0][1]
+    print('cores available: %d' % cores)
+    for count, rate in results:
+        print('%2d workers: %8.0f steps/s  (%.2fx)' % (count, rate, rate / base))
+
+
+if __name__ == '__main__':
+    run()
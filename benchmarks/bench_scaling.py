@@ -0,0 +1,28 @@
+import timeit
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+from core.scaling import min_max_scale, z_score_scale, robust_scale
+
+
+def per_column(windows):
+    scaler = MinMaxScaler(feature_range=(0, 1))
+    return np.stack([
+        np.concatenate([scaler.fit_transform(window[:, [j]]) for j in range(window.shape[1])], axis=1)
+        for window in windows
+    ])
+
+
+def run(count=1000, window_size=32, features=11, repeat=3):
+    windows = np.random.default_rng(0).normal(size=(count, window_size, features)).cumsum(axis=1)
+    out = np.empty_like(windows)
+    np.testing.assert_array_equal(per_column(windows[:50]), min_max_scale(windows[:50], axis=1))
+    loop = min(timeit.repeat(lambda: per_column(windows), number=1, repeat=repeat))
+    print('%d windows of %d x %d' % (count, window_size, features))
+    print('  sklearn per column: %10.0f windows/s' % (count / loop))
+    for name, scale in (('minmax', min_max_scale), ('zscore', z_score_scale), ('robust', robust_scale)):
+        seconds = min(timeit.repeat(lambda: scale(windows, axis=1, out=out), number=1, repeat=repeat))
+        print('  %-18s %10.0f windows/s  (%.0fx)' % (name + ':', count / seconds, loop / seconds))
+
+
+if __name__ == '__main__':
+    run()
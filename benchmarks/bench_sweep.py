@@ -0,0 +1,28 @@
+import os
+import tempfile
+import time
+import numpy as np
+from analysis.sweep import SweepRunner, grid
+from oanda.synthetic import make_day
+
+
+def run(days=8, candles=17280):
+    # a day of S5 candles per trading day
+    data = [make_day(candles, seed=seed) for seed in range(days)]
+    trials = grid(fast=[5, 8, 13, 21], slow=[34, 55], tp=list(np.linspace(0.0003, 0.0015, 4)),
+                  sl=list(np.linspace(0.0002, 0.0010, 4)))
+    print('%d trials over %d days of %d candles, %d cpus' % (len(trials), days, candles, os.cpu_count()))
+    baseline = None
+    for processes in sorted({1, 2, os.cpu_count()}):
+        with tempfile.TemporaryDirectory() as directory:
+            runner = SweepRunner(data, directory, processes=processes)
+            started = time.perf_counter()
+            runner.run(trials)
+            seconds = time.perf_counter() - started
+        baseline = baseline or seconds
+        print('  %2d processes: %7.2f s  %6.1f trials/s  (%.2fx)' % (processes, seconds, len(trials) / seconds,
+                                                                    baseline / seconds))
+
+
+if __name__ == '__main__':
+    run()
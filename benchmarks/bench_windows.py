@@ -0,0 +1,39 @@
+import timeit
+import numpy as np
+import pandas as pd
+from core.dataprep import DataPrep, Denoiser
+from core.constants import raw_signals
+from oanda.preprocessing import add_indicators
+from oanda.synthetic import make_day
+
+
+def window_by_window(prep, window_size, step_size):
+    denoiser = Denoiser()
+    data_x = []
+    for signal in prep.data:
+        for j in range(1, len(signal) - window_size, step_size):
+            window_x = signal.iloc[j-1:j + window_size]
+            window_smooth_diff = denoiser.denoise_frame(window_x[raw_signals]).diff()
+            window_x = pd.concat([window_x, window_smooth_diff], axis=1).drop(raw_signals, axis=1).dropna()
+            data_x.append(prep.scale_frame(window_x))
+    return np.array(data_x)
+
+
+def run(days=2, candles=1000, repeat=3):
+    prep = DataPrep([add_indicators(make_day(candles, seed=seed)) for seed in range(days)])
+    for window_size, step_size in ((32, 16), (64, 8)):
+        windows = prep.make_windows(window_size, step_size)
+        np.testing.assert_array_equal(window_by_window(prep, window_size, step_size), windows)
+        loop = min(timeit.repeat(lambda: window_by_window(prep, window_size, step_size), number=1, repeat=repeat))
+        strided = min(timeit.repeat(lambda: prep.make_windows(window_size, step_size), number=1, repeat=repeat))
+        streamed = min(timeit.repeat(lambda: sum(1 for _ in prep.iter_windows(256, window_size, step_size)),
+                                     number=1, repeat=repeat))
+        print('window %d, step %d: %d windows, %.1f MB' % (window_size, step_size, len(windows),
+                                                          windows.nbytes / 1e6))
+        print('  window by window: %10.0f windows/s' % (len(windows) / loop))
+        print('  strided:          %10.0f windows/s  (%.1fx)' % (len(windows) / strided, loop / strided))
+        print('  batches of 256:   %10.0f windows/s  (%.1fx)' % (len(windows) / streamed, loop / streamed))
+
+
+if __name__ == '__main__':
+    run()
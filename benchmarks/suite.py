@@ -0,0 +1,324 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time as clock
+import timeit
+import numpy as np
+import pandas as pd
+import arrow as time
+from analysis.backtest import Backtest
+from core.constants import raw_signals
+from core.dataprep import DataPrep
+from core.indicators import ema, mid_prices
+from oanda.candle_store import HDFCandleStore, ParquetCandleStore
+from oanda.oanda_candles_api import CandlesAPI, decode_candles
+from oanda.oanda_env import Episode, ArrayEpisode
+from oanda.panel import align_days
+from oanda.resampling import resample_days
+from oanda.preprocessing import add_indicators, add_indicators_to_days, denoise_frame, scale_frame
+from oanda.ledger import Ledger
+from oanda.oanda_env import quote_signals
+from oanda.rewards import BatchEasyTradeRewards, FinishedTradeRewards
+from oanda.synthetic import StubCandleServer, make_candles, make_day
+from oanda.trade import calc_chunks, ema_crossings
+
+# every case is setup(rows, resources) -> (function, units): one call of function handles
+# units items, resources is an ExitStack for servers and temporary files
+
+# outside the checkout so runs never dirty it; CI keeps its own with --history
+default_history = os.path.join(os.path.expanduser('~'), '.cache', 'midas', 'bench_history.jsonl')
+
+# a case regresses when it gets this much slower than its baseline
+default_threshold = 0.25
+# disk and socket bound cases are noisier
+thresholds = {'load': 0.5, 'store_write_hdf': 0.5, 'store_write_parquet': 0.5,
+              'store_read_hdf': 0.5, 'store_read_parquet': 0.5}
+
+
+def decode_case(rows, resources):
+    candles = make_candles(rows)
+    return lambda: decode_candles(candles), rows
+
+
+class UncachedStore:
+    # keeps CandlesAPI.load on the fetch and decode path every call
+    def contains(self, instrument, granularity, day):
+        return False
+
+    def write_days(self, instrument, granularity, frames):
+        pass
+
+
+def load_case(rows, resources):
+    server = resources.enter_context(StubCandleServer())
+    api = CandlesAPI({'token': 'Bearer bench', 'inst_base_url': server.url, 'store': UncachedStore()})
+    # the stub serves whole days, so the granularity sets how many candles one load decodes
+    granularity = 'S5' if rows > 4000 else 'S30' if rows > 1000 else 'M1'
+    day = time.get('2018-01-02T00:00:00+00:00')
+    candles = len(api.load(day, 'EUR_USD', granularity))
+    return lambda: api.load(day, 'EUR_USD', granularity), candles
+
+
+def indicators_case(rows, resources):
+    days = [make_day(rows, seed=seed) for seed in range(4)]
+    return lambda: add_indicators_to_days(days), 4 * rows
+
+
+def enriched_day(rows, seed=0):
+    return add_indicators(make_day(rows, seed=seed))
+
+
+def denoise_case(rows, resources):
+    window = enriched_day(max(rows, 64))[raw_signals].iloc[:33]
+    return lambda: denoise_frame(window), 1
+
+
+def scale_case(rows, resources):
+    window = enriched_day(max(rows, 64)).iloc[:32]
+    return lambda: scale_frame(window), 1
+
+
+def windows_case(rows, resources):
+    prep = DataPrep([enriched_day(rows)])
+    count = len(prep.make_windows())
+    return prep.make_windows, count
+
+
+def stepping(episode_type, rows, steps=100):
+    day = enriched_day(rows)
+    actions = np.random.default_rng(0).choice([0, 1, -1], size=steps, p=[0.8, 0.1, 0.1])
+    episode = [None]
+
+    def step():
+        for action in actions:
+            if episode[0] is None or episode[0].done:
+                episode[0] = episode_type(day, 32, FinishedTradeRewards())
+            episode[0].step(action)
+    return step, steps
+
+
+def episode_step_case(rows, resources):
+    return stepping(Episode, rows)
+
+
+def array_episode_step_case(rows, resources):
+    return stepping(ArrayEpisode, rows, steps=1000)
+
+
+def panel_case(rows, resources):
+    # four days of the base pair joined with another pair and the base pair at S30
+    base = [make_day(rows, seed=seed) for seed in range(4)]
+    cross = [make_day(rows, seed=seed + 10) for seed in range(4)]
+    coarse = [make_day(max(rows // 6, 1), seconds=30, seed=seed + 20) for seed in range(4)]
+    return lambda: align_days(('S5', base), [('GBP_USD', 'S5', cross), ('EUR_USD', 'S30', coarse)]), 4 * rows
+
+
+def resample_case(rows, resources):
+    # four days with every third candle missing, filled onto a whole day of S5 steps
+    days = [make_day(rows, seed=seed).iloc[np.arange(rows) % 3 != 0] for seed in range(4)]
+    return lambda: resample_days(days, 'S5', fill='ffill', mark_missing=True), 4 * 17280
+
+
+def ema_frame(day):
+    close = mid_prices(day)[2].to_numpy()
+    return pd.DataFrame({'ema_fast': ema(close, 13), 'ema_slow': ema(close, 35)}, index=day.index)
+
+
+def crossings_case(rows, resources):
+    emas = ema_frame(make_day(rows, seed=1))
+    return lambda: ema_crossings(emas), rows
+
+
+def chunks_case(rows, resources):
+    day = make_day(rows, seed=1)
+    signals = ema_crossings(ema_frame(day))
+    return lambda: calc_chunks(day.iloc[:len(signals)], signals, 0), rows
+
+
+def backtest_case(rows, resources):
+    day = make_day(rows, seed=1)
+
+    def run():
+        backtest = Backtest(day)
+        return backtest.run(backtest.ema_signals(13, 35))
+    return run, rows
+
+
+def trajectory_rewards_case(rows, resources, accounts=64):
+    day = make_day(rows, seed=2)
+    quotes = np.repeat(day[quote_signals].to_numpy()[:, None, :], accounts, axis=1)
+    actions = np.random.default_rng(2).choice([0, 0, 0, 1, -1], (rows, accounts))
+    trajectory = Ledger(accounts).replay(actions, quotes)
+    return lambda: BatchEasyTradeRewards(accounts).trajectory_rewards(trajectory), rows * accounts
+
+
+def stored_days(rows, count=5):
+    start = time.get('2018-01-02T00:00:00+00:00')
+    return [(start.shift(days=i), make_day(rows, seed=i)) for i in range(count)]
+
+
+def store_write(store_type, location):
+    def setup(rows, resources):
+        directory = resources.enter_context(tempfile.TemporaryDirectory())
+        store = store_type(os.path.join(directory, location))
+        resources.callback(store.close)
+        frames = stored_days(rows)
+        return lambda: store.write_days('EUR_USD', 'S5', frames), rows * len(frames)
+    return setup
+
+
+def store_read(store_type, location):
+    def setup(rows, resources):
+        directory = resources.enter_context(tempfile.TemporaryDirectory())
+        store = store_type(os.path.join(directory, location))
+        resources.callback(store.close)
+        frames = stored_days(rows)
+        store.write_days('EUR_USD', 'S5', frames)
+        days = [day for day, _ in frames]
+        return lambda: store.read_days('EUR_USD', 'S5', days), rows * len(frames)
+    return setup
+
+
+cases = {
+    'decode': decode_case,
+    'load': load_case,
+    'indicators': indicators_case,
+    'denoise': denoise_case,
+    'scale': scale_case,
+    'windows': windows_case,
+    'panel': panel_case,
+    'resample': resample_case,
+    'episode_step': episode_step_case,
+    'array_episode_step': array_episode_step_case,
+    'ema_crossings': crossings_case,
+    'calc_chunks': chunks_case,
+    'backtest': backtest_case,
+    'trajectory_rewards': trajectory_rewards_case,
+    'store_write_hdf': store_write(HDFCandleStore, 'candles.h5'),
+    'store_write_parquet': store_write(ParquetCandleStore, 'candles'),
+    'store_read_hdf': store_read(HDFCandleStore, 'candles.h5'),
+    'store_read_parquet': store_read(ParquetCandleStore, 'candles'),
+}
+
+# candles per day: quick fits a CI job, full is one day of S5 candles
+sizes = {'quick': 2000, 'full': 17280}
+
+
+def measure(function, repeat=5, min_seconds=0.2):
+    # best of repeat timings, each running function often enough to last min_seconds
+    timer = timeit.Timer(function)
+    number, seconds = timer.autorange()
+    number = max(1, int(number * min_seconds / max(seconds, 1e-9)))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run_case(name, rows, repeat=5):
+    with contextlib.ExitStack() as resources, contextlib.redirect_stdout(io.StringIO()):
+        function, units = cases[name](rows, resources)
+        seconds = measure(function, repeat)
+    return {'seconds': seconds, 'units': units, 'rate': units / seconds}
+
+
+def commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def machine():
+    # results are only compared between runs on the same kind of machine; no host name,
+    # ephemeral CI runners get a new one every job
+    return '%s-%s-py%s' % (platform.machine(), os.cpu_count(), platform.python_version())
+
+
+def read_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as history:
+        return [json.loads(line) for line in history if line.strip()]
+
+
+def append_history(path, record):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'a') as history:
+        history.write(json.dumps(record, sort_keys=True) + '\n')
+
+
+def baselines(history, machine, rows, runs=5):
+    # median seconds of the last runs of every case with the same machine and size
+    seconds = {}
+    for record in history:
+        if record['machine'] == machine and record['rows'] == rows:
+            for name, result in record['results'].items():
+                seconds.setdefault(name, []).append(result['seconds'])
+    return {name: float(np.median(values[-runs:])) for name, values in seconds.items()}
+
+
+def regressions(results, baseline, threshold=default_threshold):
+    found = {}
+    for name, result in results.items():
+        if name in baseline:
+            limit = thresholds.get(name, threshold)
+            ratio = result['seconds'] / baseline[name]
+            if ratio > 1 + limit:
+                found[name] = ratio
+    return found
+
+
+def run(names=None, rows=sizes['quick'], history=default_history, record=True,
+        threshold=default_threshold, repeat=5, out=sys.stdout, machine_key=None):
+    names = names or list(cases)
+    unknown = [name for name in names if name not in cases]
+    if unknown:
+        raise ValueError('unknown benchmarks: %s' % ', '.join(unknown))
+
+    key = machine_key or machine()
+    baseline = baselines(read_history(history), key, rows)
+    results = {}
+    for name in names:
+        results[name] = result = run_case(name, rows, repeat)
+        change = ''
+        if name in baseline:
+            change = '%+6.1f%%' % ((result['seconds'] / baseline[name] - 1) * 100)
+        out.write('%-20s %12.6f s %14.0f /s  %s\n' % (name, result['seconds'], result['rate'], change))
+
+    found = regressions(results, baseline, threshold)
+    for name, ratio in sorted(found.items()):
+        out.write('regression: %s is %.2fx slower than its baseline\n' % (name, ratio))
+    if record:
+        append_history(history, {'time': clock.time(), 'commit': commit(), 'machine': key,
+                                 'rows': rows, 'numpy': np.__version__, 'pandas': pd.__version__,
+                                 'results': results})
+    return results, found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='midas benchmark suite')
+    parser.add_argument('cases', nargs='*', help='cases to run, all by default: ' + ', '.join(cases))
+    parser.add_argument('--size', choices=sorted(sizes), default='quick')
+    parser.add_argument('--rows', type=int, default=None, help='candles per day, overrides --size')
+    parser.add_argument('--history', default=default_history, help='JSON lines file of earlier runs')
+    parser.add_argument('--threshold', type=float, default=default_threshold,
+                        help='fraction slower than the baseline that counts as a regression')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--no-record', action='store_true', help='compare without adding this run')
+    parser.add_argument('--machine', default=None,
+                        help='key runs are compared under, defaults to architecture, cpus and python')
+    args = parser.parse_args(argv)
+
+    rows = args.rows or sizes[args.size]
+    _, found = run(args.cases, rows, args.history, not args.no_record, args.threshold, args.repeat,
+                   machine_key=args.machine)
+    return 1 if found else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,47 +1,27 @@
-from statsmodels.robust import mad
-from sklearn.preprocessing import MinMaxScaler
-import pywt
 import numpy as np
 import pandas as pd
-import ta
 from . constants import raw_signals, index_name
+from . scaling import get_scaler
+from . windows import WindowEngine
 
 class DataPrep:
-    def __init__(self, data):
+    def __init__(self, data, scaler='minmax'):
+        # scaler is a name from core.scaling.scalers or a function(data, axis, out)
         self.data = data
+        self.scaler = get_scaler(scaler)
 
     def make_windows(self, window_size=32, step_size=16):
-        denoiser = Denoiser()
-        data_x = []
-        windowed_signals = []
-
         # TODO add indicators
+        engine = WindowEngine(Denoiser(), window_size, step_size, scaler=self.scaler)
+        return engine.make_windows(self.data)
+
+    def iter_windows(self, batch_size, window_size=32, step_size=16, drop_last=False):
+        # same windows as make_windows, in fixed size batches instead of one array
+        engine = WindowEngine(Denoiser(), window_size, step_size, scaler=self.scaler)
+        return engine.iter_batches(self.data, batch_size, drop_last)
 
-        for i in range(len(self.data)):
-            signal = self.data[i]
-      
-            for j in range(1, len(signal) - window_size, step_size):
-                window_x = signal.iloc[j-1:j + window_size]
-                window_smooth = denoiser.denoise_frame(window_x[raw_signals])
-                window_smooth_diff = window_smooth.diff()
-                window_x = pd.concat([window_x, window_smooth_diff], axis=1)
-                window_x = window_x.drop(raw_signals, axis=1).dropna()
-        
-                window_x = self.scale_frame(window_x)
-                data_x.append(window_x)
-    
-        data_x = np.array(data_x)
-        return data_x
-        
     def scale_frame(self, data):
-        scaler = MinMaxScaler(feature_range=(0, 1))
-        signals = []
-        for signal_name in data:
-            signal = data[signal_name].values
-            signal = signal.reshape(-1,1).astype('float64')
-            signal = scaler.fit_transform(signal)
-            signals.append(signal)
-        return np.concatenate(signals, axis=1)
+        return self.scaler(data.to_numpy(dtype='float64'), axis=0)
         
     
         
@@ -53,22 +33,49 @@ class Denoiser:
         pass
         
     def denoise_frame(self, data):
-        smoothed_signals = []
+        return self.smoothed_frame(data, self.denoise_array(data.to_numpy(dtype='float64')))
+
+    def smoothed_frame(self, data, smoothed):
+        # same layout as denoising column by column: waverec may return an extra
+        # sample, which ends up on a NaN index row
         index = pd.Series(data.index).rename(index_name)
-        smoothed_signals.append(index)
-        for signal_name in data:
-            signal = data[signal_name].values
-            signal_smooth = self.denoise(signal)
-            signal_smooth = pd.Series(signal_smooth).rename(signal_name + '_' + self.wavelet)
-            smoothed_signals.append(signal_smooth)
-        smoothed_frame = pd.concat(smoothed_signals, axis=1) 
+        names = [signal_name + '_' + self.wavelet for signal_name in data]
+        smoothed_frame = pd.concat([index, pd.DataFrame(smoothed, columns=names)], axis=1)
         smoothed_frame = smoothed_frame.set_index(index_name)
         return smoothed_frame
     
     def denoise(self, data):
+        import pywt
+        from statsmodels.robust import mad
         coeff = pywt.wavedec(data, self.wavelet, mode=self.mode)
         sigma = mad(coeff[-self.level])
         uthresh = sigma * np.sqrt(2 * np.log(len(data)))
         coeff[1:] = (pywt.threshold(i, value=uthresh, mode="soft") for i in coeff[1:])
         y = pywt.waverec(coeff, self.wavelet, mode=self.mode)
-        return y
\ No newline at end of file
+        return y
+
+    def denoise_array(self, data, axis=0):
+        # denoise every signal along axis in one pass, bit for bit the same as denoise
+        # pywt refuses read-only buffers (memory maps, pandas views) along an axis
+        import pywt
+        data = np.require(data, dtype='float64', requirements=['W'])
+        coeff = pywt.wavedec(data, self.wavelet, mode=self.mode, axis=axis)
+        detail = coeff[-self.level]
+        center = np.median(detail, axis=axis, keepdims=True)
+        sigma = np.median(np.abs(detail - center) / mad_constant, axis=axis, keepdims=True)
+        uthresh = sigma * np.sqrt(2 * np.log(data.shape[axis]))
+        coeff[1:] = (soft_threshold(i, uthresh) for i in coeff[1:])
+        y = pywt.waverec(coeff, self.wavelet, mode=self.mode, axis=axis)
+        return y
+
+
+# the normalization statsmodels' mad uses by default, scipy.stats.norm.ppf(3 / 4.)
+mad_constant = 0.6744897501960817
+
+
+def soft_threshold(data, value):
+    # pywt.threshold(mode='soft') with a threshold per signal
+    with np.errstate(divide='ignore', invalid='ignore'):
+        thresholded = 1 - value / np.abs(data)
+    thresholded.clip(min=0, max=None, out=thresholded)
+    return data * thresholded
\ No newline at end of file
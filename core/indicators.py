@@ -0,0 +1,178 @@
+from collections import deque
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# every function works along the last axis, so a (days, candles) array computes
+# all days at once; shorter days are padded with NaN at the end, see stack
+
+
+def smoothing(n):
+    # pandas' ewm(span=n) smoothing factor
+    return 1. / (1. + (n - 1) / 2.)
+
+
+def shifted(data):
+    previous = np.full(data.shape, np.nan)
+    previous[..., 1:] = data[..., :-1]
+    return previous
+
+
+def sma(data, n):
+    out = np.full(data.shape, np.nan)
+    if data.shape[-1] >= n:
+        out[..., n - 1:] = sliding_window_view(data, n, axis=-1).mean(axis=-1)
+    return out
+
+
+def recursive_ema(data, alpha, seed, start):
+    # out[start] = seed, then out[t] = alpha * data[t] + (1 - alpha) * out[t - 1]
+    from scipy.signal import lfilter
+    out = np.full(data.shape, np.nan)
+    if data.shape[-1] <= start:
+        return out
+    seed = np.asarray(seed, dtype='float64')
+    out[..., start] = seed
+    if data.shape[-1] > start + 1:
+        out[..., start + 1:], _ = lfilter([alpha], [1., alpha - 1.], data[..., start + 1:], axis=-1,
+                                          zi=(1. - alpha) * seed[..., None])
+    return out
+
+
+def ema(data, n):
+    # ta's ema: seeded with the mean of the first n values
+    return recursive_ema(data, smoothing(n), data[..., :n].mean(axis=-1), n - 1)
+
+
+def ao(high, low, s=5, l=34):
+    median_price = 0.5 * (high + low)
+    return sma(median_price, s) - sma(median_price, l)
+
+
+def rsi(close, n=14):
+    diff = close - shifted(close)
+    falling = diff < 0
+    up = np.where(falling, 0., diff)
+    down = np.where(falling, -diff, diff * 0)
+    # the first difference is missing, so ta starts both averages at candle n unseeded
+    if close.shape[-1] <= n:
+        return np.full(close.shape, np.nan)
+    average_up = recursive_ema(up, smoothing(n), up[..., n], n)
+    average_down = recursive_ema(down, smoothing(n), down[..., n], n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100 * average_up / (average_up + average_down)
+
+
+def true_range(high, low, close):
+    previous = shifted(close)
+    return np.fmax(high, previous) - np.fmin(low, previous)
+
+
+def average_true_range(high, low, close, n=14):
+    return ema(true_range(high, low, close), n)
+
+
+def mid_prices(candles):
+    # the bid/ask midpoints add_indicators works on, candles is a frame or a dict of arrays
+    high = (candles['ask_high'] + candles['bid_high']) / 2
+    low = (candles['ask_low'] + candles['bid_low']) / 2
+    close = (candles['ask_close'] + candles['bid_close']) / 2
+    return high, low, close
+
+
+# the indicator set of oanda.preprocessing.add_indicators, recorded in episode snapshots
+indicator_settings = {
+    'ao': {'s': 13, 'l': 35},
+    'rsi': {'n': 13},
+    'atr': {'n': 13},
+    'ema13': {'n': 13},
+    'ema35': {'n': 35},
+}
+
+
+def indicators(high, low, close, settings=indicator_settings):
+    return {
+        'ao': ao(high, low, **settings['ao']),
+        'rsi': rsi(close, **settings['rsi']),
+        'atr': average_true_range(high, low, close, **settings['atr']),
+        'ema13': ema(close, **settings['ema13']),
+        'ema35': ema(close, **settings['ema35']),
+    }
+
+
+def stack(arrays):
+    # (days, longest day) array, NaN after the end of every shorter day
+    out = np.full((len(arrays), max(len(array) for array in arrays)), np.nan)
+    for i, array in enumerate(arrays):
+        out[i, :len(array)] = array
+    return out
+
+
+class RunningEma:
+    def __init__(self, n, seeded=True):
+        # seeded averages start from the mean of the first n values, like ema,
+        # the others from the n + 1th value, like the averages inside rsi
+        self.n = n
+        self.alpha = smoothing(n)
+        self.seeded = seeded
+        self.count = 0
+        self.first = []
+        self.value = np.nan
+
+    def update(self, x):
+        self.count += 1
+        if self.seeded and self.count <= self.n:
+            self.first.append(x)
+            if self.count == self.n:
+                self.value = np.mean(self.first)
+                self.first = None
+        elif not self.seeded and self.count <= self.n + 1:
+            if self.count == self.n + 1:
+                self.value = x
+        else:
+            self.value = self.alpha * x + (1. - self.alpha) * self.value
+        return self.value
+
+
+class RunningMean:
+    def __init__(self, n):
+        self.n = n
+        self.window = deque(maxlen=n)
+
+    def update(self, x):
+        self.window.append(x)
+        return np.mean(self.window) if len(self.window) == self.n else np.nan
+
+
+class LiveIndicators:
+    def __init__(self):
+        # same values as indicators(), one candle at a time
+        self.ao_short = RunningMean(13)
+        self.ao_long = RunningMean(35)
+        self.average_up = RunningEma(13, seeded=False)
+        self.average_down = RunningEma(13, seeded=False)
+        self.atr = RunningEma(13)
+        self.ema13 = RunningEma(13)
+        self.ema35 = RunningEma(35)
+        self.previous_close = np.nan
+
+    def update(self, high, low, close):
+        median_price = 0.5 * (high + low)
+        diff = close - self.previous_close
+        falling = diff < 0
+        average_up = self.average_up.update(0. if falling else diff)
+        average_down = self.average_down.update(-diff if falling else diff * 0)
+        previous = self.previous_close
+        true_range = np.fmax(high, previous) - np.fmin(low, previous)
+        self.previous_close = close
+        with np.errstate(divide='ignore', invalid='ignore'):
+            relative_strength = 100 * average_up / np.float64(average_up + average_down)
+        return {
+            'ao': self.ao_short.update(median_price) - self.ao_long.update(median_price),
+            'rsi': relative_strength,
+            'atr': self.atr.update(true_range),
+            'ema13': self.ema13.update(close),
+            'ema35': self.ema35.update(close),
+        }
+
+    def update_candle(self, candle):
+        return self.update(*mid_prices(candle))
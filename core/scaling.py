@@ -0,0 +1,78 @@
+import numpy as np
+
+# ranges and deviations below this count as constant columns and are left unscaled,
+# the same guard sklearn's scalers use
+tiny = 10 * np.finfo(np.float64).eps
+
+
+def min_max_scale(data, axis=0, out=None):
+    # MinMaxScaler(feature_range=(0, 1)) fitted per column, bit for bit
+    data_min = np.nanmin(data, axis=axis, keepdims=True)
+    data_range = np.nanmax(data, axis=axis, keepdims=True) - data_min
+    data_range[data_range < tiny] = 1.0
+    scale = 1.0 / data_range
+    out = np.multiply(data, scale, out=out)
+    out += 0.0 - data_min * scale
+    return out
+
+
+def z_score_scale(data, axis=0, out=None):
+    # StandardScaler fitted per column
+    mean = np.nanmean(data, axis=axis, keepdims=True)
+    std = np.nanstd(data, axis=axis, keepdims=True)
+    std[std < tiny] = 1.0
+    out = np.subtract(data, mean, out=out)
+    out /= std
+    return out
+
+
+def robust_scale(data, axis=0, out=None):
+    # RobustScaler fitted per column: median and interquartile range
+    # the nan-aware versions are much slower, only pay for them when needed
+    if np.isnan(data).any():
+        median = np.nanmedian(data, axis=axis, keepdims=True)
+        lower, upper = np.nanpercentile(data, [25, 75], axis=axis, keepdims=True)
+    else:
+        median = np.median(data, axis=axis, keepdims=True)
+        lower, upper = np.percentile(data, [25, 75], axis=axis, keepdims=True)
+    spread = upper - lower
+    spread[spread < tiny] = 1.0
+    out = np.subtract(data, median, out=out)
+    out /= spread
+    return out
+
+
+scalers = {
+    'minmax': min_max_scale,
+    'zscore': z_score_scale,
+    'robust': robust_scale,
+}
+
+
+def get_scaler(scaler):
+    # a name from scalers or any function(data, axis, out)
+    if callable(scaler):
+        return scaler
+    try:
+        return scalers[scaler]
+    except KeyError:
+        raise ValueError('unknown scaler %r, expected one of %s' % (scaler, sorted(scalers)))
+
+
+def scaler_name(scaler):
+    # a name that tells scalers apart in cache keys: the scalers' own names, a name attribute
+    # or a module level function's qualified name; lambdas, partials and nested functions
+    # have no unique name and need the attribute
+    if isinstance(scaler, str):
+        get_scaler(scaler)
+        return scaler
+    for name, function in scalers.items():
+        if scaler is function:
+            return name
+    name = getattr(scaler, 'name', None)
+    if isinstance(name, str) and name:
+        return name
+    qualname = getattr(scaler, '__qualname__', '')
+    if qualname and '<' not in qualname:
+        return '%s.%s' % (scaler.__module__, qualname)
+    raise ValueError('scaler %r has no unique name, give it a name attribute' % (scaler,))
@@ -0,0 +1,93 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from . constants import raw_signals
+from . scaling import get_scaler
+
+
+class WindowEngine:
+    def __init__(self, denoiser, window_size=32, step_size=16,
+                 signals=raw_signals, drop=None, chunk=1024, scaler='minmax'):
+        # signals are denoised and differenced, drop (default: signals) is left out
+        self.window_size = window_size
+        self.step_size = step_size
+        self.denoiser = denoiser
+        self.signals = list(signals)
+        self.drop = list(signals if drop is None else drop)
+        self.chunk = chunk
+        self.scaler = get_scaler(scaler)
+
+    def layout(self, day):
+        columns = list(day.columns)
+        signal_columns = [columns.index(name) for name in self.signals]
+        kept_columns = [i for i, name in enumerate(columns) if name not in self.drop]
+        return signal_columns, kept_columns
+
+    def features(self, day):
+        signal_columns, kept_columns = self.layout(day)
+        return len(signal_columns) + len(kept_columns)
+
+    def count(self, day):
+        return len(range(1, len(day) - self.window_size, self.step_size))
+
+    def day_windows(self, day):
+        # (windows, window_size + 1, columns) strided view, nothing is copied
+        values = np.asarray(day.to_numpy(dtype='float64'))
+        if np.isnan(values).any():
+            raise ValueError('trading days must not contain NaN, drop them first')
+        windows = sliding_window_view(values, self.window_size + 1, axis=0).transpose(0, 2, 1)
+        return windows[::self.step_size][:self.count(day)]
+
+    def transform(self, windows, signal_columns, kept_columns, out):
+        kept = len(kept_columns)
+        out[:, :, :kept] = windows[:, 1:, kept_columns]
+        smooth = self.denoiser.denoise_array(windows[:, :, signal_columns], axis=1)
+        smooth = smooth[:, :self.window_size + 1]
+        np.subtract(smooth[:, 1:], smooth[:, :-1], out=out[:, :, kept:])
+        return self.scaler(out, axis=1, out=out)
+
+    def fill(self, day, out):
+        signal_columns, kept_columns = self.layout(day)
+        windows = self.day_windows(day)
+        for start in range(0, len(windows), self.chunk):
+            stop = min(start + self.chunk, len(windows))
+            self.transform(windows[start:stop], signal_columns, kept_columns, out[start:stop])
+        return len(windows)
+
+    def make_windows(self, days):
+        days = [day for day in days if self.count(day) > 0]
+        if not days:
+            return np.zeros((0, self.window_size, 0))
+        features = self.features(days[0])
+        total = sum(self.count(day) for day in days)
+        out = np.empty((total, self.window_size, features))
+        position = 0
+        for day in days:
+            if self.features(day) != features:
+                raise ValueError('all trading days need the same columns')
+            position += self.fill(day, out[position:])
+        return out
+
+    def iter_batches(self, days, batch_size, drop_last=False):
+        # streams fixed size batches, only one day of windows is touched at a time
+        batch = None
+        filled = 0
+        for day in days:
+            if self.count(day) == 0:
+                continue
+            signal_columns, kept_columns = self.layout(day)
+            windows = self.day_windows(day)
+            start = 0
+            while start < len(windows):
+                if batch is None:
+                    batch = np.empty((batch_size, self.window_size, self.features(day)))
+                    filled = 0
+                take = min(batch_size - filled, len(windows) - start)
+                self.transform(windows[start:start + take], signal_columns, kept_columns,
+                               batch[filled:filled + take])
+                filled += take
+                start += take
+                if filled == batch_size:
+                    yield batch
+                    batch = None
+        if batch is not None and filled and not drop_last:
+            yield batch[:filled]
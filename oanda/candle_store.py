@@ -0,0 +1,312 @@
+import argparse
+import fcntl
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from . request_planner import granularity_seconds
+
+price_names = ['ask_open', 'bid_open', 'ask_close', 'bid_close',
+               'ask_high', 'bid_high', 'ask_low', 'bid_low']
+
+days_metadata_key = b'midas.days'
+
+
+def day_number(day):
+    if isinstance(day, (int, np.integer)):
+        return int(day)
+    return int(day.format('YYYYMMDD'))
+
+
+def split_days(frame, days):
+    # frame holds the rows of several days sorted by (day, time_of_day)
+    stored = frame['day'].to_numpy()
+    prices = frame[price_names]
+    times = frame['time_of_day'].to_numpy(dtype=np.int64)
+    starts = np.searchsorted(stored, days, side='left')
+    stops = np.searchsorted(stored, days, side='right')
+    return [
+        pd.DataFrame(prices.to_numpy()[a:b], columns=price_names,
+                     index=pd.Index(times[a:b], name='time_of_day'))
+        for a, b in zip(starts, stops)
+    ]
+
+
+def merge_candles(*frames):
+    # one day from several frames of it, later frames win on equal time_of_day;
+    # live candles merged over a backfilled day replace only the rows they repeat
+    frames = [frame for frame in frames if frame is not None]
+    if not frames:
+        return None
+    filled = [frame for frame in frames if len(frame)] or frames[:1]
+    merged = pd.concat(filled) if len(filled) > 1 else filled[0]
+    if merged.index.is_unique and merged.index.is_monotonic_increasing:
+        return merged
+    merged = merged[~merged.index.duplicated(keep='last')]
+    return merged.sort_index(kind='stable')
+
+
+class HDFCandleStore:
+    def __init__(self, path='oanda_api_store.h5'):
+        self.path = path
+        self.store = pd.HDFStore(path)
+
+    def key(self, instrument, granularity, day):
+        return instrument + granularity + str(day)
+
+    def live_key(self, instrument, granularity, day):
+        return self.key(instrument, granularity, day) + '_live'
+
+    def contains(self, instrument, granularity, day):
+        return self.key(instrument, granularity, day_number(day)) in self.store
+
+    def read_days(self, instrument, granularity, days):
+        return [self.read_day(instrument, granularity, day_number(day)) for day in days]
+
+    def read_day(self, instrument, granularity, day):
+        key = self.key(instrument, granularity, day)
+        live = self.read_live(instrument, granularity, day)
+        if live is None:
+            return self.store[key]
+        return merge_candles(self.store[key] if key in self.store else None, live)
+
+    def write_days(self, instrument, granularity, frames):
+        for day, frame in frames:
+            self.store[self.key(instrument, granularity, day_number(day))] = frame
+
+    def append_candles(self, instrument, granularity, day, frame):
+        # live candles go to a table node that grows in place
+        self.store.append(self.live_key(instrument, granularity, day_number(day)), frame, format='table')
+
+    def read_live(self, instrument, granularity, day):
+        key = self.live_key(instrument, granularity, day_number(day))
+        if key not in self.store:
+            return None
+        return merge_candles(self.store[key])
+
+    def compact_live(self, instrument, granularity, day):
+        # turns a finished live day into a regular day node, merged over any stored candles
+        day = day_number(day)
+        frame = self.read_live(instrument, granularity, day)
+        if frame is not None:
+            self.write_days(instrument, granularity, [(day, self.read_day(instrument, granularity, day))])
+            self.store.remove(self.live_key(instrument, granularity, day))
+
+    def close(self):
+        self.store.close()
+
+
+class ParquetCandleStore:
+    def __init__(self, root='oanda_candles'):
+        self.root = root
+        self.known_days = {}
+
+    def partition(self, instrument, granularity, month):
+        return os.path.join(self.root, instrument, granularity, '%d-%02d.parquet' % divmod(month, 100))
+
+    def live_directory(self, instrument, granularity, day):
+        return os.path.join(self.root, instrument, granularity, 'live', str(day))
+
+    def stored_days(self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return frozenset()
+        # files are only ever replaced, so a new inode or mtime means new content
+        version = (stat.st_ino, stat.st_mtime_ns)
+        cached = self.known_days.get(path)
+        if cached is None or cached[0] != version:
+            metadata = pq.read_schema(path).metadata or {}
+            days = frozenset(json.loads(metadata.get(days_metadata_key, b'[]')))
+            cached = (version, days)
+            self.known_days[path] = cached
+        return cached[1]
+
+    def contains(self, instrument, granularity, day):
+        day = day_number(day)
+        return day in self.stored_days(self.partition(instrument, granularity, day // 100))
+
+    def read_range(self, instrument, granularity, start, end):
+        first, last = day_number(start), day_number(end)
+        months = range(first // 100, last // 100 + 1)
+        paths = [self.partition(instrument, granularity, month) for month in months
+                 if month % 100 and month % 100 <= 12]
+        paths = [path for path in paths if os.path.exists(path)]
+        if not paths:
+            columns = ['day', 'time_of_day'] + price_names
+            return pd.DataFrame({name: np.zeros(0) for name in columns}).astype(
+                {'day': np.int32, 'time_of_day': np.int64})
+        table = pq.read_table(paths, filters=[('day', '>=', first), ('day', '<=', last)])
+        frame = table.to_pandas()
+        return frame.sort_values(['day', 'time_of_day'], kind='stable').reset_index(drop=True)
+
+    def read_days(self, instrument, granularity, days):
+        numbers = [day_number(day) for day in days]
+        if not numbers:
+            return []
+        frame = self.read_range(instrument, granularity, min(numbers), max(numbers))
+        frames = split_days(frame, numbers)
+        # days still being streamed have live parts over whatever is stored of them
+        for i, number in enumerate(numbers):
+            live = self.read_live(instrument, granularity, number)
+            if live is not None:
+                frames[i] = merge_candles(frames[i], live)
+        return frames
+
+    def append_candles(self, instrument, granularity, day, frame):
+        # every append is a new small file, nothing already written is touched
+        directory = self.live_directory(instrument, granularity, day_number(day))
+        os.makedirs(directory, exist_ok=True)
+        part = len([name for name in os.listdir(directory) if name.endswith('.parquet')])
+        table = pa.Table.from_pandas(frame[price_names].reset_index(), preserve_index=False)
+        handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        os.close(handle)
+        try:
+            pq.write_table(table, temp_path)
+            os.replace(temp_path, os.path.join(directory, '%08d.parquet' % part))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def live_parts(self, instrument, granularity, day):
+        directory = self.live_directory(instrument, granularity, day_number(day))
+        if not os.path.isdir(directory):
+            return []
+        return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                      if name.endswith('.parquet'))
+
+    def read_live(self, instrument, granularity, day):
+        parts = self.live_parts(instrument, granularity, day)
+        if not parts:
+            return None
+        frame = pq.read_table(parts).to_pandas()
+        times = frame['time_of_day'].to_numpy(dtype=np.int64)
+        return merge_candles(pd.DataFrame(frame[price_names].to_numpy(), columns=price_names,
+                                          index=pd.Index(times, name='time_of_day')))
+
+    def compact_live(self, instrument, granularity, day):
+        # folds a finished live day into its month partition, merged over any stored candles
+        frame = self.read_live(instrument, granularity, day)
+        if frame is not None:
+            merged = self.read_days(instrument, granularity, [day])[0]
+            self.write_days(instrument, granularity, [(day, merged)])
+            for part in self.live_parts(instrument, granularity, day):
+                os.unlink(part)
+            os.rmdir(self.live_directory(instrument, granularity, day_number(day)))
+
+    def write_days(self, instrument, granularity, frames):
+        by_month = {}
+        for day, frame in frames:
+            number = day_number(day)
+            by_month.setdefault(number // 100, []).append((number, frame))
+        for month, month_frames in sorted(by_month.items()):
+            self.write_partition(self.partition(instrument, granularity, month), month_frames)
+
+    def write_partition(self, path, frames):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.locked(path):
+            new_days = {number for number, _ in frames}
+            parts = []
+            days = set()
+            if os.path.exists(path):
+                existing = pq.read_table(path)
+                metadata = existing.schema.metadata or {}
+                days = set(json.loads(metadata.get(days_metadata_key, b'[]'))) - new_days
+                existing = existing.to_pandas()
+                parts.append(existing[~existing['day'].isin(new_days)])
+
+            for number, frame in frames:
+                part = frame.reset_index()
+                part.insert(0, 'day', np.int32(number))
+                parts.append(part[['day', 'time_of_day'] + price_names])
+            days |= new_days
+
+            merged = pd.concat(parts, ignore_index=True)
+            merged = merged.astype({'day': np.int32, 'time_of_day': np.int64})
+            merged = merged.sort_values(['day', 'time_of_day'], kind='stable')
+            table = pa.Table.from_pandas(merged, preserve_index=False)
+            table = table.replace_schema_metadata({
+                **(table.schema.metadata or {}),
+                days_metadata_key: json.dumps(sorted(days)).encode(),
+            })
+
+            # readers never see a half written partition, only the old or the new file
+            handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            os.close(handle)
+            try:
+                pq.write_table(table, temp_path)
+                os.replace(temp_path, path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+
+    @contextmanager
+    def locked(self, path):
+        with open(path + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def close(self):
+        self.known_days.clear()
+
+
+def open_store(location):
+    if not isinstance(location, str):
+        return location
+    if location.endswith('.h5'):
+        return HDFCandleStore(location)
+    return ParquetCandleStore(location)
+
+
+def parse_day_key(key):
+    # day keys are instrument + granularity + YYYYMMDD, e.g. EUR_USDM520180102
+    key = key.lstrip('/')
+    day, rest = key[-8:], key[:-8]
+    split = rest.rfind('_') + 4
+    instrument, granularity = rest[:split], rest[split:]
+    if not day.isdigit() or split < 4 or granularity not in granularity_seconds:
+        raise ValueError('not a candle day key: ' + key)
+    return instrument, granularity, int(day)
+
+
+def migrate_hdf(h5_path, target):
+    source = pd.HDFStore(h5_path, mode='r')
+    groups = {}
+    try:
+        for key in source.keys():
+            try:
+                instrument, granularity, day = parse_day_key(key)
+            except ValueError:
+                print('skipping ' + key)
+                continue
+            groups.setdefault((instrument, granularity), []).append((day, source[key]))
+    finally:
+        source.close()
+
+    for (instrument, granularity), frames in sorted(groups.items()):
+        target.write_days(instrument, granularity, frames)
+    return sum(len(frames) for frames in groups.values())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='candle store maintenance')
+    commands = parser.add_subparsers(dest='command', required=True)
+    migrate = commands.add_parser('migrate', help='copy an HDF5 day-key store into a parquet store')
+    migrate.add_argument('source')
+    migrate.add_argument('target')
+    args = parser.parse_args(argv)
+
+    if args.command == 'migrate':
+        count = migrate_hdf(args.source, ParquetCandleStore(args.target))
+        print('migrated %d days' % count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+import json
+import os
+import struct
+import tempfile
+import numpy as np
+import pandas as pd
+
+magic = b'MIDASEP1'
+alignment = 64
+
+
+def aligned(position):
+    return -(-position // alignment) * alignment
+
+
+def save_days(days, path, dtype='float64', metadata=None):
+    if len(days) == 0:
+        raise ValueError('no days to save')
+    columns = [str(column) for column in days[0].columns]
+    for day in days:
+        if [str(column) for column in day.columns] != columns:
+            raise ValueError('all days need the same columns')
+
+    lengths = [len(day) for day in days]
+    rows = int(sum(lengths))
+    dtype = np.dtype(dtype)
+    header = {
+        'columns': columns,
+        'dtype': dtype.str,
+        'rows': rows,
+        'offsets': np.concatenate([[0], np.cumsum(lengths)]).astype(int).tolist(),
+        'index_name': days[0].index.name,
+        'metadata': metadata or {},
+    }
+    encoded = json.dumps(header).encode()
+    index_offset = aligned(len(magic) + 8 + len(encoded))
+    data_offset = aligned(index_offset + rows * 8)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as out:
+            out.write(magic)
+            out.write(struct.pack('<Q', len(encoded)))
+            out.write(encoded)
+            out.seek(index_offset)
+            for day in days:
+                out.write(np.ascontiguousarray(day.index.to_numpy(), dtype='<i8').tobytes())
+            out.seek(data_offset)
+            for day in days:
+                out.write(np.ascontiguousarray(day.to_numpy(), dtype=dtype).tobytes())
+        # a partially written file is never visible under the final name
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+def read_header(path):
+    with open(path, 'rb') as source:
+        if source.read(len(magic)) != magic:
+            raise ValueError(path + ' is not an episode file')
+        length, = struct.unpack('<Q', source.read(8))
+        header = json.loads(source.read(length))
+    header['index_offset'] = aligned(len(magic) + 8 + length)
+    header['data_offset'] = aligned(header['index_offset'] + header['rows'] * 8)
+    return header
+
+
+class ArrayDays:
+    def __init__(self, index, data, offsets, columns, index_name=None, metadata=None):
+        # many trading days in one (rows, columns) array, day i is rows offsets[i]:offsets[i + 1]
+        self.index = index
+        self.data = data
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.columns = list(columns)
+        self.index_name = index_name
+        self.metadata = metadata or {}
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        start, stop = self.bounds(i)
+        return pd.DataFrame(self.data[start:stop], columns=self.columns, copy=False,
+                            index=pd.Index(self.index[start:stop], name=self.index_name, copy=False))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def bounds(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('day index out of range')
+        return int(self.offsets[i]), int(self.offsets[i + 1])
+
+    def array(self, i):
+        start, stop = self.bounds(i)
+        return self.data[start:stop]
+
+
+def pack_days(days, dtype='float64', metadata=None):
+    # copies a list of days into one contiguous ArrayDays
+    if len(days) == 0:
+        return ArrayDays(np.zeros(0, dtype=np.int64), np.zeros((0, 0), dtype=dtype), [0], [],
+                         metadata=metadata)
+    lengths = [len(day) for day in days]
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+    columns = [str(column) for column in days[0].columns]
+    data = np.empty((offsets[-1], len(columns)), dtype=dtype)
+    index = np.empty(offsets[-1], dtype=np.int64)
+    for i, day in enumerate(days):
+        data[offsets[i]:offsets[i + 1]] = day.to_numpy()
+        index[offsets[i]:offsets[i + 1]] = day.index.to_numpy()
+    # every episode is a view of the packed days, so they are read-only like MappedDays
+    data.flags.writeable = False
+    index.flags.writeable = False
+    return ArrayDays(index, data, offsets, columns, days[0].index.name, metadata)
+
+
+class MappedDays(ArrayDays):
+    def __init__(self, path):
+        self.path = path
+        header = read_header(path)
+        rows = header['rows']
+        columns = header['columns']
+        index = np.memmap(path, dtype='<i8', mode='r', offset=header['index_offset'], shape=(rows,))
+        data = np.memmap(path, dtype=np.dtype(header['dtype']), mode='r',
+                         offset=header['data_offset'], shape=(rows, len(columns)))
+        super().__init__(index, data, header['offsets'], columns, header['index_name'], header['metadata'])
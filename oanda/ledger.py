@@ -0,0 +1,106 @@
+import numpy as np
+from . oanda_env import quote_signals
+
+ASK_CLOSE, BID_CLOSE, ASK_HIGH, BID_HIGH, ASK_LOW, BID_LOW = range(len(quote_signals))
+
+
+class Ledger:
+    def __init__(self, accounts, balance=1000, volume=2000, stop_loss=0.0005, take_profit=0.0015):
+        # Account and Order for many accounts at once, one array per field;
+        # order_type 0 means the account has no open order
+        self.accounts = accounts
+        self.volume = volume
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+        self.initial_balance = np.full(accounts, float(balance))
+        self.current_balance = np.full(accounts, float(balance))
+        self.realized_pl = np.zeros(accounts)
+        self.unrealized_pl = np.zeros(accounts)
+        self.order_type = np.zeros(accounts, dtype=np.int64)
+        self.order_price = np.zeros(accounts)
+        self.initial_spread = np.zeros(accounts)
+        self.profit_loss = np.zeros(accounts)
+        # orders closed by the last step and their final profit_loss
+        self.closed = np.zeros(accounts, dtype=bool)
+        self.closed_pl = np.zeros(accounts)
+
+    def reset(self, accounts=slice(None)):
+        self.current_balance[accounts] = self.initial_balance[accounts]
+        for field in (self.realized_pl, self.unrealized_pl, self.order_price, self.initial_spread,
+                      self.profit_loss, self.closed_pl):
+            field[accounts] = 0.0
+        self.order_type[accounts] = 0
+        self.closed[accounts] = False
+
+    def outcome(self, quotes, order_type):
+        # Order.update for every account: profit_loss and whether TP or SL finished it
+        buy = order_type == 1
+        close = np.where(buy, quotes[:, ASK_CLOSE], quotes[:, BID_CLOSE])
+        favourable = np.where(buy, quotes[:, ASK_HIGH], quotes[:, BID_LOW])
+        adverse = np.where(buy, quotes[:, ASK_LOW], quotes[:, BID_HIGH])
+        move = (close - self.order_price) * order_type
+        hits_tp = np.maximum(move, (favourable - self.order_price) * order_type) >= self.take_profit
+        hits_sl = np.maximum(-move, -((adverse - self.order_price) * order_type)) >= self.stop_loss
+        spread_cost = self.initial_spread * self.volume
+        profit_loss = np.where(hits_tp, (self.take_profit * self.volume) - spread_cost,
+                               np.where(hits_sl, -(self.stop_loss * self.volume) - spread_cost,
+                                        ((close - self.order_price) * self.volume) * order_type - spread_cost))
+        return profit_loss, hits_tp | hits_sl
+
+    def step(self, actions, quotes):
+        # actions in {-1, 0, 1} as in Episode, quotes is (accounts, 6) in quote_signals order
+        actions = np.asarray(actions)
+        quotes = np.asarray(quotes, dtype=np.float64)
+        has_order = self.order_type != 0
+        opening = ~has_order & (actions != 0)
+        reversing = has_order & (actions == -self.order_type)
+        updating = has_order & ~reversing
+
+        profit_loss, finished = self.outcome(quotes, self.order_type)
+        finished = updating & finished
+        closing = reversing | finished
+        self.profit_loss = np.where(has_order, profit_loss, self.profit_loss)
+        self.realized_pl = np.where(closing, self.realized_pl + profit_loss, self.realized_pl)
+        self.current_balance = np.where(closing, self.current_balance + profit_loss, self.current_balance)
+        # a stop or take profit leaves unrealized_pl at its last value, like Account.update
+        self.unrealized_pl = np.where(reversing, 0.0,
+                                      np.where(updating & ~finished, profit_loss, self.unrealized_pl))
+        self.closed = closing
+        self.closed_pl = np.where(closing, profit_loss, 0.0)
+        self.order_type = np.where(closing, 0, self.order_type)
+
+        # new orders open at the close of their side and start out down the spread
+        if opening.any():
+            buy = actions == 1
+            price = np.where(buy, quotes[:, ASK_CLOSE], quotes[:, BID_CLOSE])
+            spread = quotes[:, ASK_CLOSE] - quotes[:, BID_CLOSE]
+            opened_pl = (((price - price) * self.volume) * actions) - spread * self.volume
+            self.order_type = np.where(opening, actions, self.order_type)
+            self.order_price = np.where(opening, price, self.order_price)
+            self.initial_spread = np.where(opening, spread, self.initial_spread)
+            self.profit_loss = np.where(opening, opened_pl, self.profit_loss)
+            self.unrealized_pl = np.where(opening, opened_pl, self.unrealized_pl)
+        return self.closed_pl
+
+    def replay(self, actions, quotes):
+        # steps (steps, accounts) actions through (steps, accounts, 6) quotes and records every step
+        actions = np.asarray(actions)
+        trajectory = Trajectory(len(actions), self.accounts)
+        for step in range(len(actions)):
+            self.step(actions[step], quotes[step])
+            trajectory.record(step, self)
+        return trajectory
+
+
+class Trajectory:
+    # the account fields of a Ledger after every step, (steps, accounts) arrays
+    fields = ('current_balance', 'realized_pl', 'unrealized_pl', 'order_type', 'profit_loss', 'closed_pl')
+
+    def __init__(self, steps, accounts):
+        for field in self.fields:
+            dtype = np.int64 if field == 'order_type' else np.float64
+            setattr(self, field, np.zeros((steps, accounts), dtype=dtype))
+
+    def record(self, step, ledger):
+        for field in self.fields:
+            getattr(self, field)[step] = getattr(ledger, field)
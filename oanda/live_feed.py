@@ -0,0 +1,156 @@
+import time as clock
+import numpy as np
+from core.indicators import LiveIndicators
+from core.scaling import get_scaler
+from . candle_store import price_names
+from . oanda_candles_api import decode_candles
+from . oanda_env import Account, raw_signals, drop_signals, quote_signals
+from . preprocessing import denoise_array
+from . request_planner import granularity_seconds
+from . rewards import FinishedTradeRewards, reward_factory
+
+# the columns add_indicators appends to a day
+indicator_names = ['ao', 'rsi', 'atr', 'ema13', 'ema35']
+
+
+def candle_day(candle):
+    return int(candle['time'][:10].replace('-', ''))
+
+
+class LiveFeed:
+    def __init__(self, api, instrument='EUR_USD', granularity='S5', window_size=32, scaler='minmax',
+                 reward_policy=None, count=500):
+        # polls api for completed candles, appends them to api.store and keeps the
+        # observation of the newest window ready for an agent
+        self.api = api
+        self.instrument = instrument
+        self.granularity = granularity
+        self.window_size = window_size
+        self.scaler = get_scaler(scaler)
+        # like the envs, reward_policy is a class, factory or instance
+        self.reward_policy = reward_factory(reward_policy or FinishedTradeRewards)()
+        self.count = count
+        self.last_time = None
+        self.day = None
+        self.latencies = []
+
+        columns = price_names + indicator_names
+        self.raw_columns = [columns.index(name) for name in raw_signals]
+        self.market_columns = [i for i, name in enumerate(columns) if name not in drop_signals]
+        self.quote_columns = [columns.index(name) for name in quote_signals]
+
+        # enriched rows, written twice so rows[head:head + window_size + 1] is the window in order
+        self.rows = np.zeros((2 * (window_size + 1), len(columns)))
+        self.head = 0
+        self.filled = 0
+        self.indicators = LiveIndicators()
+        self.quote = None
+
+        self.account = Account(1000, 20)
+        self.history = np.zeros((2 * window_size, 4))
+        self.history_head = 0
+
+    def parameters(self):
+        parameters = {'price': 'BA', 'granularity': self.granularity, 'count': self.count}
+        if self.last_time is not None:
+            parameters['from'] = self.last_time
+            parameters['includeFirst'] = 'False'
+        return parameters
+
+    def poll(self):
+        # returns how many completed candles arrived since the last poll
+        candles = self.api.get_candles(self.instrument, self.parameters())
+        complete = []
+        for candle in candles:
+            if not candle.get('complete', True):
+                break
+            complete.append(candle)
+        if not complete:
+            return 0
+
+        started = clock.perf_counter()
+        frame = decode_candles(complete)
+        days = np.array([candle_day(candle) for candle in complete])
+        boundaries = np.flatnonzero(np.diff(days)) + 1
+        for start, stop in zip(np.concatenate([[0], boundaries]), np.concatenate([boundaries, [len(days)]])):
+            self.append(int(days[start]), frame.iloc[start:stop])
+        self.last_time = complete[-1]['time']
+        self.latencies.append(clock.perf_counter() - started)
+        return len(complete)
+
+    def append(self, day, frame):
+        if day != self.day:
+            if self.day is not None:
+                self.api.store.compact_live(self.instrument, self.granularity, self.day)
+            self.start_day(day)
+        self.api.store.append_candles(self.instrument, self.granularity, day, frame)
+        for prices in frame[price_names].to_numpy():
+            self.push(prices)
+
+    def start_day(self, day):
+        # indicators and windows restart every day, as add_indicators does per trading day
+        self.day = day
+        self.indicators = LiveIndicators()
+        self.head = 0
+        self.filled = 0
+
+    def push(self, prices):
+        values = self.indicators.update_candle(dict(zip(price_names, prices)))
+        row = np.concatenate([prices, [values[name] for name in indicator_names]])
+        if np.isnan(row).any():
+            return
+        rows = self.window_size + 1
+        self.rows[self.head] = row
+        self.rows[self.head + rows] = row
+        self.head = (self.head + 1) % rows
+        self.filled += 1
+        self.quote = dict(zip(quote_signals, row[self.quote_columns].tolist()))
+
+    def ready(self):
+        return self.filled > self.window_size
+
+    def market_window(self):
+        return self.rows[self.head:self.head + self.window_size + 1]
+
+    def observe(self):
+        # same market_state and env_state as ArrayEpisode on the newest window
+        if not self.ready():
+            return None
+        window = self.market_window()
+        smooth = denoise_array(window[:, self.raw_columns])[:window.shape[0]]
+        market = np.hstack([window[1:, self.market_columns], np.diff(smooth, axis=0)])
+        return {
+            'market_state': self.scaler(market, axis=0, out=market),
+            'env_state': self.scaler(self.recent_history(), axis=0),
+        }
+
+    def recent_history(self):
+        return self.history[self.history_head:self.history_head + self.window_size]
+
+    def act(self, action):
+        if action == 0:
+            self.account.update(self.quote)
+        else:
+            self.account.place_order(self.quote, action)
+        order = self.account.current_order
+        record = (action, 0 if order is None else order.order_type,
+                  self.account.unrealized_pl, self.account.realized_pl)
+        self.history[self.history_head] = record
+        self.history[self.history_head + self.window_size] = record
+        self.history_head = (self.history_head + 1) % self.window_size
+        return self.reward_policy.calc_reward(self.account)
+
+    def run(self, agent, interval=None, bars=None):
+        # agent(observation) -> action, called once per poll that brought new candles;
+        # interval defaults to the candle length
+        if interval is None:
+            interval = granularity_seconds[self.granularity]
+        acted = 0
+        while bars is None or acted < bars:
+            started = clock.perf_counter()
+            if self.poll() and self.ready():
+                self.act(agent(self.observe()))
+                self.latencies[-1] = clock.perf_counter() - started
+                acted += 1
+            clock.sleep(max(0, interval - (clock.perf_counter() - started)))
+        return acted
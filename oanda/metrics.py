@@ -0,0 +1,114 @@
+import cProfile
+import json
+import pstats
+import threading
+import time as clock
+from contextlib import contextmanager, nullcontext
+
+# returned by timer() while metrics are off, so timing a phase costs one call
+no_timer = nullcontext()
+
+
+class Timer:
+    __slots__ = ('metrics', 'name', 'started')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = clock.perf_counter()
+
+    def __exit__(self, *exc):
+        self.metrics.add_time(self.name, clock.perf_counter() - self.started)
+
+
+class Metrics:
+    def __init__(self, enabled=False, verbose=False):
+        # enabled turns on timers and counters, verbose the progress messages
+        self.enabled = enabled
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.profiler = None
+        self.reset()
+
+    def reset(self):
+        self.seconds = {}
+        self.calls = {}
+        self.counters = {}
+        self.started = clock.perf_counter()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+        return self
+
+    def timer(self, name):
+        if not self.enabled:
+            return no_timer
+        return Timer(self, name)
+
+    def add_time(self, name, seconds):
+        with self.lock:
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count(self, name, value=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def log(self, message):
+        if self.verbose:
+            print(message)
+
+    def rate(self, hits, misses):
+        total = self.counters.get(hits, 0) + self.counters.get(misses, 0)
+        return self.counters.get(hits, 0) / total if total else None
+
+    def snapshot(self):
+        with self.lock:
+            timers = {name: {'seconds': seconds, 'calls': self.calls[name],
+                             'mean': seconds / self.calls[name]}
+                      for name, seconds in self.seconds.items()}
+            counters = dict(self.counters)
+        elapsed = clock.perf_counter() - self.started
+        http = timers.get('http', {})
+        return {
+            'elapsed': elapsed,
+            'timers': timers,
+            'counters': counters,
+            'steps_per_second': counters.get('steps', 0) / elapsed if elapsed else None,
+            'store_hit_rate': self.rate('store.hits', 'store.misses'),
+            'observation_cache_hit_rate': self.rate('observation_cache.hits', 'observation_cache.misses'),
+            'http_latency': http.get('mean'),
+        }
+
+    def to_json(self, path=None):
+        encoded = json.dumps(self.snapshot(), indent=2, sort_keys=True)
+        if path is not None:
+            with open(path, 'w') as out:
+                out.write(encoded)
+        return encoded
+
+    def start_profile(self):
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def stop_profile(self, path=None):
+        # path gets a pstats file for snakeviz, pstats or gprof2dot
+        self.profiler.disable()
+        if path is not None:
+            self.profiler.dump_stats(path)
+        return pstats.Stats(self.profiler)
+
+    @contextmanager
+    def profile(self, path=None):
+        self.start_profile()
+        try:
+            yield self.profiler
+        finally:
+            self.stop_profile(path)
+
+
+# shared by everything created without metrics; it records nothing and prints nothing
+silent = Metrics()
@@ -1,140 +1,249 @@
+import os
+import threading
+import time as clock
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 import requests as http
+from requests.adapters import HTTPAdapter
 import numpy as np
 import pandas as pd
 import arrow as time
+from . request_planner import plan_windows, max_candles
+from . candle_store import open_store
+from . panel import PanelLoader
+from . resampling import resample_days
+from . sessions import SessionCalendar
+from . metrics import Metrics
+
+price_columns = [('ask', 'o', 'ask_open'), ('bid', 'o', 'bid_open'),
+                 ('ask', 'c', 'ask_close'), ('bid', 'c', 'bid_close'),
+                 ('ask', 'h', 'ask_high'), ('bid', 'h', 'bid_high'),
+                 ('ask', 'l', 'ask_low'), ('bid', 'l', 'bid_low')]
+
+# byte offsets of the HHmmss digits in an RFC3339 candle time
+# like 2018-01-02T13:04:05.000000000Z
+time_digits = [11, 12, 14, 15, 17, 18]
+time_weights = np.array([100000, 10000, 1000, 100, 10, 1], dtype=np.int64)
+
+
+# candles lived in one HDF5 file before the parquet store
+legacy_store = 'oanda_api_store.h5'
+
+
+def default_store():
+    # keep reading an unmigrated HDF5 store instead of downloading every day again
+    if os.path.exists(legacy_store) and not os.path.exists('oanda_candles'):
+        print('reading candles from %s, migrate them with: '
+              'python -m oanda.candle_store migrate %s oanda_candles' % (legacy_store, legacy_store))
+        return legacy_store
+    return 'oanda_candles'
+
+
+def decode_candles(candles):
+    rows = [(candle['time'], (candle['ask']['o'], candle['bid']['o'],
+                              candle['ask']['c'], candle['bid']['c'],
+                              candle['ask']['h'], candle['bid']['h'],
+                              candle['ask']['l'], candle['bid']['l']))
+            for candle in candles]
+    times = [row[0] for row in rows]
+    prices = np.array([row[1] for row in rows], dtype=np.float64)
+    prices = prices.reshape(len(rows), len(price_columns))
+
+    index = pd.Index(parse_time_of_day(times), name='time_of_day')
+    columns = [name for _, _, name in price_columns]
+    return pd.DataFrame(prices, index=index, columns=columns)
+
+
+def parse_time_of_day(times):
+    if len(times) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    raw = np.array(times, dtype=np.bytes_)
+    width = raw.dtype.itemsize
+    chars = raw.view(np.uint8).reshape(len(raw), width)
+    fixed_width = (width > 19 and (chars[:, -1] == ord('Z')).all()
+                   and (chars[:, 10] == ord('T')).all()
+                   and (chars[:, 13] == ord(':')).all()
+                   and (chars[:, 16] == ord(':')).all())
+
+    if fixed_width:
+        digits = chars[:, time_digits].astype(np.int64) - ord('0')
+        return digits @ time_weights
+
+    # anything that is not the fixed nanosecond UTC layout goes through pandas
+    stamps = pd.to_datetime(pd.Series(times), utc=True, format='ISO8601')
+    time_of_day = (stamps.dt.hour * 10000 + stamps.dt.minute * 100 +
+                   stamps.dt.second)
+    return time_of_day.to_numpy(dtype=np.int64)
+
+
+class RateLimiter:
+    def __init__(self, requests_per_second=None):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0
+        self.next_slot = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = clock.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            clock.sleep(slot - now)
 
 
 class CandlesAPI:
-    def __init__(self, config):
+    def __init__(self, config, metrics=None):
         self.config = config
-        self.store = pd.HDFStore('oanda_api_store.h5')
-        self.time_format = 'YYYY-MM-DDTHH:mm:ss.SSSSSSSSZ'
-        self.inst_base_url = 'https://api-fxpractice.oanda.com/v3/instruments/'
+        self.metrics = metrics or Metrics(verbose=config.get('verbose', False))
+        self.store = open_store(config['store'] if 'store' in config else default_store())
+        self.time_format = 'YYYY-MM-DDTHH:mm:ss.SSSSSSSSZ'
+        self.inst_base_url = config.get(
+            'inst_base_url', 'https://api-fxpractice.oanda.com/v3/instruments/')
+
+        self.max_candles = config.get('max_candles', max_candles)
+        self.concurrency = config.get('concurrency', 4)
+        self.max_retries = config.get('max_retries', 5)
+        self.backoff = config.get('backoff', 0.5)
+        self.rate_limiter = RateLimiter(config.get('requests_per_second'))
+        self.calendar = SessionCalendar(holidays=config.get('holidays', ((1, 1), (12, 25))))
+
+        self.session = http.Session()
+        self.session.headers['Authorization'] = config['token']
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
 
     # TODO fix the timing for this
+    def trading_days(self, start, end):
+        # every UTC day with part of an FX session, Sunday evenings included
+        return self.calendar.trading_days(time.Arrow.range('day', start, end))
+
     def load_period(self, instrument, granularity, start, end):
-        time_range = time.Arrow.range('day', start, end)
+        trading_days = self.trading_days(start, end)
 
-        trading_days = [
-            day for day in time_range if day.format('d') not in ['6', '7']
+        # fetch every missing day through one pool, decode and store them a month at a time
+        # as their requests come back, so days fetched before a failure are kept
+        missing = [
+            day for day in trading_days
+            if not self.store.contains(instrument, granularity, day)
         ]
+        self.metrics.count('store.hits', len(trading_days) - len(missing))
+        self.metrics.count('store.misses', len(missing))
+        requests = [
+            self.day_requests(day, granularity, "BA") for day in missing
+        ]
+        results = self.fetch_iter(instrument, [parameters for chunk in requests for parameters in chunk])
+        fetched = []
+        try:
+            for day, chunk in zip(missing, requests):
+                values = []
+                for _ in chunk:
+                    values.extend(next(results))
+                if fetched and (fetched[-1][0].year, fetched[-1][0].month) != (day.year, day.month):
+                    self.store.write_days(instrument, granularity, fetched)
+                    fetched = []
+                fetched.append((day, decode_candles(values)))
+        finally:
+            results.close()
+            if fetched:
+                self.store.write_days(instrument, granularity, fetched)
 
-        signals = []
-        for i in range(len(trading_days)):
-            day = trading_days[i]
-            print(day)
-            values = self.load(day, instrument, granularity)
-            signals.append(values)
-        return signals
+        for day in trading_days:
+            self.metrics.log(day)
+        with self.metrics.timer('store.read'):
+            return self.store.read_days(instrument, granularity, trading_days)
 
     def load(self, day, instrument, granularity):
-        day_key = instrument + granularity + day.format('YYYYMMDD')
-        if day_key not in self.store:
-
-            if granularity == 'M5':
-                values = self.load_day(day, instrument, granularity, "BA")
-            elif granularity == 'S5' or granularity == 'S30':
-                values = self.load_day_by_hour(day, instrument, granularity, "BA")
-
-            day_ask_close = pd.Series([
-                float(candle['ask']['c']) for candle in values
-            ]).rename('ask_close')
-            day_bid_close = pd.Series([
-                float(candle['bid']['c']) for candle in values
-            ]).rename('bid_close')
-            day_ask_open = pd.Series([
-                float(candle['ask']['o']) for candle in values
-            ]).rename('ask_open')
-            day_bid_open = pd.Series([
-                float(candle['bid']['o']) for candle in values
-            ]).rename('bid_open')
-            day_ask_high = pd.Series([
-                float(candle['ask']['h']) for candle in values
-            ]).rename('ask_high')
-            day_bid_high = pd.Series([
-                float(candle['bid']['h']) for candle in values
-            ]).rename('bid_high')
-            day_ask_low = pd.Series([
-                float(candle['ask']['l']) for candle in values
-            ]).rename('ask_low')
-            day_bid_low = pd.Series([
-                float(candle['bid']['l']) for candle in values
-            ]).rename('bid_low')
-
-            time_of_day = pd.Series([
-                int(
-                    time.get(candle['time'],
-                             self.time_format).format('HHmmss'))
-                for candle in values
-            ]).rename('time_of_day')
-
-            signals = [
-                time_of_day, day_ask_open, day_bid_open, day_ask_close,
-                day_bid_close, day_ask_high, day_bid_high, day_ask_low,
-                day_bid_low
-            ]
-
-            raw_day = pd.concat(signals, axis=1).set_index('time_of_day')
-
-            self.store[day_key] = raw_day
+        if not self.store.contains(instrument, granularity, day):
+            self.metrics.count('store.misses')
+            raw_day = decode_candles(self.load_day(day, instrument, granularity, "BA"))
+            self.store.write_days(instrument, granularity, [(day, raw_day)])
             return raw_day
         else:
-            raw_day = self.store[day_key]
+            self.metrics.count('store.hits')
+            raw_day = self.store.read_days(instrument, granularity, [day])[0]
             return raw_day
 
-    # TODO fix this
-    def resample(self, signals):
-        [signal for signal in signals if len(signal) > 128]
-        sec_interval = 30
-        steps = 24 * 60 * 2  # 2 for S30, 12 for S5
-        steps = np.arange(steps)
-        new_index = [
-            int(
-                start.shift(seconds=int(step * sec_interval)).format('HHmmss'))
-            for step in steps
-        ]
-        signals = [
-            signal.reindex(new_index).fillna(method='backfill')
-            for signal in signals
-        ]
-        return signals
+    def load_resampled(self, instrument, granularity, start, end, fill='ffill', limit=None,
+                       mark_missing=False):
+        # the stored days on a fixed grid over each day's session, see oanda.resampling
+        days = self.load_period(instrument, granularity, start, end)
+        return resample_days(days, granularity, self.trading_days(start, end), self.calendar,
+                             fill, limit, mark_missing)
 
-    def load_day(self, day, instrument, granularity, price):
+    def load_panel(self, series, start, end):
+        # several instruments and granularities aligned on the first one, see oanda.panel
+        return PanelLoader(self, series).load(start, end)
+
+    def day_requests(self, day, granularity, price):
+        windows = plan_windows(day, day.shift(days=1), granularity, self.max_candles)
+        return [self.candle_parameters(start, end, granularity, price)
+                for start, end in windows]
+
+    def candle_parameters(self, start, end, granularity, price):
         time_format = 'YYYY-MM-DDTHH:mm:ssZ'
-        base_uri = self.inst_base_url + instrument + "/candles"
-        headers = {"Authorization": self.config['token']}
-        parameters = {
-            "from": day.format(time_format),
-            "to": day.shift(days=1).format(time_format),
+        return {
+            "from": start.format(time_format),
+            "to": end.format(time_format),
             "price": price,
             "granularity": granularity,
             "includeFirst": "True",
         }
-        response = http.get(
-            base_uri, params=parameters, headers=headers).json()
-        # print(response)
-        return response['candles']
 
-    def load_day_by_hour(self, day, instrument, granularity, price):
-        time_format = 'YYYY-MM-DDTHH:mm:ssZ'
+    def fetch(self, instrument, requests):
+        return list(self.fetch_iter(instrument, requests))
+
+    def fetch_iter(self, instrument, requests):
+        # results in request order, with only a few requests per connection ahead of the
+        # one being consumed, so a long period is never held in memory all at once
+        if self.concurrency <= 1 or len(requests) <= 1:
+            for parameters in requests:
+                yield self.get_candles(instrument, parameters)
+            return
+        requests = iter(requests)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            pending = deque(pool.submit(self.get_candles, instrument, parameters)
+                            for parameters in islice(requests, 2 * self.concurrency))
+            try:
+                while pending:
+                    result = pending.popleft().result()
+                    for parameters in islice(requests, 1):
+                        pending.append(pool.submit(self.get_candles, instrument, parameters))
+                    yield result
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def get_candles(self, instrument, parameters):
         base_uri = self.inst_base_url + instrument + "/candles"
-        headers = {"Authorization": self.config['token']}
-        start = day
-        end = day.shift(days=1)
-        hours = time.Arrow.range('hour', start, end)
-        results = []
-        for i in range(len(hours) - 1):
-            hour = hours[i]
-            # print(hour)
-            parameters = {
-                "from": hour.format(time_format),
-                "to": hour.shift(hours=1).format(time_format),
-                "price": price,
-                "granularity": granularity,
-                "includeFirst": "True",
-            }
-            response = http.get(
-                base_uri, params=parameters, headers=headers).json()
-            # print(response)
-            results.append(response['candles'])
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait()
+            if attempt:
+                self.metrics.count('http.retries')
+            try:
+                with self.metrics.timer('http'):
+                    response = self.session.get(base_uri, params=parameters)
+            except http.ConnectionError:
+                if attempt == self.max_retries:
+                    raise
+                clock.sleep(self.backoff * 2 ** attempt)
+                continue
+
+            retry = response.status_code == 429 or response.status_code >= 500
+            if not retry or attempt == self.max_retries:
+                break
+            retry_after = response.headers.get('Retry-After')
+            clock.sleep(float(retry_after) if retry_after else self.backoff * 2 ** attempt)
+
+        self.metrics.count('http.requests')
+        self.metrics.count('http.bytes', len(response.content))
+        response.raise_for_status()
+        return response.json()['candles']
+
+    def load_day(self, day, instrument, granularity, price):
+        results = self.fetch(instrument, self.day_requests(day, granularity, price))
         return [item for sublist in results for item in sublist]
@@ -1,47 +1,145 @@
+import os
+from functools import partial
 import arrow as time
 import numpy as np
 import pandas as pd
 from collections import deque
-from . preprocessing import add_indicators, denoise_frame, scale_frame
-from . rewards import FinishedTradeRewards
+from core.indicators import indicator_settings
+from core.scaling import get_scaler
+from . preprocessing import add_indicators_to_days, denoise_array, denoise_frame, scale_frame
+from . rewards import FinishedTradeRewards, reward_factory
+from . episode_store import save_days, pack_days, MappedDays
+from . panel import PanelLoader
+from . sampling import EpisodeSet, Same
+from . metrics import Metrics, silent
+from . observation import MarketSignal
 
 
-class Same:
-    def __init__(self, episodes):
-        self.episodes = episodes
+raw_signals = ['ask_close', 'bid_close', 'ask_high', 'bid_high', 'ask_low', 'bid_low', 'ask_open', 'bid_open']
+drop_signals = raw_signals + ['ema13', 'ema35']
+quote_signals = ['ask_close', 'bid_close', 'ask_high', 'bid_high', 'ask_low', 'bid_low']
 
-    def next_episode(self):
-        pass
+
+def min_episode_rows(window_size):
+    # a full window and one step past it, the least an episode can step through
+    return window_size + 2
+
+
+def market_value(market_info, name):
+    # market_info is either a one row frame or a mapping of plain floats
+    value = market_info[name]
+    return value if isinstance(value, float) else value.values[0]
 
 
 class OandaEnv:
     def __init__(self, api, window_size=32,
-                 reward_policy=FinishedTradeRewards(),
-                 episode_policy=Same, verbose=False):
+                 reward_policy=FinishedTradeRewards,
+                 episode_policy=Same, verbose=False, array_backed=False, signal_mode=None,
+                 observation_cache=None, scaler='minmax', metrics=None, episode_length=None,
+                 episode_stride=None, cross_days=False):
 
         self.api = api
+        # timers and counters of every episode, see oanda.metrics; verbose prints progress.
+        # Shared with the api's by default, so one snapshot covers loading and stepping
+        self.metrics = metrics or getattr(api, 'metrics', None) or Metrics(verbose=verbose)
+        if verbose:
+            self.metrics.verbose = True
         self.window_size = window_size
         self.dimensions = 8
+        self.days = []
         self.episodes = []
+        # what the episodes were built from, written into snapshots
+        self.parameters = {}
         self.raw_days = []
-        self.reward_policy = reward_policy
+        # reward_policy is a class, factory or instance, every episode gets its own copy
+        self.reward_policy = reward_factory(reward_policy)
+        # episode_policy(episodes, position) picks every next episode, see oanda.sampling;
+        # episode_index is the position, parallel workers start at different ones
+        self.episode_policy = episode_policy
+        self.policy = None
         self.episode_index = 0
+        # with an episode_length the days are cut into episodes of that many candles
+        if episode_length is not None and episode_length < min_episode_rows(window_size):
+            raise ValueError('episode_length %d is too short for window_size %d, episodes need at least %d rows'
+                             % (episode_length, window_size, min_episode_rows(window_size)))
+        self.episode_length = episode_length
+        self.episode_stride = episode_stride
+        self.cross_days = cross_days
+        # scaler: 'minmax', 'zscore', 'robust' or a function(data, axis, out), see core.scaling
+        self.scaler = scaler
+        self.episode_type = partial(Episode, scaler=scaler, metrics=self.metrics)
+        if array_backed:
+            self.episode_type = partial(ArrayEpisode, signal_mode=signal_mode,
+                                        observation_cache=observation_cache, scaler=scaler,
+                                        metrics=self.metrics)
 
-    def initialize(self, instrument='EUR_USD', granularity='M5', start=time.get("2018-01-02T00:00:00Z", 'YYYY-MM-DDTHH:mm:ss'), end=time.get("2018-02-02T00:00:00Z", 'YYYY-MM-DDTHH:mm:ss')):
-
-        days = self.api.load_period(instrument, granularity, start, end)
+    def initialize(self, instrument='EUR_USD', granularity='M5', start=time.get("2018-01-02T00:00:00Z", 'YYYY-MM-DDTHH:mm:ss'), end=time.get("2018-02-02T00:00:00Z", 'YYYY-MM-DDTHH:mm:ss'), mmap_path=None, dtype='float64', context=()):
+        # with mmap_path the enriched days are built once and shared read-only by every process;
+        # context lists more (instrument, granularity) series joined onto every candle, see oanda.panel
+        metadata = {'instrument': instrument, 'granularity': granularity,
+                    'start': start.isoformat(), 'end': end.isoformat(),
+                    'indicators': indicator_settings}
+        if context:
+            metadata['context'] = [list(series) for series in context]
+        self.parameters = metadata
+        if mmap_path is not None and os.path.exists(mmap_path):
+            episodes = MappedDays(mmap_path)
+            if episodes.metadata == metadata:
+                self.set_days(episodes)
+                return
 
-        self.episodes = [add_indicators(episode) for episode in days]
+        if context:
+            days = PanelLoader(self.api, [(instrument, granularity)] + list(context)).load(start, end)
+        else:
+            days = self.api.load_period(instrument, granularity, start, end)
 
-    def next_episode(self):
-        episode = Episode(self.episodes[self.episode_index], self.window_size, self.reward_policy)
+        with self.metrics.timer('indicators'):
+            episodes = add_indicators_to_days(days)
+        # short sessions like Sunday evening at M5 lose every candle to the indicators' warm up
+        playable = [day for day in episodes if len(day) >= min_episode_rows(self.window_size)]
+        if len(playable) < len(episodes):
+            self.metrics.log('dropped %d days too short for a window' % (len(episodes) - len(playable)))
+        episodes = playable
 
-        if self.episode_index < len(self.episodes) -1: 
-            self.episode_index += 1
+        # an empty period leaves no episodes and no file
+        if mmap_path is not None and episodes:
+            save_days(episodes, mmap_path, dtype=dtype, metadata=metadata)
+            self.set_days(MappedDays(mmap_path))
         else:
-            self.episode_index = 0
+            self.set_days(pack_days(episodes, dtype=dtype, metadata=metadata))
 
-        return episode
+    def set_days(self, days):
+        self.days = days
+        self.episodes = days
+        if self.episode_length is not None:
+            self.episodes = EpisodeSet(days, self.episode_length, self.episode_stride, self.cross_days)
+        self.policy = None
+
+    def load_episodes(self, path):
+        self.set_days(MappedDays(path))
+
+    def snapshot(self, path, dtype='float64'):
+        # every initialized day and its parameters in one file, see load_snapshot
+        save_days(self.days, path, dtype=dtype, metadata=self.parameters)
+
+    def load_snapshot(self, path):
+        # maps the file instead of fetching and enriching the days again, no api needed
+        days = MappedDays(path)
+        self.parameters = days.metadata
+        self.episode_index = 0
+        self.set_days(days)
+        return self
+
+    def sampler(self):
+        if self.policy is None or self.policy.episodes is not self.episodes:
+            self.policy = self.episode_policy(self.episodes, position=self.episode_index)
+        return self.policy
+
+    def next_episode(self):
+        return self.episode_type(self.next_trading_day(), self.window_size, self.reward_policy())
+
+    def next_trading_day(self):
+        return self.episodes[self.sampler().next_index()]
 
     def state_shape(self):
         return (self.window_size, self.dimensions)
@@ -51,8 +149,10 @@ class OandaEnv:
 
 
 class Episode:
-    def __init__(self, trading_data, win_size, reward_policy):
-        print("new episode")
+    def __init__(self, trading_data, win_size, reward_policy, scaler='minmax', metrics=silent):
+        self.metrics = metrics
+        metrics.log("new episode")
+        metrics.count('episodes')
         self.actions = [0, 1, -1]
         self.action_functions = {1: self.buy, 0: self.hold, -1: self.sell}
         self.window_size = win_size
@@ -63,6 +163,7 @@ class Episode:
         self.length = self.trading_day.shape[0] - self.window_size
         self.done = False
         self.reward_policy = reward_policy
+        self.scaler = scaler
         
         self.recent_actions = deque(np.zeros(win_size), win_size)
         self.recent_orders = deque(np.zeros(win_size), win_size)
@@ -70,11 +171,17 @@ class Episode:
         self.recent_pl = deque(np.zeros(win_size), win_size)
 
     def step(self, action):
+        with self.metrics.timer('step'):
+            return self.timed_step(action)
+
+    def timed_step(self, action):
         assert action in self.actions
         assert not self.done
         
-        self.action_functions[action]()
+        with self.metrics.timer('order'):
+            self.action_functions[action]()
         self.current_step += 1
+        self.metrics.count('steps')
         
         self.recent_actions.append(action) #is this even advisable? 
         self.recent_orders.append(0 if self.account.current_order is None else self.account.current_order.order_type)
@@ -88,15 +195,18 @@ class Episode:
         
         agent_frame = self.process_for_agent(next_frame)
 
-        reward = self.reward_policy.calc_reward(self.account) # I need a better reward strategy, like positive PL = 1 negative pl = -1
+        with self.metrics.timer('reward'):
+            reward = self.reward_policy.calc_reward(self.account) # I need a better reward strategy, like positive PL = 1 negative pl = -1
         self.done = self.account.current_balance <= 0 or self.length - self.current_step == 0  # day / week is over or money is out
         return (agent_frame, reward, self.done)
 
     def process_for_agent(self, data):
         state = {}
-        market_state = self.get_market_signal(data)
+        with self.metrics.timer('denoise'):
+            market_state = self.get_market_signal(data)
         
-        state['market_state'] = scale_frame(market_state)
+        with self.metrics.timer('scale'):
+            state['market_state'] = scale_frame(market_state, self.scaler)
         
         env_state = pd.concat([
             pd.Series(list(self.recent_actions), index=market_state.index).rename('actions'),
@@ -105,13 +215,12 @@ class Episode:
             pd.Series(list(self.recent_pl), index=market_state.index).rename('realized'),
         ], axis=1)
         
-        state['env_state'] = scale_frame(env_state)
+        with self.metrics.timer('scale'):
+            state['env_state'] = scale_frame(env_state, self.scaler)
         
         return state
         
     def get_market_signal(self, data):
-        raw_signals = ['ask_close','bid_close','ask_high','bid_high','ask_low','bid_low','ask_open','bid_open']
-        drop_signals = raw_signals + ['ema13', 'ema35']
         window_smooth = denoise_frame(data[raw_signals])
         window_smooth = window_smooth.diff()
         ema_diff = data[['ema13', 'ema35']].diff()
@@ -131,55 +240,157 @@ class Episode:
         # print("waiting..")
 
 
+class ArrayEpisode:
+    def __init__(self, trading_data, win_size, reward_policy, signal_mode=None, observation_cache=None,
+                 scaler='minmax', metrics=silent):
+        self.metrics = metrics
+        metrics.log("new episode")
+        metrics.count('episodes')
+        self.actions = [0, 1, -1]
+        self.window_size = win_size
+        self.current_step = 1
+        self.trading_day = trading_data
+        self.values = np.asarray(trading_data.to_numpy(), dtype=np.float64)
+        self.account = Account(1000, 20)
+        self.length = self.values.shape[0] - self.window_size
+        self.done = False
+        self.reward_policy = reward_policy
+        self.scaler = get_scaler(scaler)
+
+        columns = list(trading_data.columns)
+        self.raw_columns = [columns.index(name) for name in raw_signals]
+        self.market_columns = [i for i, name in enumerate(columns) if name not in drop_signals]
+        self.quote_columns = [columns.index(name) for name in quote_signals]
+        self.last_row = self.window_size - 1
+
+        # actions, orders, unrealized and realized pl; every value is written twice
+        # so history[head:head + win_size] is always the window in order
+        self.history = np.zeros((2 * win_size, 4))
+        self.head = 0
+
+        # signal_mode 'exact' or 'approximate' updates the market window one row per step
+        self.signal = None
+        if signal_mode is not None:
+            self.signal = MarketSignal(self.values, self.raw_columns, self.market_columns,
+                                       win_size, mode=signal_mode, scaler=self.scaler)
+
+        # with a cache the market_state of every step is precomputed, see observation_cache
+        self.market_tensor = None
+        if observation_cache is not None:
+            self.market_tensor = observation_cache.get(trading_data, win_size, scaler=scaler,
+                                                       metrics=metrics)
+
+    @property
+    def current_frame(self):
+        first = max(self.last_row - self.window_size, 0)
+        return self.trading_day[first:self.last_row + 1]
+
+    def step(self, action):
+        with self.metrics.timer('step'):
+            reward = self.act(action)
+            return (self.process_for_agent(), reward, self.done)
+
+    def act(self, action):
+        assert action in self.actions
+        assert not self.done
+
+        quote = dict(zip(quote_signals, self.values[self.last_row, self.quote_columns].tolist()))
+        with self.metrics.timer('order'):
+            if action == 0:
+                self.account.update(quote)
+            else:
+                self.account.place_order(quote, action)
+        self.current_step += 1
+        self.metrics.count('steps')
+        self.last_row = self.window_size + self.current_step - 1
+
+        order = self.account.current_order
+        record = (action, 0 if order is None else order.order_type,
+                  self.account.unrealized_pl, self.account.realized_pl)
+        self.history[self.head] = record
+        self.history[self.head + self.window_size] = record
+        self.head = (self.head + 1) % self.window_size
+
+        # without a policy the reward is left to a batch policy, see VecOandaEnv
+        reward = 0.0
+        if self.reward_policy is not None:
+            with self.metrics.timer('reward'):
+                reward = self.reward_policy.calc_reward(self.account)
+        self.done = self.account.current_balance <= 0 or self.length - self.current_step == 0
+        return reward
+
+    def process_for_agent(self):
+        market_state = self.market_state()
+        with self.metrics.timer('scale'):
+            env_state = self.scaler(self.recent_history(), axis=0)
+        return {'market_state': market_state, 'env_state': env_state}
+
+    def market_state(self):
+        if self.market_tensor is not None:
+            with self.metrics.timer('slice'):
+                return np.array(self.market_tensor[self.current_step - 1])
+        if self.signal is not None:
+            with self.metrics.timer('signal'):
+                return self.signal.at(self.current_step)
+        with self.metrics.timer('denoise'):
+            market = self.get_market_signal()
+        with self.metrics.timer('scale'):
+            return self.scaler(market, axis=0, out=market)
+
+    def recent_history(self):
+        return self.history[self.head:self.head + self.window_size]
+
+    def market_window(self):
+        return self.values[self.current_step - 1:self.window_size + self.current_step]
+
+    def get_market_signal(self):
+        window = self.market_window()
+        rows = window.shape[0]
+        smooth = denoise_array(window[:, self.raw_columns])[:rows]
+        return np.hstack([window[1:, self.market_columns], np.diff(smooth, axis=0)])
+
+
+# quote names per order type: closes, favourable and adverse extremes
+order_prices = {
+    1: ('ask_close', 'ask_high', 'ask_low'),
+    -1: ('bid_close', 'bid_low', 'bid_high'),
+}
+
+
 class Order:
+    __slots__ = ('order_type', 'close_name', 'favourable_name', 'adverse_name', 'order_price',
+                 'initial_spread', 'order_volume', 'stop_loss', 'take_profit', 'profit_loss',
+                 'tp_dist', 'sl_dist')
+
     def __init__(self, order_type, market_info):
-        self.choose_functions(order_type)
         self.order_type = order_type
+        self.close_name, self.favourable_name, self.adverse_name = order_prices[order_type]
         self.order_price = self.close_price(market_info)
-        self.initial_spread = market_info['ask_close'].values[0] - market_info['bid_close'].values[0]
+        self.initial_spread = market_value(market_info, 'ask_close') - market_value(market_info, 'bid_close')
         self.order_volume = 2000
         self.stop_loss = 0.0005
         self.take_profit = 0.0015
         self.profit_loss = self.calculate_pl(market_info)
         self.tp_dist = 0
         self.sl_dist = 0
-        #print("order")
-        
-    def choose_functions(self, order_type):
-        self.close_price_function = {
-            1: lambda frame: frame['ask_close'].values[0],
-            -1: lambda frame: frame['bid_close'].values[0]
-        }
-        self.high_price_function = {
-            1: lambda frame: frame['ask_high'].values[0],
-            -1: lambda frame: frame['bid_high'].values[0]
-        }
-        self.low_price_function = {
-            1: lambda frame: frame['ask_low'].values[0],
-            -1: lambda frame: frame['bid_low'].values[0]
-        }
-  
-        self.close_price = self.close_price_function[order_type]
-        self.high_price = self.high_price_function[order_type]
-        self.low_price = self.low_price_function[order_type]
-        
-        tp_functions = {
-            1: lambda market: (self.close_price(market) - self.order_price) >= self.take_profit or (self.high_price(market) - self.order_price) >= self.take_profit,
-            -1: lambda market: - (self.close_price(market) - self.order_price) >= self.take_profit or - (self.low_price(market) - self.order_price) >= self.take_profit
-        }
-        
-        sl_functions = {
-            1: lambda market: - (self.close_price(market) - self.order_price) >= self.stop_loss or - (self.low_price(market) - self.order_price) >= self.stop_loss,
-            -1: lambda market: (self.close_price(market) - self.order_price) >= self.stop_loss or (self.high_price(market) - self.order_price) >= self.stop_loss
-        }
-        
-        self.hits_tp = tp_functions[order_type]
-        self.hits_sl = sl_functions[order_type]
+
+    def close_price(self, market_info):
+        return market_value(market_info, self.close_name)
+
+    def hits_tp(self, market):
+        # best move of the close or the favourable extreme, in the order's direction
+        moves = ((self.close_price(market) - self.order_price) * self.order_type,
+                 (market_value(market, self.favourable_name) - self.order_price) * self.order_type)
+        return max(moves) >= self.take_profit
+
+    def hits_sl(self, market):
+        moves = (-((self.close_price(market) - self.order_price) * self.order_type),
+                 -((market_value(market, self.adverse_name) - self.order_price) * self.order_type))
+        return max(moves) >= self.stop_loss
 
     def calculate_pl(self, market_info):
         return (((self.close_price(market_info) - self.order_price) *
                 self.order_volume) * self.order_type) - self.initial_spread * self.order_volume
-                
 
     def calculate_tp(self, market_info):
         return (self.take_profit * self.order_volume) - self.initial_spread * self.order_volume
@@ -202,6 +413,8 @@ class Order:
 
 
 class Account:
+    __slots__ = ('initial_balance', 'current_balance', 'realized_pl', 'unrealized_pl', 'current_order')
+
     def __init__(self, balance, leverage):
         self.initial_balance = balance
         self.current_balance = balance
@@ -209,24 +422,22 @@ class Account:
         self.unrealized_pl = 0
         self.current_order = None
         # TODO consider margin
-        # print("account")
 
     def place_order(self, market_info, order_type):
         if self.current_order is None:
             self.current_order = Order(order_type, market_info)
             self.unrealized_pl = self.current_order.profit_loss
-        elif self.current_order is not None and self.current_order.order_type == -order_type:
+        elif self.current_order.order_type == -order_type:
             self.current_order.update(market_info)
             self.realized_pl += self.current_order.profit_loss
             self.unrealized_pl = 0
             self.current_balance += self.current_order.profit_loss
             self.current_order = None
-            # print("sold existing order")
         else:
             self.update(market_info)
 
     def update(self, market_info):
-        if self.current_order != None:
+        if self.current_order is not None:
             profit_loss, done = self.current_order.update(market_info)
             if done:
                 self.realized_pl += profit_loss
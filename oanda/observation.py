@@ -0,0 +1,129 @@
+import numpy as np
+from core.scaling import min_max_scale
+from . preprocessing import denoise_array
+
+
+def extrema(block):
+    # nan-aware like min_max_scale, the nan versions are slower so only when needed
+    if np.isnan(block).any():
+        return np.nanmin(block, axis=0), np.nanmax(block, axis=0)
+    return block.min(axis=0), block.max(axis=0)
+
+
+class RollingWindow:
+    def __init__(self, rows, columns):
+        # every row is written twice so buffer[head:head + rows] is the window in order
+        self.rows = rows
+        self.buffer = np.zeros((2 * rows, columns))
+        self.head = 0
+        self.minimum = np.zeros(columns)
+        self.maximum = np.zeros(columns)
+
+    def window(self):
+        return self.buffer[self.head:self.head + self.rows]
+
+    def fill(self, block):
+        self.head = 0
+        self.buffer[:self.rows] = block
+        self.buffer[self.rows:] = block
+        self.minimum, self.maximum = extrema(block)
+
+    def push(self, row, columns=slice(None)):
+        # columns limits the min/max bookkeeping, the rest is about to be overwritten
+        leaving = self.buffer[self.head].copy()
+        self.buffer[self.head] = row
+        self.buffer[self.head + self.rows] = row
+        self.head = (self.head + 1) % self.rows
+
+        # only columns whose extreme just left the window need a rescan
+        stale_min = np.zeros(len(row), dtype=bool)
+        stale_max = np.zeros(len(row), dtype=bool)
+        stale_min[columns] = leaving[columns] <= self.minimum[columns]
+        stale_max[columns] = leaving[columns] >= self.maximum[columns]
+        # fmin and fmax skip nans, a nan leaving never holds an extreme
+        self.minimum[columns] = np.fmin(self.minimum[columns], row[columns])
+        self.maximum[columns] = np.fmax(self.maximum[columns], row[columns])
+        if stale_min.any():
+            self.minimum[stale_min] = extrema(self.window()[:, stale_min])[0]
+        if stale_max.any():
+            self.maximum[stale_max] = extrema(self.window()[:, stale_max])[1]
+
+    def set_columns(self, columns, block):
+        # window row i lives at buffer rows head + i and head + i -/+ rows
+        tail = self.rows - self.head
+        self.buffer[self.head:self.rows, columns] = block[:tail]
+        self.buffer[self.head + self.rows:, columns] = block[:tail]
+        self.buffer[:self.head, columns] = block[tail:]
+        self.buffer[self.rows:self.head + self.rows, columns] = block[tail:]
+        self.minimum[columns], self.maximum[columns] = extrema(block)
+
+    def scaled(self):
+        # same arithmetic as core.scaling.min_max_scale on the window
+        data_range = self.maximum - self.minimum
+        data_range[data_range < 10 * np.finfo(np.float64).eps] = 1.0
+        scale = 1.0 / data_range
+        data = self.window() * scale
+        data += 0.0 - self.minimum * scale
+        return data
+
+
+class MarketSignal:
+    def __init__(self, values, raw_columns, market_columns, window_size,
+                 mode='exact', refresh=16, wavelet='bior6.8', scaler=min_max_scale):
+        assert mode in ('exact', 'approximate')
+        self.values = values
+        self.raw_columns = raw_columns
+        self.market_columns = market_columns
+        self.window_size = window_size
+        self.mode = mode
+        self.refresh = refresh
+        self.wavelet = wavelet
+        self.scaler = scaler
+
+        passthrough = len(market_columns)
+        self.diff_columns = list(range(passthrough, passthrough + len(raw_columns)))
+        self.rolling = RollingWindow(window_size, passthrough + len(raw_columns))
+        # below one decomposition level the wavelet leaves the window untouched,
+        # so smoothed diffs are plain diffs and never need a recompute
+        import pywt
+        level = pywt.dwt_max_level(window_size + 1, pywt.Wavelet(wavelet).dec_len)
+        self.identity = level == 0
+        self.step = None
+        self.refreshed = None
+
+    def at(self, step):
+        if self.step is not None and step == self.step + 1:
+            self.advance(step)
+        else:
+            self.rebuild(step)
+        self.step = step
+        # the rolling min and max only help min-max scaling
+        if self.scaler is min_max_scale:
+            return self.rolling.scaled()
+        return self.scaler(self.rolling.window(), axis=0)
+
+    def window(self, step):
+        return self.values[step - 1:self.window_size + step]
+
+    def smoothed_diffs(self, window):
+        rows = window.shape[0]
+        smooth = denoise_array(window[:, self.raw_columns], wavelet=self.wavelet)[:rows]
+        return np.diff(smooth, axis=0)
+
+    def rebuild(self, step):
+        window = self.window(step)
+        self.rolling.fill(np.hstack([window[1:, self.market_columns], self.smoothed_diffs(window)]))
+        self.refreshed = step
+
+    def advance(self, step):
+        row = self.window_size + step - 1
+        raw_diff = self.values[row, self.raw_columns] - self.values[row - 1, self.raw_columns]
+        new_row = np.concatenate([self.values[row, self.market_columns], raw_diff])
+        if self.identity:
+            self.rolling.push(new_row)
+        elif self.mode == 'exact' or step - self.refreshed >= self.refresh:
+            self.rolling.push(new_row, columns=slice(0, len(self.market_columns)))
+            self.rolling.set_columns(self.diff_columns, self.smoothed_diffs(self.window(step)))
+            self.refreshed = step
+        else:
+            self.rolling.push(new_row)
@@ -0,0 +1,173 @@
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import weakref
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from . episode_store import MappedDays
+from . oanda_env import raw_signals, drop_signals
+from core.scaling import get_scaler, scaler_name
+from . preprocessing import denoise_array
+from . metrics import silent
+
+# bump whenever the observation layout or arithmetic changes
+cache_format = 1
+
+
+def market_tensor(values, columns, window_size, wavelet='bior6.8', chunk=1024, scaler='minmax'):
+    # scaled market_state for every step of a day: tensor[step - 1]
+    columns = list(columns)
+    if len(values) < window_size + 1:
+        raise ValueError('a day of %d rows is too short for window_size %d, it needs at least %d rows'
+                         % (len(values), window_size, window_size + 1))
+    scaler = get_scaler(scaler)
+    raw_columns = [columns.index(name) for name in raw_signals]
+    market_columns = [i for i, name in enumerate(columns) if name not in drop_signals]
+    windows = sliding_window_view(values, window_size + 1, axis=0).transpose(0, 2, 1)
+    steps = windows.shape[0]
+    tensor = np.empty((steps, window_size, len(market_columns) + len(raw_columns)))
+    for start in range(0, steps, chunk):
+        block = windows[start:start + chunk]
+        smooth = denoise_array(block[:, :, raw_columns], wavelet=wavelet, axis=1)[:, :window_size + 1]
+        market = np.concatenate([block[:, 1:, market_columns], np.diff(smooth, axis=1)], axis=2)
+        scaler(market, axis=1, out=tensor[start:start + chunk])
+    return tensor
+
+
+def read_only_view(array):
+    # (owner, position) of a view of read-only memory such as one day of ArrayDays, else None
+    owner = array
+    while isinstance(owner.base, np.ndarray):
+        owner = owner.base
+    if owner.flags.writeable:
+        return None
+    offset = array.__array_interface__['data'][0] - owner.__array_interface__['data'][0]
+    return owner, (offset, array.shape, array.strides, array.dtype.str)
+
+
+class ObservationCache:
+    def __init__(self, directory, max_bytes=2 * 1024 ** 3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # data digests of read-only days, so repeated episodes of a day hash it once
+        self.digests = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def data_digest(self, trading_day):
+        index, values = trading_day.index.to_numpy(), trading_day.to_numpy()
+        views = [read_only_view(index), read_only_view(values)]
+        memo = None
+        if None not in views:
+            (index_owner, index_position), (owner, position) = views
+            owners = self.digests.get(id(owner))
+            if owners is None or owners[0]() is not owner:
+                ref = weakref.ref(owner, lambda _, key=id(owner): self.digests.pop(key, None))
+                owners = self.digests[id(owner)] = (ref, {})
+            memo, day = owners[1], (id(index_owner), index_position, position)
+            if day in memo and memo[day][0]() is index_owner:
+                return memo[day][1]
+
+        digest = hashlib.sha256()
+        digest.update(np.ascontiguousarray(index, dtype='<i8').tobytes())
+        digest.update(np.ascontiguousarray(values, dtype='<f8').tobytes())
+        if memo is not None:
+            memo[day] = (weakref.ref(index_owner), digest.digest())
+        return digest.digest()
+
+    def key(self, trading_day, window_size, wavelet='bior6.8', scaler='minmax'):
+        digest = hashlib.sha256()
+        parameters = {'format': cache_format, 'window_size': window_size, 'wavelet': wavelet,
+                      'scaler': scaler_name(scaler),
+                      'columns': [str(column) for column in trading_day.columns]}
+        digest.update(json.dumps(parameters, sort_keys=True).encode())
+        digest.update(self.data_digest(trading_day))
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.npy')
+
+    def get(self, trading_day, window_size, wavelet='bior6.8', scaler='minmax', metrics=silent):
+        path = self.path(self.key(trading_day, window_size, wavelet, scaler))
+        if os.path.exists(path):
+            try:
+                tensor = np.load(path, mmap_mode='r')
+                os.utime(path)
+                metrics.count('observation_cache.hits')
+                return tensor
+            except (ValueError, OSError):
+                pass
+
+        metrics.count('observation_cache.misses')
+        with metrics.timer('observation_cache.build'):
+            tensor = market_tensor(np.asarray(trading_day.to_numpy(), dtype=np.float64),
+                                   trading_day.columns, window_size, wavelet, scaler=scaler)
+        self.write(path, tensor)
+        self.evict(keep=path)
+        return np.load(path, mmap_mode='r')
+
+    def write(self, path, tensor):
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as out:
+                np.save(out, tensor)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npy'):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, os.path.join(self.directory, name)))
+        return sorted(entries)
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep=None):
+        # least recently used first; every hit refreshes the file's mtime
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='observation tensor cache')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='precompute the market tensors of an episode file')
+    build.add_argument('episodes')
+    build.add_argument('--cache', default='observation_cache')
+    build.add_argument('--window-size', type=int, default=32)
+    build.add_argument('--wavelet', default='bior6.8')
+    build.add_argument('--max-bytes', type=int, default=2 * 1024 ** 3)
+    build.add_argument('--scaler', default='minmax', choices=['minmax', 'zscore', 'robust'])
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        cache = ObservationCache(args.cache, args.max_bytes)
+        days = MappedDays(args.episodes)
+        for i, day in enumerate(days):
+            cache.get(day, args.window_size, args.wavelet, args.scaler)
+            print('day %d/%d' % (i + 1, len(days)))
+        print('cache size: %d bytes' % cache.size())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import numpy as np
+from . candle_store import price_names
+from . episode_store import ArrayDays
+from . request_planner import granularity_seconds
+
+# keys of one day never reach into the next, even for daily candles that close at 24:00
+day_span = 2 * 86400
+
+
+def seconds_of_day(time_of_day):
+    # HHmmss integers, the index of every stored day
+    time_of_day = np.asarray(time_of_day, dtype=np.int64)
+    return time_of_day // 10000 * 3600 + time_of_day // 100 % 100 * 60 + time_of_day % 100
+
+
+def close_keys(days, granularity):
+    # one sorted key per candle: the day's position, then the second the candle closes;
+    # a candle is only known once it closed, so joining on closes never looks ahead
+    seconds = granularity_seconds[granularity]
+    return np.concatenate([i * day_span + seconds_of_day(day.index.to_numpy()) + seconds
+                           for i, day in enumerate(days)])
+
+
+def as_of(keys, other_keys):
+    # row of the last other candle closed at or before every key on the same day, -1 where there is none
+    positions = np.searchsorted(other_keys, keys, side='right') - 1
+    found = positions >= 0
+    found[found] = other_keys[positions[found]] // day_span == keys[found] // day_span
+    return np.where(found, positions, -1)
+
+
+def series_prefix(instrument, granularity):
+    return '%s_%s_' % (instrument, granularity)
+
+
+def align_days(base, others, columns=price_names):
+    # base is (granularity, days), others a list of (instrument, granularity, days) covering the
+    # same trading days; returns the base days with every other series' columns joined as of
+    # each base candle's close, all in one contiguous array
+    granularity, days = base
+    lengths = [len(day) for day in days]
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+    base_columns = [str(column) for column in days[0].columns]
+    names = base_columns + [series_prefix(instrument, other_granularity) + column
+                            for instrument, other_granularity, _ in others for column in columns]
+
+    data = np.empty((offsets[-1], len(names)))
+    for i, day in enumerate(days):
+        data[offsets[i]:offsets[i + 1], :len(base_columns)] = day.to_numpy(dtype='float64')
+    index = np.concatenate([day.index.to_numpy() for day in days]).astype(np.int64)
+    keys = close_keys(days, granularity)
+
+    column = len(base_columns)
+    for instrument, other_granularity, other_days in others:
+        if len(other_days) != len(days):
+            raise ValueError('%s %s covers %d days, the base %d' % (instrument, other_granularity,
+                                                                    len(other_days), len(days)))
+        values = np.concatenate([day.to_numpy(dtype='float64')[:, day.columns.get_indexer(columns)]
+                                 for day in other_days] + [np.full((1, len(columns)), np.nan)])
+        # -1 picks the NaN row appended last
+        positions = as_of(keys, close_keys(other_days, other_granularity))
+        data[:, column:column + len(columns)] = values[positions]
+        column += len(columns)
+
+    return ArrayDays(index, data, offsets, names, days[0].index.name)
+
+
+class PanelLoader:
+    def __init__(self, api, series, columns=price_names):
+        # series is a list of (instrument, granularity), the first one sets the time index every
+        # other series is aligned to; every series is fetched and cached by api.load_period
+        if not series:
+            raise ValueError('a panel needs at least one series')
+        for _, granularity in series:
+            if granularity not in granularity_seconds:
+                raise ValueError('unsupported granularity: ' + str(granularity))
+        self.api = api
+        self.series = [tuple(pair) for pair in series]
+        self.columns = columns
+
+    def load(self, start, end):
+        loaded = [(instrument, granularity, self.api.load_period(instrument, granularity, start, end))
+                  for instrument, granularity in self.series]
+        _, granularity, days = loaded[0]
+        return align_days((granularity, days), loaded[1:], self.columns)
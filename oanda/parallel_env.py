@@ -0,0 +1,212 @@
+import multiprocessing as mp
+from multiprocessing import resource_tracker
+import traceback
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from . oanda_env import ArrayEpisode
+from . rewards import FinishedTradeRewards, reward_factory
+
+STEP, RESET, CLOSE = b's', b'r', b'c'
+
+
+def layout(num_workers, market_shape, env_shape):
+    # one shared block holding every array the workers write into
+    arrays = [
+        ('market_state', (num_workers,) + tuple(market_shape), np.float64),
+        ('env_state', (num_workers,) + tuple(env_shape), np.float64),
+        ('rewards', (num_workers,), np.float64),
+        ('dones', (num_workers,), np.bool_),
+        ('actions', (num_workers,), np.int64),
+    ]
+    offsets = []
+    size = 0
+    for name, shape, dtype in arrays:
+        offsets.append((name, shape, dtype, size))
+        size += -(-int(np.prod(shape)) * np.dtype(dtype).itemsize // 64) * 64
+    return offsets, size
+
+
+def views(block, offsets):
+    return {
+        name: np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)
+        for name, shape, dtype, offset in offsets
+    }
+
+
+def worker(index, connection, env_factory, reward_policy):
+    block = None
+    started = False
+    try:
+        env = env_factory()
+        env.episode_index = index % len(env.episodes)
+
+        def new_episode():
+            return ArrayEpisode(env.next_trading_day(), env.window_size, reward_policy(), scaler=env.scaler,
+                                metrics=env.metrics)
+
+        # probe the observation shapes without consuming a trading day
+        episode = ArrayEpisode(env.episodes[env.episode_index], env.window_size, reward_policy(),
+                               scaler=env.scaler)
+        state = episode.process_for_agent()
+        connection.send(('shapes', state['market_state'].shape, state['env_state'].shape))
+
+        name, offsets = connection.recv()
+        block = SharedMemory(name)
+        arrays = views(block, offsets)
+
+        def publish(state, reward=0.0, done=False):
+            arrays['market_state'][index] = state['market_state']
+            arrays['env_state'][index] = state['env_state']
+            arrays['rewards'][index] = reward
+            arrays['dones'][index] = done
+
+        started = True
+        connection.send_bytes(b'')
+
+        while True:
+            command = connection.recv_bytes()
+            if command == STEP:
+                reward = episode.act(int(arrays['actions'][index]))
+                done = episode.done
+                if done:
+                    episode = new_episode()
+                publish(episode.process_for_agent(), reward, done)
+            elif command == RESET:
+                episode = new_episode()
+                publish(episode.process_for_agent())
+            elif command == CLOSE:
+                break
+            connection.send_bytes(b'')
+    except (KeyboardInterrupt, EOFError):
+        pass
+    except Exception:
+        # replies are raw bytes once the shared block is attached, pickled before that
+        if started:
+            connection.send_bytes(traceback.format_exc().encode())
+        else:
+            connection.send(('error', traceback.format_exc()))
+    finally:
+        if block is not None:
+            del arrays
+            block.close()
+        connection.close()
+
+
+class WorkerError(RuntimeError):
+    pass
+
+
+class ParallelEnvRunner:
+    def __init__(self, env_factory, num_workers, reward_policy=FinishedTradeRewards, start_method=None):
+        # env_factory builds an initialized OandaEnv inside each worker process
+        context = mp.get_context(start_method)
+        # workers must share our resource tracker, otherwise each one would unlink
+        # the shared block when it exits
+        resource_tracker.ensure_running()
+        reward_policy = reward_factory(reward_policy)
+        self.num_workers = num_workers
+        self.block = None
+        self.closed = False
+        self.connections = []
+        self.processes = []
+        for index in range(num_workers):
+            parent, child = context.Pipe()
+            process = context.Process(target=worker, args=(index, child, env_factory, reward_policy),
+                                      daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+        try:
+            shapes = [self.receive_handshake(connection) for connection in self.connections]
+            if len(set(shapes)) != 1:
+                raise ValueError('workers produce different observation shapes: %s' % shapes)
+            offsets, size = layout(num_workers, *shapes[0])
+            self.block = SharedMemory(create=True, size=size)
+            self.arrays = views(self.block, offsets)
+            for connection in self.connections:
+                connection.send((self.block.name, offsets))
+            self.wait()
+        except BaseException:
+            self.close()
+            raise
+
+    def receive_handshake(self, connection):
+        try:
+            message = connection.recv()
+        except EOFError:
+            raise WorkerError('worker exited during start up')
+        if message[0] == 'error':
+            raise WorkerError(message[1])
+        return message[1:]
+
+    def exited(self, index):
+        process = self.processes[index]
+        process.join(timeout=1)
+        return WorkerError('worker %d exited with code %s' % (index, process.exitcode))
+
+    def wait(self):
+        errors = []
+        for index, connection in enumerate(self.connections):
+            try:
+                errors.append(connection.recv_bytes())
+            except (EOFError, ConnectionResetError):
+                raise self.exited(index)
+        errors = [error.decode() for error in errors if error]
+        if errors:
+            raise WorkerError(errors[0])
+
+    def broadcast(self, command):
+        for index, connection in enumerate(self.connections):
+            try:
+                connection.send_bytes(command)
+            except (BrokenPipeError, ConnectionResetError):
+                raise self.exited(index)
+        self.wait()
+
+    def observations(self):
+        return {
+            'market_state': self.arrays['market_state'].copy(),
+            'env_state': self.arrays['env_state'].copy(),
+        }
+
+    def reset(self):
+        self.broadcast(RESET)
+        return self.observations()
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        assert actions.shape == (self.num_workers,)
+        self.arrays['actions'][:] = actions
+        self.broadcast(STEP)
+        return (self.observations(), self.arrays['rewards'].copy(), self.arrays['dones'].copy())
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for connection, process in zip(self.connections, self.processes):
+            if process.is_alive():
+                try:
+                    connection.send_bytes(CLOSE)
+                except (BrokenPipeError, OSError):
+                    pass
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        for connection in self.connections:
+            connection.close()
+        if self.block is not None:
+            self.arrays = None
+            self.block.close()
+            self.block.unlink()
+            self.block = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,9 +1,9 @@
-from statsmodels.robust import mad
-from sklearn.preprocessing import MinMaxScaler
-import pywt
 import numpy as np
 import pandas as pd
-import ta
+from core.dataprep import Denoiser
+from core.indicators import indicators, mid_prices, stack
+from core.windows import WindowEngine
+from core.scaling import get_scaler
 
 
 class Component:
@@ -12,6 +12,8 @@ class Component:
         
 
 def denoise(data, wavelet='bior6.8', level=1, mode='smooth'):
+    import pywt
+    from statsmodels.robust import mad
     coeff = pywt.wavedec(data, wavelet, mode=mode)
     sigma = mad(coeff[-level])
     uthresh = sigma * np.sqrt(2 * np.log(len(data)))
@@ -20,48 +22,40 @@ def denoise(data, wavelet='bior6.8', level=1, mode='smooth'):
     return y
 
 
+def denoise_array(data, wavelet='bior6.8', level=1, mode='smooth', axis=0):
+    return Denoiser(wavelet=wavelet, mode=mode, level=level).denoise_array(data, axis=axis)
+
+
 def denoise_frame(data, wavelet='bior6.8'):
-    smoothed_signals = []
-    index = pd.Series(data.index).rename('time_of_day')
-    smoothed_signals.append(index)
-    for signal_name in data:
-        signal = data[signal_name].values
-        signal_smooth = denoise(signal, wavelet=wavelet)
-        signal_smooth = pd.Series(signal_smooth).rename(signal_name + '_' + wavelet)
-        smoothed_signals.append(signal_smooth)
-    smoothed_frame = pd.concat(smoothed_signals, axis=1) 
-    smoothed_frame = smoothed_frame.set_index('time_of_day')
-    return smoothed_frame
-
-
-def scale_frame(data):
-    scaler = MinMaxScaler(feature_range=(0, 1))
-    signals = []
-    for signal_name in data:
-        signal = data[signal_name].values
-        signal = signal.reshape(-1,1).astype('float64')
-        signal = scaler.fit_transform(signal)
-        signals.append(signal)
-    return np.concatenate(signals, axis=1)
+    return Denoiser(wavelet=wavelet).denoise_frame(data)
+
+
+def scale_frame(data, scaler='minmax'):
+    return get_scaler(scaler)(data.to_numpy(dtype='float64'), axis=0)
+
+
+def scale_array(data, axis=0, scaler='minmax'):
+    # returns a new array, see core.scaling for scaling into a caller's buffer
+    return get_scaler(scaler)(np.asarray(data, dtype='float64'), axis=axis)
 
 
 def add_indicators(day):
-    high = (day['ask_high'] + day['bid_high']) / 2
-    high = high.rename('high')
-    low = (day['ask_low'] + day['bid_low']) / 2
-    low = low.rename('low')
-    close = (day['ask_close'] + day['bid_close']) / 2
-    close = close.rename('close')
-    
-    ao = ta.momentum.ao(high, low, s=13, l=35, fillna=False).rename('ao')
-    rsi = ta.momentum.rsi(close, n=13, fillna=False).rename('rsi')
-    atr = ta.volatility.average_true_range(high, low, close, n=13, fillna=False).rename('atr')
-    ema13 = ta.trend.ema_indicator(close, n=13, fillna=False).rename('ema13')
-    ema35 = ta.trend.ema_indicator(close, n=35, fillna=False).rename('ema35')
-    all_data = pd.concat([day, ao, rsi, atr, ema13, ema35], axis=1)
-    aligned_data = all_data.dropna()
-    
-    return aligned_data
+    return add_indicators_to_days([day])[0]
+
+
+def add_indicators_to_days(days):
+    # every day is computed in one pass over a (days, candles) array
+    if len(days) == 0:
+        return []
+    prices = [[price.to_numpy(dtype='float64') for price in mid_prices(day)] for day in days]
+    high, low, close = (stack([day_prices[i] for day_prices in prices]) for i in range(3))
+    values = indicators(high, low, close)
+
+    enhanced_days = []
+    for i, day in enumerate(days):
+        columns = pd.DataFrame({name: value[i, :len(day)] for name, value in values.items()}, index=day.index)
+        enhanced_days.append(pd.concat([day, columns], axis=1).dropna())
+    return enhanced_days
     
 
 
@@ -69,23 +63,8 @@ def add_indicators(day):
 def make_windows(data, window_size = 32, step_size = 16):
     raw_signals = ['ask_close','bid_close','ask_high','bid_high','ask_low','bid_low']
     drop_signals = raw_signals + ['ask_open', 'bid_open']
-    data_x = []
-    windowed_signals = []
-
-    for i in range(len(enhanced_days)):
-        signal = enhanced_days[i]
-  
-        for j in range(1, len(signal) - window_size, step_size):
-            window_x = signal.iloc[j-1:j + window_size]
-            window_smooth = denoise_frame(window_x[raw_signals])
-            window_smooth_diff = window_smooth.diff()
-            window_x = pd.concat([window_x, window_smooth_diff], axis=1).drop(drop_signals, axis=1).dropna()
-    
-            window_x = scale_frame(window_x)
-            data_x.append(window_x)
-
-    data_x = np.array(data_x)
-    return data_x
+    engine = WindowEngine(Denoiser(), window_size, step_size, signals=raw_signals, drop=drop_signals)
+    return engine.make_windows(data)
 
 
 def split(data_x):
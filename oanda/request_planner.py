@@ -0,0 +1,34 @@
+granularity_seconds = {
+    'S5': 5, 'S10': 10, 'S15': 15, 'S30': 30,
+    'M1': 60, 'M2': 120, 'M4': 240, 'M5': 300, 'M10': 600, 'M15': 900, 'M30': 1800,
+    'H1': 3600, 'H2': 7200, 'H3': 10800, 'H4': 14400, 'H6': 21600, 'H8': 28800, 'H12': 43200,
+    'D': 86400,
+}
+
+# the candles endpoint rejects requests that would return more than this
+max_candles = 5000
+
+
+def window_seconds(granularity, limit=max_candles):
+    if granularity not in granularity_seconds:
+        raise ValueError('unsupported granularity: ' + str(granularity))
+    if limit < 1:
+        raise ValueError('limit must be at least one candle')
+    return granularity_seconds[granularity] * limit
+
+
+def plan_windows(start, end, granularity, limit=max_candles):
+    step = window_seconds(granularity, limit)
+    windows = []
+    cursor = start
+    while cursor < end:
+        stop = min(cursor.shift(seconds=step), end)
+        windows.append((cursor, stop))
+        cursor = stop
+    return windows
+
+
+def count_requests(start, end, granularity, limit=max_candles):
+    seconds = (end - start).total_seconds()
+    step = window_seconds(granularity, limit)
+    return max(0, -int(-seconds // step))
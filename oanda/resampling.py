@@ -0,0 +1,112 @@
+import numpy as np
+from . episode_store import ArrayDays
+from . panel import day_span, seconds_of_day
+from . request_planner import granularity_seconds
+from . sessions import day_seconds
+
+fill_policies = ('ffill', 'bfill', None)
+
+
+def time_of_day(seconds):
+    # inverse of panel.seconds_of_day: HHmmss integers
+    seconds = np.asarray(seconds, dtype=np.int64)
+    return seconds // 3600 * 10000 + seconds // 60 % 60 * 100 + seconds % 60
+
+
+def grid(opens, closes, step):
+    # every day's steps cover [open, close), the first one aligned to the granularity;
+    # returns the first step of every day and the row offsets of the days
+    first = -(-np.asarray(opens, dtype=np.int64) // step) * step
+    counts = np.maximum(-(-(np.asarray(closes, dtype=np.int64) - first) // step), 0)
+    return first, np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+
+def grid_seconds(first, offsets, step):
+    # seconds of day of every step of every day
+    counts = np.diff(offsets)
+    starts = np.repeat(first - offsets[:-1] * step, counts)
+    return starts + np.arange(offsets[-1]) * step
+
+
+def slot_candles(slots, offsets, counts, rows, last):
+    # the last (or first) candle in every one of rows grid steps, -1 where a step has none;
+    # slots count steps from each candle's day start, offsets and counts are its day's grid rows
+    inside = (slots >= 0) & (slots < counts)
+    # candles are sorted, so the grid row only grows and equal rows are neighbours
+    targets = np.where(inside, slots + offsets, -1)
+    edge = np.ones(len(targets), dtype=bool)
+    if last:
+        edge[:-1] = targets[1:] != targets[:-1]
+    else:
+        edge[1:] = targets[1:] != targets[:-1]
+    edge &= inside
+    candles = np.full(rows, -1, dtype=np.int64)
+    candles[targets[edge]] = np.flatnonzero(edge)
+    return candles
+
+
+def resample_days(days, granularity, dates=None, calendar=None, fill='ffill', limit=None,
+                  mark_missing=False):
+    # puts every day on a fixed grid of the granularity, all days in one pass;
+    # the grid covers each day's session when a calendar and the days' dates are given,
+    # otherwise the whole day. Grid steps without a candle are filled from the last ('ffill')
+    # or next ('bfill') candle of the same session, at most limit steps away, or left NaN (None);
+    # mark_missing adds a 'missing' column that is 1 on every step without its own candle
+    if fill not in fill_policies:
+        raise ValueError('unknown fill policy: %s, use one of %s' % (fill, fill_policies))
+    step = granularity_seconds[granularity]
+    if calendar is not None:
+        if dates is None:
+            raise ValueError('a calendar needs the dates of the days')
+        if len(dates) != len(days):
+            raise ValueError('%d dates for %d days' % (len(dates), len(days)))
+        opens, closes = calendar.sessions(dates)
+    else:
+        opens, closes = np.zeros(len(days), dtype=np.int64), np.full(len(days), day_seconds)
+    first, offsets = grid(opens, closes, step)
+    seconds = grid_seconds(first, offsets, step)
+
+    lengths = np.array([len(day) for day in days])
+    source_offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+    source_day = np.repeat(np.arange(len(days)), lengths)
+    source = np.concatenate([seconds_of_day(day.index.to_numpy()) for day in days] +
+                            [np.zeros(0, dtype=np.int64)]).astype(np.int64)
+    relative = source - first[source_day]
+    counts = np.diff(offsets)[source_day]
+    grid_offsets = offsets[:-1][source_day]
+    grid_day = np.repeat(np.arange(len(days)), np.diff(offsets))
+
+    # a candle fills forward from the first step at or after it, backward from the last step before
+    ceiling = -(-relative // step)
+    previous = slot_candles(np.where(relative < 0, 0, ceiling), grid_offsets, counts, offsets[-1], last=True)
+    known = previous >= 0
+    exact = known.copy()
+    exact[known] = source[previous[known]] == seconds[known]
+
+    if fill == 'ffill':
+        # the last candle so far, as long as it belongs to the same day
+        positions = np.maximum.accumulate(previous) if len(previous) else previous
+        positions = np.where(positions >= source_offsets[:-1][grid_day], positions, -1)
+    elif fill == 'bfill':
+        following = slot_candles(relative // step, grid_offsets, counts, offsets[-1], last=False)
+        following = np.where(following >= 0, following, len(source))
+        positions = np.minimum.accumulate(following[::-1])[::-1] if len(following) else following
+        positions = np.where(positions < source_offsets[1:][grid_day], positions, -1)
+    else:
+        positions = np.where(exact, previous, -1)
+    if fill is not None and limit is not None:
+        known = positions >= 0
+        known[known] = np.abs(seconds[known] - source[positions[known]]) <= limit * step
+        positions = np.where(known, positions, -1)
+
+    # column-major like the frames' own blocks, so every gather below is a contiguous copy
+    columns = [str(column) for column in days[0].columns]
+    values = np.concatenate([day.to_numpy(dtype='float64').T for day in days] +
+                            [np.full((len(columns), 1), np.nan)], axis=1)
+    if mark_missing:
+        values = np.vstack([values, np.zeros((1, values.shape[1]))])
+        columns = columns + ['missing']
+    data = np.take(values, positions, axis=1)
+    if mark_missing:
+        data[-1] = ~exact
+    return ArrayDays(time_of_day(seconds), data.T, offsets, columns, days[0].index.name)
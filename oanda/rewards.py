@@ -1,3 +1,8 @@
+import copy
+from functools import partial
+import numpy as np
+
+
 class DefaultRewardPolicy:
     def __init__(self):
         pass
@@ -80,4 +85,113 @@ class EasyTradeRewards:
             reward = reward * 0.1 if reward > 0 else reward * 0.1
 
         self.order_last_turn = account.current_order
-        return reward
\ No newline at end of file
+        return reward
+
+
+class BatchRewards:
+    def __init__(self, accounts=1):
+        # a reward policy over arrays of account states, the fields of oanda.ledger.Ledger;
+        # whether every account held an order on the last step is kept per account
+        self.had_order = np.zeros(accounts, dtype=bool)
+
+    def reset(self, accounts=slice(None)):
+        # restarted accounts forget their last order, like a new policy for a new episode
+        self.had_order[accounts] = False
+
+    def calc_rewards(self, states):
+        has_order = np.asarray(states.order_type) != 0
+        rewards = self.rewards(states, self.had_order, has_order)
+        self.had_order = has_order
+        return rewards
+
+    def trajectory_rewards(self, states, starts=None):
+        # every step of (steps, accounts) states, like oanda.ledger.Trajectory, in one pass;
+        # starts marks steps where an account began a new episode
+        has_order = np.asarray(states.order_type) != 0
+        had_order = np.zeros_like(has_order)
+        had_order[1:] = has_order[:-1]
+        if starts is not None:
+            had_order &= ~np.asarray(starts, dtype=bool)
+        return self.rewards(states, had_order, has_order)
+
+
+class AccountStates:
+    def __init__(self, accounts):
+        # the Ledger fields batch policies read, gathered from one Account per episode;
+        # profit_loss keeps a closed order's final value like Ledger does
+        self.current_balance = np.zeros(accounts)
+        self.realized_pl = np.zeros(accounts)
+        self.unrealized_pl = np.zeros(accounts)
+        self.order_type = np.zeros(accounts, dtype=np.int64)
+        self.profit_loss = np.zeros(accounts)
+
+    def gather(self, accounts, last_orders):
+        # last_orders are the accounts' current_order before the step
+        for i, (account, last_order) in enumerate(zip(accounts, last_orders)):
+            order = account.current_order
+            self.current_balance[i] = account.current_balance
+            self.realized_pl[i] = account.realized_pl
+            self.unrealized_pl[i] = account.unrealized_pl
+            self.order_type[i] = 0 if order is None else order.order_type
+            if order is not None or last_order is not None:
+                self.profit_loss[i] = (order or last_order).profit_loss
+        return self
+
+
+class BatchDefaultRewards(BatchRewards):
+    def rewards(self, states, had_order, has_order):
+        pl_sum = states.realized_pl + states.unrealized_pl
+        return np.where(pl_sum > 0, 1.0, np.where(pl_sum <= 0, -1.0, 0.0))
+
+
+class BatchRealizedPLRewards(BatchRewards):
+    def rewards(self, states, had_order, has_order):
+        return np.array(states.realized_pl, dtype=np.float64)
+
+
+class BatchUnRealizedPLRewards(BatchRewards):
+    def rewards(self, states, had_order, has_order):
+        return np.array(states.unrealized_pl, dtype=np.float64)
+
+
+class BatchPLSumRewards(BatchRewards):
+    def rewards(self, states, had_order, has_order):
+        return states.unrealized_pl + states.realized_pl
+
+
+class BatchFinishedTradeRewards(BatchRewards):
+    def rewards(self, states, had_order, has_order):
+        # profit_loss still holds the final value of an order closed this step
+        return np.where(had_order & ~has_order, states.profit_loss, 0.0)
+
+
+class BatchFinishedTradeAccountBalance(BatchRewards):
+    def rewards(self, states, had_order, has_order):
+        return np.where(had_order & ~has_order, states.current_balance, 0.0)
+
+
+class BatchEasyTradeRewards(BatchRewards):
+    def rewards(self, states, had_order, has_order):
+        # closed trades pay their pl, running ones a tenth of it, and new ones nothing
+        return np.where(had_order & ~has_order, states.profit_loss,
+                        np.where(had_order & has_order, states.profit_loss * 0.1, 0.0))
+
+
+def reward_factory(policy):
+    # envs call a reward policy class or factory once per episode; an instance, as OandaEnv
+    # used to take, is copied for every episode so none of its state is shared
+    if not isinstance(policy, type) and hasattr(policy, 'calc_reward'):
+        return partial(copy.deepcopy, policy)
+    return policy
+
+
+# the batch version of every per account policy
+batch_policies = {
+    DefaultRewardPolicy: BatchDefaultRewards,
+    RealizedPLRewards: BatchRealizedPLRewards,
+    UnRealizedPLRewards: BatchUnRealizedPLRewards,
+    PLSumRewards: BatchPLSumRewards,
+    FinishedTradeRewards: BatchFinishedTradeRewards,
+    FinishedTradeAccountBalance: BatchFinishedTradeAccountBalance,
+    EasyTradeRewards: BatchEasyTradeRewards,
+}
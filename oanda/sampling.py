@@ -0,0 +1,171 @@
+import numpy as np
+import pandas as pd
+from . episode_store import ArrayDays, pack_days
+
+
+class EpisodeSet:
+    def __init__(self, days, length, stride=None, cross_days=False):
+        # fixed length episodes cut from days, stored as start rows into the days' one array;
+        # stride defaults to length, cross_days lets an episode run on into the next day
+        if not isinstance(days, ArrayDays):
+            days = pack_days(days)
+        if length < 1:
+            raise ValueError('episodes need at least one row')
+        stride = stride or length
+        self.days = days
+        self.length = length
+        self.stride = stride
+        self.columns = days.columns
+        self.index_name = days.index_name
+        self.metadata = days.metadata
+
+        if cross_days:
+            self.starts = np.arange(0, max(days.offsets[-1] - length + 1, 0), stride, dtype=np.int64)
+        else:
+            firsts = days.offsets[:-1]
+            counts = np.maximum((days.offsets[1:] - firsts - length) // stride + 1, 0)
+            ends = np.cumsum(counts)
+            within = np.arange(ends[-1] if len(ends) else 0) - np.repeat(ends - counts, counts)
+            self.starts = np.repeat(firsts, counts) + within * stride
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        start, stop = self.bounds(i)
+        return pd.DataFrame(self.days.data[start:stop], columns=self.columns, copy=False,
+                            index=pd.Index(self.days.index[start:stop], name=self.index_name, copy=False))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def bounds(self, i):
+        start = int(self.starts[i])
+        return start, start + self.length
+
+    def array(self, i):
+        start, stop = self.bounds(i)
+        return self.days.data[start:stop]
+
+    def volatility(self, column='ask_close'):
+        return span_volatility(self.days, self.starts, self.starts + self.length, column)
+
+
+def span_volatility(days, starts, stops, column='ask_close'):
+    # standard deviation of the candle to candle changes of rows starts:stops of an
+    # ArrayDays, every span in one pass
+    prices = np.asarray(days.data[:, days.columns.index(column)], dtype=np.float64)
+    changes = np.diff(prices, prepend=prices[:1])
+    sums = np.concatenate([[0.], np.cumsum(changes)])
+    squares = np.concatenate([[0.], np.cumsum(changes * changes)])
+    first = np.minimum(starts + 1, stops)
+    count = np.maximum(stops - first, 1)
+    mean = (sums[stops] - sums[first]) / count
+    return np.sqrt(np.maximum((squares[stops] - squares[first]) / count - mean * mean, 0.))
+
+
+def volatility(episodes, column='ask_close'):
+    # per episode volatility of an EpisodeSet, or per day of packed days
+    if isinstance(episodes, EpisodeSet):
+        return episodes.volatility(column)
+    if isinstance(episodes, ArrayDays):
+        return span_volatility(episodes, episodes.offsets[:-1], episodes.offsets[1:], column)
+    raise ValueError('volatility needs an EpisodeSet or packed days, pass a difficulty '
+                     'for %s' % type(episodes).__name__)
+
+
+def random_stream(seed, position):
+    # every position gets its own stream, so parallel workers never replay each other
+    return np.random.default_rng(None if seed is None else [seed, position])
+
+
+class Same:
+    def __init__(self, episodes, position=0):
+        # every episode in order, over and over
+        self.episodes = episodes
+        self.index = position % len(episodes) if len(episodes) else 0
+
+    def next_index(self):
+        index = self.index
+        self.index = (index + 1) % len(self.episodes)
+        return index
+
+
+class Shuffled:
+    def __init__(self, episodes, position=0, seed=None):
+        # every episode once per pass, in a new order every pass
+        self.episodes = episodes
+        self.rng = random_stream(seed, position)
+        self.order = self.rng.permutation(len(episodes))
+        self.index = 0
+
+    def next_index(self):
+        if self.index == len(self.order):
+            self.rng.shuffle(self.order)
+            self.index = 0
+        index = self.order[self.index]
+        self.index += 1
+        return int(index)
+
+
+class Weighted:
+    def __init__(self, episodes, weights, position=0, seed=None):
+        # episodes drawn with replacement in proportion to weights, from Walker's alias table;
+        # weights may be a function of the episodes, like volatility
+        if callable(weights):
+            weights = weights(episodes)
+        weights = np.asarray(weights, dtype=np.float64)
+        if len(weights) != len(episodes) or (weights < 0).any() or weights.sum() <= 0:
+            raise ValueError('need one non-negative weight per episode and a positive total')
+        self.episodes = episodes
+        self.rng = random_stream(seed, position)
+        self.probability, self.alias = alias_table(weights)
+
+    def next_index(self):
+        index = int(self.rng.integers(len(self.alias)))
+        return index if self.rng.random() < self.probability[index] else int(self.alias[index])
+
+
+def alias_table(weights):
+    count = len(weights)
+    scaled = weights * count / weights.sum()
+    probability = np.ones(count)
+    alias = np.arange(count)
+    small = list(np.flatnonzero(scaled < 1))
+    large = list(np.flatnonzero(scaled >= 1))
+    while small and large:
+        less, more = small.pop(), large.pop()
+        probability[less] = scaled[less]
+        alias[less] = more
+        scaled[more] -= 1 - scaled[less]
+        (small if scaled[more] < 1 else large).append(more)
+    return probability, alias
+
+
+class Curriculum:
+    def __init__(self, episodes, difficulty=None, position=0, seed=None, start=0.1, warmup=10000):
+        # uniform draws from the easiest episodes, the pool grows linearly from the start
+        # fraction to all of them over warmup draws; difficulty is one value per episode or
+        # a function of the episodes and defaults to their volatility
+        if difficulty is None:
+            difficulty = volatility
+        if callable(difficulty):
+            difficulty = difficulty(episodes)
+        self.episodes = episodes
+        self.rng = random_stream(seed, position)
+        self.order = np.argsort(np.asarray(difficulty), kind='stable')
+        self.start = start
+        self.warmup = warmup
+        self.draws = 0
+
+    def pool(self):
+        fraction = min(1., self.start + (1. - self.start) * self.draws / max(self.warmup, 1))
+        return max(1, int(np.ceil(fraction * len(self.order))))
+
+    def next_index(self):
+        index = self.order[self.rng.integers(self.pool())]
+        self.draws += 1
+        return int(index)
@@ -0,0 +1,70 @@
+import numpy as np
+from . candle_store import day_number
+
+day_seconds = 86400
+# numpy weekdays counted from Monday; 1970-01-01 was a Thursday
+FRIDAY, SATURDAY, SUNDAY = 4, 5, 6
+
+
+def as_dates(days):
+    # arrow days, YYYYMMDD numbers or datetime64 values as datetime64[D]
+    days = list(days) if not isinstance(days, np.ndarray) else days
+    if isinstance(days, np.ndarray) and np.issubdtype(days.dtype, np.datetime64):
+        return days.astype('M8[D]')
+    numbers = np.array([day_number(day) for day in days], dtype=np.int64)
+    years = (numbers // 10000 - 1970).astype('M8[Y]')
+    months = years.astype('M8[M]') + (numbers // 100 % 100 - 1)
+    return months.astype('M8[D]') + (numbers % 100 - 1)
+
+
+def weekday(dates):
+    return (dates.astype(np.int64) + 3) % 7
+
+
+def month_start(dates, month):
+    return (dates.astype('M8[Y]').astype('M8[M]') + (month - 1)).astype('M8[D]')
+
+
+def first_sunday(dates):
+    return dates + (SUNDAY - weekday(dates)) % 7
+
+
+def new_york_offset(dates):
+    # hours New York is behind UTC: daylight saving from the second Sunday of March
+    # to the first Sunday of November, the US rules since 2007
+    dates = as_dates(dates)
+    summer = first_sunday(month_start(dates, 3)) + 7
+    winter = first_sunday(month_start(dates, 11))
+    return np.where((dates >= summer) & (dates < winter), 4, 5)
+
+
+class SessionCalendar:
+    def __init__(self, hour=17, holidays=((1, 1), (12, 25))):
+        # FX trades from Sunday hour:00 to Friday hour:00 New York time;
+        # holidays are (month, day) pairs closed for the whole UTC day
+        self.hour = hour
+        self.holidays = [tuple(holiday) for holiday in holidays]
+
+    def sessions(self, days):
+        # seconds after UTC midnight every day opens and closes, both 0 on closed days
+        dates = as_dates(days)
+        edge = (self.hour + new_york_offset(dates)) * 3600
+        day = weekday(dates)
+        opens = np.where(day == SUNDAY, edge, 0)
+        closes = np.where(day == FRIDAY, edge, day_seconds)
+        closed = day == SATURDAY
+        if self.holidays:
+            months = dates.astype('M8[M]')
+            month = months.astype(np.int64) % 12 + 1
+            date = (dates - months.astype('M8[D]')).astype(np.int64) + 1
+            for holiday_month, holiday_day in self.holidays:
+                closed |= (month == holiday_month) & (date == holiday_day)
+        return np.where(closed, 0, opens), np.where(closed, 0, closes)
+
+    def is_open(self, days):
+        opens, closes = self.sessions(days)
+        return closes > opens
+
+    def trading_days(self, days):
+        days = list(days)
+        return [day for day, open_ in zip(days, self.is_open(days)) if open_]
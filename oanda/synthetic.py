@@ -0,0 +1,160 @@
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+from . request_planner import granularity_seconds
+from . oanda_candles_api import decode_candles
+
+
+def make_candles(count, start='2018-01-02T00:00:00', seconds=5, price=1.2,
+                 spread=0.0001, volatility=0.0001, seed=0):
+    rng = np.random.default_rng(seed)
+    mid = price + np.cumsum(rng.normal(0, volatility, count))
+    wick = np.abs(rng.normal(0, volatility, (2, count)))
+    opens = np.concatenate([[price], mid[:-1]])
+    highs = np.maximum(opens, mid) + wick[0]
+    lows = np.minimum(opens, mid) - wick[1]
+
+    stamps = np.datetime64(start, 'ns') + np.arange(count) * np.timedelta64(
+        seconds, 's')
+    times = [stamp + 'Z' for stamp in np.datetime_as_string(stamps, unit='ns')]
+
+    def quote(values):
+        return ['%.5f' % value for value in values]
+
+    bid = [quote(side) for side in (opens, highs, lows, mid)]
+    ask = [quote(side + spread) for side in (opens, highs, lows, mid)]
+
+    return [{
+        'complete': True,
+        'volume': int(volume),
+        'time': times[i],
+        'bid': {'o': bid[0][i], 'h': bid[1][i], 'l': bid[2][i], 'c': bid[3][i]},
+        'ask': {'o': ask[0][i], 'h': ask[1][i], 'l': ask[2][i], 'c': ask[3][i]},
+    } for i, volume in enumerate(rng.integers(1, 50, count))]
+
+
+def make_day(count, start='2018-01-02T00:00:00', seconds=5, seed=0):
+    return decode_candles(make_candles(count, start=start, seconds=seconds, seed=seed))
+
+
+def in_session(stamp, sessions):
+    opens, closes = sessions[int(stamp[:10].replace('-', ''))]
+    seconds = int(stamp[11:13]) * 3600 + int(stamp[14:16]) * 60 + int(stamp[17:19])
+    return opens <= seconds < closes
+
+
+class StubCandleServer:
+    def __init__(self, failures=0, delay=0, calendar=None):
+        # with a calendar, like oanda.sessions.SessionCalendar, only candles in a session exist
+        self.failures = failures
+        self.delay = delay
+        self.calendar = calendar
+        self.requests = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d/v3/instruments/' % self.server.server_address[1]
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def candles(self, query):
+        start = datetime.strptime(query['from'][0], '%Y-%m-%dT%H:%M:%S%z')
+        end = datetime.strptime(query['to'][0], '%Y-%m-%dT%H:%M:%S%z')
+        seconds = granularity_seconds[query['granularity'][0]]
+        count = int((end - start).total_seconds()) // seconds
+        seed = int(start.timestamp())
+        start = start.astimezone(timezone.utc).replace(tzinfo=None)
+        candles = make_candles(count, start=start.isoformat(), seconds=seconds, seed=seed)
+        if self.calendar is None or not candles:
+            return candles
+        days = sorted({int(candle['time'][:10].replace('-', '')) for candle in candles})
+        sessions = dict(zip(days, zip(*self.calendar.sessions(days))))
+        return [candle for candle in candles if in_session(candle['time'], sessions)]
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                with stub.lock:
+                    stub.requests.append(query)
+                    failing = stub.failures > 0
+                    stub.failures -= failing
+                if stub.delay:
+                    time.sleep(stub.delay)
+
+                if failing:
+                    self.send_response(429)
+                    self.send_header('Retry-After', '0')
+                    self.end_headers()
+                    return
+
+                body = json.dumps({
+                    'instrument': self.path.split('/')[-2],
+                    'granularity': query['granularity'][0],
+                    'candles': stub.candles(query),
+                }).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+class ReplayCandleServer(StubCandleServer):
+    def __init__(self, candles, visible=0, forming=True, **kwargs):
+        # candles are recorded candle dicts or the path of a JSON file holding a
+        # candles response; publish reveals them one poll at a time
+        if isinstance(candles, str):
+            with open(candles) as source:
+                candles = json.load(source)['candles']
+        super().__init__(**kwargs)
+        self.recorded = candles
+        self.visible = visible
+        self.forming = forming
+
+    def publish(self, count=1):
+        with self.lock:
+            self.visible = min(self.visible + count, len(self.recorded))
+
+    def candles(self, query):
+        with self.lock:
+            visible = self.visible
+        candles = self.recorded[:visible]
+        count = int(query.get('count', ['500'])[0])
+        if 'from' in query:
+            start = query['from'][0]
+            include_first = query.get('includeFirst', ['True'])[0] == 'True'
+            candles = [candle for candle in candles
+                       if candle['time'] > start or (include_first and candle['time'] == start)][:count]
+        else:
+            candles = candles[-count:]
+        # the newest published candle has not closed yet
+        if self.forming and candles and candles[-1] is self.recorded[visible - 1]:
+            candles = candles[:-1] + [dict(candles[-1], complete=False)]
+        return candles
@@ -0,0 +1,86 @@
+import numpy as np
+from . oanda_env import ArrayEpisode
+from core.scaling import get_scaler
+from . preprocessing import denoise_array
+from . rewards import AccountStates, BatchRewards, FinishedTradeRewards, reward_factory
+
+
+class VecOandaEnv:
+    def __init__(self, env, batch_size, reward_policy=FinishedTradeRewards):
+        # reward_policy is a class, factory or instance, every episode gets its own copy;
+        # a batch policy from oanda.rewards scores all episodes at once instead
+        self.env = env
+        self.batch_size = batch_size
+        self.window_size = env.window_size
+        if isinstance(reward_policy, type) and issubclass(reward_policy, BatchRewards):
+            reward_policy = reward_policy(batch_size)
+        self.batch_rewards = None
+        if isinstance(reward_policy, BatchRewards):
+            self.batch_rewards = reward_policy
+            self.states = AccountStates(batch_size)
+            reward_policy = None
+        self.reward_policy = None if reward_policy is None else reward_factory(reward_policy)
+        self.scaler = get_scaler(env.scaler)
+        self.metrics = env.metrics
+        self.episodes = []
+
+    def new_episode(self):
+        reward_policy = self.reward_policy() if self.reward_policy is not None else None
+        return ArrayEpisode(self.env.next_trading_day(), self.window_size, reward_policy,
+                            scaler=self.scaler, metrics=self.metrics)
+
+    def reset(self):
+        self.episodes = [self.new_episode() for _ in range(self.batch_size)]
+        if self.batch_rewards is not None:
+            self.batch_rewards.reset()
+        columns = {(tuple(episode.raw_columns), tuple(episode.market_columns)) for episode in self.episodes}
+        if len(columns) != 1:
+            raise ValueError('all trading days need the same columns')
+        return self.observe()
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        assert actions.shape == (self.batch_size,)
+
+        last_orders = [episode.account.current_order for episode in self.episodes]
+        rewards = np.array([episode.act(int(action)) for episode, action in zip(self.episodes, actions)],
+                           dtype=np.float64)
+        if self.batch_rewards is not None:
+            with self.metrics.timer('reward'):
+                states = self.states.gather([episode.account for episode in self.episodes], last_orders)
+                rewards = self.batch_rewards.calc_rewards(states)
+        dones = np.array([episode.done for episode in self.episodes])
+        infos = [{} for _ in range(self.batch_size)]
+        observations = self.observe(self.episodes)
+
+        # finished episodes report their last observation in infos and restart from the pool
+        finished = np.flatnonzero(dones)
+        if len(finished):
+            for i in finished:
+                infos[i]['terminal_observation'] = {key: value[i].copy() for key, value in observations.items()}
+                self.episodes[i] = self.new_episode()
+            if self.batch_rewards is not None:
+                self.batch_rewards.reset(finished)
+            restarted = self.observe([self.episodes[i] for i in finished])
+            for key, value in restarted.items():
+                observations[key][finished] = value
+
+        return (observations, rewards, dones, infos)
+
+    def observe(self, episodes=None):
+        episodes = self.episodes if episodes is None else episodes
+        first = episodes[0]
+        with self.metrics.timer('denoise'):
+            windows = np.stack([episode.market_window() for episode in episodes])
+            rows = windows.shape[1]
+            smooth = denoise_array(windows[:, :, first.raw_columns], axis=1)[:, :rows]
+            market = np.concatenate([windows[:, 1:, first.market_columns], np.diff(smooth, axis=1)], axis=2)
+        history = np.stack([episode.recent_history() for episode in episodes])
+        with self.metrics.timer('scale'):
+            return {
+                'market_state': self.scaler(market, axis=1, out=market),
+                'env_state': self.scaler(history, axis=1, out=history),
+            }
+
+    def action_dims(self):
+        return self.env.action_dims()
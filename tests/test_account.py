@@ -0,0 +1,201 @@
+import unittest
+import numpy as np
+import pandas as pd
+from oanda.ledger import Ledger
+from oanda.oanda_env import Account, Order, quote_signals
+from oanda.rewards import FinishedTradeRewards
+
+
+def market_value(market_info, name):
+    value = market_info[name]
+    return value if isinstance(value, float) else value.values[0]
+
+
+class ReferenceOrder:
+    # the order model as it was first written, kept to pin its arithmetic down
+    def __init__(self, order_type, market_info):
+        self.order_type = order_type
+        close = 'ask_close' if order_type == 1 else 'bid_close'
+        high = 'ask_high' if order_type == 1 else 'bid_high'
+        low = 'ask_low' if order_type == 1 else 'bid_low'
+        self.close_price = lambda frame: market_value(frame, close)
+        self.high_price = lambda frame: market_value(frame, high)
+        self.low_price = lambda frame: market_value(frame, low)
+        self.order_price = self.close_price(market_info)
+        self.initial_spread = market_value(market_info, 'ask_close') - market_value(market_info, 'bid_close')
+        self.order_volume = 2000
+        self.stop_loss = 0.0005
+        self.take_profit = 0.0015
+        self.profit_loss = self.calculate_pl(market_info)
+
+    def hits_tp(self, market):
+        if self.order_type == 1:
+            return (self.close_price(market) - self.order_price) >= self.take_profit or (self.high_price(market) - self.order_price) >= self.take_profit
+        return - (self.close_price(market) - self.order_price) >= self.take_profit or - (self.low_price(market) - self.order_price) >= self.take_profit
+
+    def hits_sl(self, market):
+        if self.order_type == 1:
+            return - (self.close_price(market) - self.order_price) >= self.stop_loss or - (self.low_price(market) - self.order_price) >= self.stop_loss
+        return (self.close_price(market) - self.order_price) >= self.stop_loss or (self.high_price(market) - self.order_price) >= self.stop_loss
+
+    def calculate_pl(self, market_info):
+        return (((self.close_price(market_info) - self.order_price) *
+                self.order_volume) * self.order_type) - self.initial_spread * self.order_volume
+
+    def update(self, market_info):
+        if self.hits_tp(market_info):
+            self.profit_loss = (self.take_profit * self.order_volume) - self.initial_spread * self.order_volume
+            return (self.profit_loss, True)
+        elif self.hits_sl(market_info):
+            self.profit_loss = -(self.stop_loss * self.order_volume) - self.initial_spread * self.order_volume
+            return (self.profit_loss, True)
+        else:
+            self.profit_loss = self.calculate_pl(market_info)
+            return (self.profit_loss, False)
+
+
+class ReferenceAccount:
+    def __init__(self, balance, leverage):
+        self.initial_balance = balance
+        self.current_balance = balance
+        self.realized_pl = 0
+        self.unrealized_pl = 0
+        self.current_order = None
+
+    def place_order(self, market_info, order_type):
+        if self.current_order is None:
+            self.current_order = ReferenceOrder(order_type, market_info)
+            self.unrealized_pl = self.current_order.profit_loss
+        elif self.current_order is not None and self.current_order.order_type == -order_type:
+            self.current_order.update(market_info)
+            self.realized_pl += self.current_order.profit_loss
+            self.unrealized_pl = 0
+            self.current_balance += self.current_order.profit_loss
+            self.current_order = None
+        else:
+            self.update(market_info)
+
+    def update(self, market_info):
+        if self.current_order != None:
+            profit_loss, done = self.current_order.update(market_info)
+            if done:
+                self.realized_pl += profit_loss
+                self.current_balance += profit_loss
+                self.current_order = None
+            else:
+                self.unrealized_pl = profit_loss
+
+
+def quotes(count, seed=0, volatility=0.0003):
+    rng = np.random.default_rng(seed)
+    bid_close = 1.2 + np.cumsum(rng.normal(0, volatility, count))
+    wick = np.abs(rng.normal(0, volatility, (2, count)))
+    spread = rng.uniform(0.00005, 0.0002, count)
+    bid_high, bid_low = bid_close + wick[0], bid_close - wick[1]
+    return [dict(zip(quote_signals, map(float, row))) for row in
+            zip(bid_close + spread, bid_close, bid_high + spread, bid_high, bid_low + spread, bid_low)]
+
+
+def act(account, market, action):
+    if action == 0:
+        account.update(market)
+    else:
+        account.place_order(market, action)
+
+
+def state(account):
+    order = account.current_order
+    return (account.current_balance, account.realized_pl, account.unrealized_pl,
+            None if order is None else (order.order_type, order.order_price, order.profit_loss))
+
+
+class TestAccount(unittest.TestCase):
+
+    def test_buy_then_sell_at_a_profit(self):
+        account = Account(1000, 20)
+        opening = {'ask_close': 1.2002, 'bid_close': 1.2, 'ask_high': 1.2003, 'bid_high': 1.2001,
+                   'ask_low': 1.2001, 'bid_low': 1.1999}
+        account.place_order(opening, 1)
+        self.assertEqual(account.current_order.order_price, 1.2002)
+        self.assertEqual(account.unrealized_pl, -(1.2002 - 1.2) * 2000)
+
+        closing = dict(opening, ask_close=1.2008, bid_close=1.2006, ask_high=1.2009, ask_low=1.2007)
+        account.place_order(closing, -1)
+        expected = ((1.2008 - 1.2002) * 2000) * 1 - (1.2002 - 1.2) * 2000
+        self.assertIsNone(account.current_order)
+        self.assertEqual(account.realized_pl, expected)
+        self.assertEqual(account.unrealized_pl, 0)
+        self.assertEqual(account.current_balance, 1000 + expected)
+
+    def test_take_profit_and_stop_loss_use_highs_and_lows(self):
+        opening = {'ask_close': 1.2001, 'bid_close': 1.2, 'ask_high': 1.2001, 'bid_high': 1.2,
+                   'ask_low': 1.2001, 'bid_low': 1.2}
+        spread = 1.2001 - 1.2
+
+        order = Order(-1, opening)
+        self.assertEqual(order.update(dict(opening, bid_low=1.2 - 0.0016)), (0.0015 * 2000 - spread * 2000, True))
+        order = Order(-1, opening)
+        self.assertEqual(order.update(dict(opening, bid_high=1.2 + 0.0006)), (-(0.0005 * 2000) - spread * 2000, True))
+        order = Order(1, opening)
+        self.assertEqual(order.update(dict(opening, ask_high=1.2001 + 0.0016, ask_low=1.2001 - 0.0006)),
+                         (0.0015 * 2000 - spread * 2000, True))
+        self.assertFalse(Order(1, opening).update(dict(opening, ask_close=1.2003))[1])
+
+        # a finished order keeps its unrealized pl on the account
+        account = Account(1000, 20)
+        account.place_order(opening, 1)
+        account.update(dict(opening, ask_close=1.2003))
+        unrealized = account.unrealized_pl
+        account.update(dict(opening, ask_low=1.2001 - 0.0006))
+        self.assertIsNone(account.current_order)
+        self.assertEqual(account.unrealized_pl, unrealized)
+
+    def test_random_sessions_match_the_reference_model(self):
+        for seed in range(5):
+            rng = np.random.default_rng(seed)
+            account, reference = Account(1000, 20), ReferenceAccount(1000, 20)
+            rewards, reference_rewards = FinishedTradeRewards(), FinishedTradeRewards()
+            for market, action in zip(quotes(600, seed), rng.choice([0, 0, 0, 1, -1], 600)):
+                act(account, market, int(action))
+                act(reference, market, int(action))
+                self.assertEqual(state(account), state(reference))
+                self.assertEqual(rewards.calc_reward(account), reference_rewards.calc_reward(reference))
+
+    def test_one_row_frames_work_like_mappings(self):
+        market = quotes(3, seed=1)
+        account, frames = Account(1000, 20), Account(1000, 20)
+        for row, action in zip(market, (1, 0, -1)):
+            act(account, row, action)
+            act(frames, pd.DataFrame([row]), action)
+            self.assertEqual(state(account), state(frames))
+
+
+    def test_ledger_matches_separate_accounts(self):
+        accounts = 6
+        sessions = [quotes(400, seed) for seed in range(accounts)]
+        actions = np.random.default_rng(9).choice([0, 0, 0, 1, -1], (400, accounts))
+        ledger = Ledger(accounts)
+        references = [ReferenceAccount(1000, 20) for _ in range(accounts)]
+        rewards = [FinishedTradeRewards() for _ in range(accounts)]
+        for step in range(400):
+            markets = [session[step] for session in sessions]
+            closed_pl = ledger.step(actions[step], [[market[name] for name in quote_signals] for market in markets])
+            for i, (reference, market) in enumerate(zip(references, markets)):
+                act(reference, market, int(actions[step, i]))
+                order = reference.current_order
+                self.assertEqual(ledger.current_balance[i], reference.current_balance)
+                self.assertEqual(ledger.realized_pl[i], reference.realized_pl)
+                self.assertEqual(ledger.unrealized_pl[i], reference.unrealized_pl)
+                self.assertEqual(ledger.order_type[i], 0 if order is None else order.order_type)
+                if order is not None:
+                    self.assertEqual(ledger.order_price[i], order.order_price)
+                    self.assertEqual(ledger.profit_loss[i], order.profit_loss)
+                self.assertEqual(closed_pl[i], rewards[i].calc_reward(reference))
+
+        ledger.reset([0, 2])
+        self.assertTrue((ledger.order_type[[0, 2]] == 0).all())
+        self.assertEqual(ledger.current_balance[0], 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
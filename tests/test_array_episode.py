@@ -0,0 +1,47 @@
+import unittest
+import numpy as np
+from oanda.oanda_env import Episode, ArrayEpisode
+from oanda.preprocessing import add_indicators, scale_array, scale_frame
+from oanda.rewards import FinishedTradeRewards, EasyTradeRewards
+from oanda.synthetic import make_day
+import pandas as pd
+
+
+class TestArrayEpisode(unittest.TestCase):
+
+    def assert_same_episode(self, day, window_size, actions, reward_policy):
+        expected = Episode(day, window_size, reward_policy())
+        episode = ArrayEpisode(day, window_size, reward_policy())
+        for action in actions:
+            if expected.done:
+                break
+            state, reward, done = episode.step(action)
+            expected_state, expected_reward, expected_done = expected.step(action)
+            np.testing.assert_array_equal(state['market_state'], expected_state['market_state'])
+            np.testing.assert_array_equal(state['env_state'], expected_state['env_state'])
+            self.assertEqual(reward, expected_reward)
+            self.assertEqual(done, expected_done)
+            self.assertEqual(episode.account.current_balance, expected.account.current_balance)
+        self.assertTrue(expected.done)
+        self.assertTrue(episode.done)
+
+    def test_matches_dataframe_episode(self):
+        day = add_indicators(make_day(160, seconds=5, seed=3))
+        actions = np.random.default_rng(0).choice([0, 1, -1], size=200, p=[0.6, 0.2, 0.2])
+        self.assert_same_episode(day, 32, actions, FinishedTradeRewards)
+
+    def test_matches_with_odd_window(self):
+        # an even window length makes waverec return one extra sample
+        day = add_indicators(make_day(120, seconds=5, seed=4, start='2018-01-03T00:00:00'))
+        actions = np.random.default_rng(1).choice([0, 1, -1], size=200)
+        self.assert_same_episode(day, 17, actions, EasyTradeRewards)
+
+    def test_scale_array_matches_min_max_scaler(self):
+        data = np.random.default_rng(2).normal(size=(32, 5))
+        data[:, 3] = 1.5
+        frame = pd.DataFrame(data)
+        np.testing.assert_array_equal(scale_array(data), scale_frame(frame))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import numpy as np
+import pandas as pd
+from analysis.backtest import Backtest, crossings, sweep
+from core.indicators import ema, mid_prices
+from oanda.synthetic import make_day
+from oanda.trade import Trade, calc_chunks, ema_crossings
+
+
+class TestBacktest(unittest.TestCase):
+
+    def setUp(self):
+        self.day = make_day(3000, seed=5)
+        close = mid_prices(self.day)[2].to_numpy()
+        self.emas = pd.DataFrame({'ema_fast': ema(close, 13), 'ema_slow': ema(close, 35)}, index=self.day.index)
+
+    def test_crossings_match_ema_crossings(self):
+        signals = crossings(self.emas['ema_fast'], self.emas['ema_slow'])
+        self.assertEqual(signals.tolist(), ema_crossings(self.emas))
+        self.assertTrue((signals != 0).sum() > 20)
+
+    def test_trades_match_calc_chunks(self):
+        signals = ema_crossings(self.emas)
+        data = self.day.iloc[:len(signals)]
+        trades = calc_chunks(data, signals, 0)
+        table = Backtest(data).run(np.array(signals))
+        self.assertEqual(len(table), len(trades))
+        self.assertEqual(set(table['exit_reason']), {'REVERSAL', 'TAKE PROFIT', 'STOP LOSS'})
+
+        def position(label):
+            return -1 if label is None else data.index.get_loc(label)
+
+        for trade, row in zip(trades, table.itertuples()):
+            self.assertEqual(row.entry_time, trade.frame.index[0])
+            self.assertEqual(row.exit_time, trade.frame.index[-1])
+            self.assertEqual(row.trade_type, trade.trade_type)
+            self.assertEqual(row.exit_reason, trade.exit_reason)
+            self.assertEqual(row.hit_tp_pos, position(trade.hit_tp_pos))
+            self.assertEqual(row.hit_sl_pos, position(trade.hit_sl_pos))
+            for name in ('open_price', 'close_price', 'diff', 'initial_spread', 'best_diff', 'worst_diff',
+                         'realized'):
+                self.assertEqual(getattr(row, name), getattr(trade, name), name)
+
+    def test_extremes_hit_no_later_than_closes(self):
+        backtest = Backtest(self.day)
+        signals = backtest.ema_signals(5, 13)
+        closes = backtest.run(signals)
+        backtest.use_extremes = True
+        extremes = backtest.run(signals)
+        for column in ('hit_tp_pos', 'hit_sl_pos'):
+            hit = closes[column] >= 0
+            self.assertTrue((extremes[column][hit] >= 0).all())
+            self.assertTrue((extremes[column][hit] <= closes[column][hit]).all())
+        self.assertGreaterEqual((extremes['exit_reason'] != 'REVERSAL').sum(),
+                                (closes['exit_reason'] != 'REVERSAL').sum())
+
+    def test_sweep_totals_match_single_runs(self):
+        days = [self.day.iloc[:1500], self.day.iloc[1500:]]
+        results = sweep(days, tps=(0.0005, 0.0009), sls=(0.0003,), spans=((5, 13), (8, 21)))
+        self.assertEqual(len(results), 4)
+        for row in results.itertuples():
+            tables = [Backtest(day).run(Backtest(day).ema_signals(row.fast, row.slow), row.tp, row.sl)
+                      for day in days]
+            self.assertEqual(row.trades, sum(len(table) for table in tables))
+            self.assertAlmostEqual(row.realized, sum(table['realized'].sum() for table in tables))
+            self.assertEqual(row.stop_losses, sum((table['exit_reason'] == 'STOP LOSS').sum() for table in tables))
+
+
+if __name__ == '__main__':
+    unittest.main()
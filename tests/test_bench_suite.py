@@ -0,0 +1,61 @@
+import io
+import os
+import platform
+import tempfile
+import unittest
+from benchmarks import suite
+
+
+class TestBenchSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.history = os.path.join(self.directory.name, 'history.jsonl')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_records_runs_and_compares_to_them(self):
+        out = io.StringIO()
+        results, found = suite.run(['decode', 'store_read_parquet'], rows=200, history=self.history,
+                                   repeat=1, out=out)
+        self.assertEqual(found, {})
+        self.assertEqual(results['decode']['units'], 200)
+        self.assertGreater(results['store_read_parquet']['rate'], 0)
+
+        out = io.StringIO()
+        suite.run(['decode'], rows=200, history=self.history, repeat=1, out=out)
+        history = suite.read_history(self.history)
+        self.assertEqual(len(history), 2)
+        self.assertEqual(history[0]['machine'], suite.machine())
+        # the second run reports its change against the first
+        self.assertIn('%', out.getvalue().splitlines()[0])
+
+    def test_regressions_against_median_baseline(self):
+        history = [{'machine': 'a', 'rows': 10, 'results': {'decode': {'seconds': seconds}}}
+                   for seconds in (1.0, 1.1, 0.9, 5.0, 1.0)]
+        history.append({'machine': 'b', 'rows': 10, 'results': {'decode': {'seconds': 0.1}}})
+        baseline = suite.baselines(history, 'a', 10)
+        self.assertEqual(baseline, {'decode': 1.0})
+        self.assertEqual(suite.regressions({'decode': {'seconds': 1.2}}, baseline), {})
+        self.assertAlmostEqual(suite.regressions({'decode': {'seconds': 1.5}}, baseline)['decode'], 1.5)
+        # noisier cases get more room
+        self.assertEqual(suite.regressions({'load': {'seconds': 1.4}}, {'load': 1.0}), {})
+
+    def test_machine_override_and_history_outside_the_checkout(self):
+        self.assertNotIn(os.path.dirname(os.path.abspath(suite.__file__)), suite.default_history)
+        self.assertNotIn(platform.node(), suite.machine())
+        history = os.path.join(self.directory.name, 'runs', 'history.jsonl')
+        for _ in range(2):
+            out = io.StringIO()
+            suite.run(['decode'], rows=200, history=history, repeat=1, out=out, machine_key='ci')
+        self.assertEqual([record['machine'] for record in suite.read_history(history)], ['ci', 'ci'])
+        self.assertIn('%', out.getvalue().splitlines()[0])
+
+    def test_unknown_case(self):
+        with self.assertRaises(ValueError):
+            suite.run(['nope'], history=self.history)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+import arrow as time
+import pandas as pd
+from oanda.candle_store import ParquetCandleStore, HDFCandleStore, migrate_hdf, parse_day_key
+from oanda.oanda_candles_api import decode_candles
+from oanda.synthetic import make_candles
+
+
+def day_frame(day, count=200):
+    return decode_candles(make_candles(count, start=day + 'T00:00:00', seconds=300,
+                                       seed=int(day.replace('-', ''))))
+
+
+class TestParquetCandleStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.directory.name, 'candles')
+        self.store = ParquetCandleStore(self.root)
+        self.days = [time.get(day) for day in ['2018-01-30', '2018-01-31', '2018-02-01']]
+        self.frames = [day_frame(day.format('YYYY-MM-DD')) for day in self.days]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip_across_month_partitions(self):
+        self.store.write_days('EUR_USD', 'M5', list(zip(self.days, self.frames)))
+
+        self.assertTrue(os.path.exists(os.path.join(self.root, 'EUR_USD', 'M5', '2018-01.parquet')))
+        self.assertTrue(os.path.exists(os.path.join(self.root, 'EUR_USD', 'M5', '2018-02.parquet')))
+        for day in self.days:
+            self.assertTrue(self.store.contains('EUR_USD', 'M5', day))
+        self.assertFalse(self.store.contains('EUR_USD', 'S5', self.days[0]))
+
+        for expected, stored in zip(self.frames, self.store.read_days('EUR_USD', 'M5', self.days)):
+            pd.testing.assert_frame_equal(expected, stored)
+
+        frame = self.store.read_range('EUR_USD', 'M5', self.days[1], self.days[2])
+        self.assertEqual(len(frame), 400)
+        self.assertEqual(list(frame['day'].unique()), [20180131, 20180201])
+
+    def test_rewriting_a_day_replaces_it(self):
+        self.store.write_days('EUR_USD', 'M5', [(self.days[0], self.frames[0])])
+        self.store.write_days('EUR_USD', 'M5', [(self.days[0], self.frames[1])])
+        stored = self.store.read_days('EUR_USD', 'M5', [self.days[0]])[0]
+        pd.testing.assert_frame_equal(self.frames[1], stored)
+
+    def test_empty_days_are_remembered(self):
+        self.store.write_days('EUR_USD', 'M5', [(self.days[0], decode_candles([]))])
+        self.assertTrue(self.store.contains('EUR_USD', 'M5', self.days[0]))
+        self.assertEqual(len(self.store.read_days('EUR_USD', 'M5', [self.days[0]])[0]), 0)
+
+    def test_other_instances_see_new_writes(self):
+        reader = ParquetCandleStore(self.root)
+        self.store.write_days('EUR_USD', 'M5', [(self.days[0], self.frames[0])])
+        self.assertTrue(reader.contains('EUR_USD', 'M5', self.days[0]))
+        self.assertFalse(reader.contains('EUR_USD', 'M5', self.days[1]))
+        self.store.write_days('EUR_USD', 'M5', [(self.days[1], self.frames[1])])
+        self.assertTrue(reader.contains('EUR_USD', 'M5', self.days[1]))
+
+    def test_migrate_hdf(self):
+        h5_path = os.path.join(self.directory.name, 'oanda_api_store.h5')
+        legacy = HDFCandleStore(h5_path)
+        legacy.write_days('EUR_USD', 'M5', list(zip(self.days, self.frames)))
+        legacy.store['/EUR_USDS520180130'] = self.frames[0]
+        legacy.close()
+
+        self.assertEqual(migrate_hdf(h5_path, self.store), 4)
+        for expected, stored in zip(self.frames, self.store.read_days('EUR_USD', 'M5', self.days)):
+            pd.testing.assert_frame_equal(expected, stored)
+        self.assertTrue(self.store.contains('EUR_USD', 'S5', self.days[0]))
+
+    def test_live_candles_merge_into_a_backfilled_day(self):
+        # a stored day of 360 candles, then a live session repeating its last 60 with new
+        # prices and adding 40 more
+        candles = make_candles(400, start='2018-01-30T00:00:00', seconds=60, seed=3)
+        stored = decode_candles(candles[:360])
+        live = decode_candles(candles[300:]) + 0.01
+        expected = pd.concat([stored.iloc[:300], live])
+        h5_store = HDFCandleStore(os.path.join(self.directory.name, 'candles.h5'))
+        self.addCleanup(h5_store.close)
+        for store in (self.store, h5_store):
+            store.write_days('EUR_USD', 'S5', [(20180130, stored)])
+            store.append_candles('EUR_USD', 'S5', 20180130, live.iloc[:20])
+            store.append_candles('EUR_USD', 'S5', 20180130, live.iloc[20:])
+            # readers see the live candles before they are compacted
+            pd.testing.assert_frame_equal(store.read_days('EUR_USD', 'S5', [20180130])[0], expected)
+            store.compact_live('EUR_USD', 'S5', 20180130)
+            self.assertIsNone(store.read_live('EUR_USD', 'S5', 20180130))
+            pd.testing.assert_frame_equal(store.read_days('EUR_USD', 'S5', [20180130])[0], expected)
+
+    def test_parse_day_key(self):
+        self.assertEqual(parse_day_key('/EUR_USDM520180102'), ('EUR_USD', 'M5', 20180102))
+        self.assertEqual(parse_day_key('SPX500_USDS3020180102'), ('SPX500_USD', 'S30', 20180102))
+        with self.assertRaises(ValueError):
+            parse_day_key('/something_else')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+import arrow as time
+import numpy as np
+import pandas as pd
+from oanda.candle_store import HDFCandleStore, ParquetCandleStore
+from oanda.oanda_candles_api import CandlesAPI, decode_candles, parse_time_of_day
+from oanda.synthetic import make_candles
+
+
+class TestDecodeCandles(unittest.TestCase):
+
+    def test_matches_per_candle_decoding(self):
+        candles = make_candles(500, start='2018-01-02T22:00:00', seconds=30)
+        frame = decode_candles(candles)
+
+        expected_index = [
+            int(time.get(candle['time'], 'YYYY-MM-DDTHH:mm:ss.SSSSSSSSZ').format('HHmmss'))
+            for candle in candles
+        ]
+        self.assertEqual(list(frame.index), expected_index)
+        self.assertEqual(frame.index.name, 'time_of_day')
+        self.assertEqual(frame.index.dtype, np.int64)
+        self.assertEqual(list(frame.columns), [
+            'ask_open', 'bid_open', 'ask_close', 'bid_close',
+            'ask_high', 'bid_high', 'ask_low', 'bid_low'
+        ])
+        self.assertEqual(list(frame['bid_low']),
+                         [float(candle['bid']['l']) for candle in candles])
+        self.assertEqual(list(frame['ask_close']),
+                         [float(candle['ask']['c']) for candle in candles])
+
+    def test_parses_other_time_layouts(self):
+        times = ['2018-01-02T13:04:05Z', '2018-01-02T15:04:05.5+02:00']
+        self.assertEqual(list(parse_time_of_day(times)), [130405, 130405])
+
+    def test_empty(self):
+        frame = decode_candles([])
+        self.assertEqual(frame.shape, (0, 8))
+        self.assertEqual(frame.index.dtype, np.int64)
+
+
+class TestDefaultStore(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(directory.name)
+
+    def open_api(self, config):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            api = CandlesAPI(dict(config, token='token'))
+        self.addCleanup(getattr(api.store, 'close', lambda: None))
+        return api, out.getvalue()
+
+    def test_unmigrated_hdf_store_is_used(self):
+        legacy = HDFCandleStore('oanda_api_store.h5')
+        legacy.write_days('EUR_USD', 'M5', [(20180130, decode_candles(make_candles(10)))])
+        legacy.close()
+        api, out = self.open_api({})
+        self.assertIsInstance(api.store, HDFCandleStore)
+        self.assertTrue(api.store.contains('EUR_USD', 'M5', 20180130))
+        self.assertIn('python -m oanda.candle_store migrate', out)
+
+        api, out = self.open_api({'store': 'candles'})
+        self.assertIsInstance(api.store, ParquetCandleStore)
+        self.assertEqual(out, '')
+
+    def test_parquet_store_by_default(self):
+        api, out = self.open_api({})
+        self.assertIsInstance(api.store, ParquetCandleStore)
+        self.assertEqual(out, '')
+
+
+if __name__ == '__main__':
+    unittest.main()
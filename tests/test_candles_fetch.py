@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+import arrow as time
+import numpy as np
+import requests as http
+from oanda.oanda_candles_api import CandlesAPI
+from oanda.oanda_env import OandaEnv
+from oanda.sessions import SessionCalendar
+from oanda.synthetic import StubCandleServer
+
+
+class TestConcurrentFetch(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.day = time.get('2018-01-02T00:00:00+00:00')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def api(self, server, **config):
+        config.setdefault('backoff', 0)
+        api = CandlesAPI(dict(config, token='Bearer test', inst_base_url=server.url,
+                              store=os.path.join(self.directory.name, 'candles')))
+        self.addCleanup(api.store.close)
+        return api
+
+    def test_chunked_requests_come_back_in_order(self):
+        with StubCandleServer(delay=0.01) as server:
+            candles = self.api(server, concurrency=8, max_candles=120).load_day(
+                self.day, 'EUR_USD', 'S30', 'BA')
+
+        self.assertEqual(len(server.requests), 24)
+        self.assertEqual(len(candles), 24 * 120)
+        times = [candle['time'] for candle in candles]
+        self.assertEqual(times, sorted(times))
+        self.assertTrue(times[0].startswith('2018-01-02T00:00:00'))
+        self.assertTrue(times[-1].startswith('2018-01-02T23:59:30'))
+
+    def test_retries_rate_limited_requests(self):
+        with StubCandleServer(failures=3) as server:
+            candles = self.api(server, concurrency=1).load_day(
+                self.day, 'EUR_USD', 'M5', 'BA')
+
+        self.assertEqual(len(server.requests), 4)
+        self.assertEqual(len(candles), 288)
+
+    def test_load_period_fetches_missing_days_once(self):
+        end = time.get('2018-01-08T00:00:00+00:00')
+        with StubCandleServer() as server:
+            api = self.api(server, concurrency=4, max_candles=720)
+            days = api.load_period('EUR_USD', 'S30', self.day, end)
+            requests = len(server.requests)
+            again = api.load_period('EUR_USD', 'S30', self.day, end)
+
+        # Tuesday to Friday, the Sunday evening session and Monday
+        self.assertEqual(len(days), 6)
+        self.assertEqual(requests, 6 * 4)
+        self.assertEqual(len(server.requests), requests)
+        for day, stored in zip(days, again):
+            self.assertEqual(len(day), 2880)
+            self.assertTrue(day.equals(stored))
+        self.assertEqual(days[0].index[0], 0)
+        self.assertEqual(days[0].index[-1], 235930)
+
+    def test_days_fetched_before_a_failure_are_stored(self):
+        class FailingServer(StubCandleServer):
+            def candles(self, query):
+                if query['from'][0].startswith('2018-02-02'):
+                    raise RuntimeError('connection dropped')
+                return super().candles(query)
+
+        start, end = time.get('2018-01-29T00:00:00+00:00'), time.get('2018-02-02T00:00:00+00:00')
+        with FailingServer() as server:
+            api = self.api(server, concurrency=4, max_candles=720, max_retries=0)
+            with self.assertRaises(http.ConnectionError):
+                api.load_period('EUR_USD', 'S30', start, end)
+        stored = [api.store.contains('EUR_USD', 'S30', day) for day in time.Arrow.range('day', start, end)]
+        self.assertEqual(stored, [True, True, True, True, False])
+
+    def test_env_steps_through_a_week_of_m5_sessions(self):
+        # the Sunday evening session has 24 M5 candles, fewer than the indicators warm up on
+        end = time.get('2018-01-08T00:00:00+00:00')
+        with StubCandleServer(calendar=SessionCalendar()) as server:
+            api = self.api(server)
+            rng = np.random.default_rng(0)
+            for array_backed in (False, True):
+                env = OandaEnv(api, array_backed=array_backed)
+                env.initialize('EUR_USD', 'M5', self.day, end)
+                self.assertEqual(len(api.load_period('EUR_USD', 'M5', self.day, end)), 6)
+                self.assertEqual(len(env.episodes), 5)
+                for _ in range(len(env.episodes)):
+                    episode, done = env.next_episode(), False
+                    while not done:
+                        _, _, done = episode.step(int(rng.integers(-1, 2)))
+
+    def test_env_over_a_period_without_episodes(self):
+        saturday, sunday = time.get('2018-01-06T00:00:00+00:00'), time.get('2018-01-07T00:00:00+00:00')
+        with StubCandleServer(calendar=SessionCalendar()) as server:
+            env = OandaEnv(self.api(server))
+            for start, end in ((saturday, saturday), (sunday, sunday)):
+                env.initialize('EUR_USD', 'M5', start, end,
+                               mmap_path=os.path.join(self.directory.name, 'episodes.bin'))
+                self.assertEqual(len(env.episodes), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+import numpy as np
+import pandas as pd
+from core.dataprep import DataPrep, Denoiser
+from core.constants import raw_signals
+from oanda.preprocessing import add_indicators, denoise_frame
+from oanda.synthetic import make_day
+
+
+def column_by_column(denoiser, data):
+    smoothed_signals = [pd.Series(data.index).rename('time_of_day')]
+    for signal_name in data:
+        signal_smooth = denoiser.denoise(np.array(data[signal_name].values))
+        smoothed_signals.append(pd.Series(signal_smooth).rename(signal_name + '_' + denoiser.wavelet))
+    return pd.concat(smoothed_signals, axis=1).set_index('time_of_day')
+
+
+class TestBatchedDenoiser(unittest.TestCase):
+
+    def test_arrays_match_per_signal_denoising(self):
+        rng = np.random.default_rng(0)
+        for wavelet, level in [('bior6.8', 1), ('db4', 1), ('db4', 2)]:
+            denoiser = Denoiser(wavelet=wavelet, level=level)
+            for length in (33, 64, 65, 300):
+                windows = rng.normal(size=(6, length, 8)).cumsum(axis=1)
+                expected = np.stack([
+                    np.column_stack([denoiser.denoise(window[:, j]) for j in range(8)])
+                    for window in windows
+                ])
+                np.testing.assert_array_equal(denoiser.denoise_array(windows, axis=1), expected)
+                np.testing.assert_array_equal(denoiser.denoise_array(windows[0]), expected[0])
+                np.testing.assert_array_equal(denoiser.denoise_array(windows[0].T, axis=1), expected[0].T)
+
+    def test_frames_match_column_by_column(self):
+        day = make_day(300, seed=2)
+        denoiser = Denoiser()
+        for rows in (64, 65, 300):
+            data = day[raw_signals].iloc[:rows]
+            pd.testing.assert_frame_equal(denoiser.denoise_frame(data), column_by_column(denoiser, data))
+            pd.testing.assert_frame_equal(denoise_frame(data), column_by_column(denoiser, data))
+
+    def test_make_windows_matches_window_by_window(self):
+        day = add_indicators(make_day(200, seed=3))
+        prep = DataPrep([day])
+        denoiser = Denoiser()
+        expected = []
+        for j in range(1, len(day) - 64, 16):
+            window_x = day.iloc[j-1:j + 64]
+            window_smooth = column_by_column(denoiser, window_x[raw_signals]).diff()
+            window_x = pd.concat([window_x, window_smooth], axis=1).drop(raw_signals, axis=1).dropna()
+            expected.append(prep.scale_frame(window_x))
+        np.testing.assert_array_equal(prep.make_windows(window_size=64), np.array(expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
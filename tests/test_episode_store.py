@@ -0,0 +1,111 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import numpy as np
+import pandas as pd
+from oanda.episode_store import save_days, MappedDays
+from oanda.oanda_env import OandaEnv, Episode
+from oanda.preprocessing import add_indicators
+from oanda.rewards import FinishedTradeRewards
+from oanda.synthetic import make_day
+
+
+class FakeAPI:
+    def __init__(self, days):
+        self.days = days
+        self.calls = 0
+
+    def load_period(self, instrument, granularity, start, end):
+        self.calls += 1
+        return self.days
+
+
+class TestMappedDays(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'episodes.bin')
+        self.days = [add_indicators(make_day(count, seed=count)) for count in (120, 200, 90)]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_days_are_views_into_one_mapping(self):
+        save_days(self.days, self.path, metadata={'instrument': 'EUR_USD'})
+        mapped = MappedDays(self.path)
+
+        self.assertEqual(len(mapped), 3)
+        self.assertEqual(mapped.metadata, {'instrument': 'EUR_USD'})
+        self.assertEqual(list(mapped.offsets), [0, 86, 252, 308])
+        for expected, day in zip(self.days, mapped):
+            pd.testing.assert_frame_equal(expected, day, check_column_type=False)
+        self.assertTrue(np.shares_memory(mapped[1].to_numpy(), mapped.data))
+        self.assertTrue(np.shares_memory(mapped.array(2), mapped.data))
+
+    def test_float32(self):
+        save_days(self.days, self.path, dtype='float32')
+        day = MappedDays(self.path)[0]
+        self.assertEqual(day.to_numpy().dtype, np.float32)
+        np.testing.assert_allclose(day.to_numpy(), self.days[0].to_numpy(), rtol=1e-6)
+
+    def test_episodes_step_the_same_from_the_mapping(self):
+        save_days(self.days, self.path)
+        mapped = MappedDays(self.path)
+        expected = Episode(self.days[1], 32, FinishedTradeRewards())
+        episode = Episode(mapped[1], 32, FinishedTradeRewards())
+        for action in [1, 0, 0, -1, -1, 0, 1]:
+            state, reward, done = episode.step(action)
+            expected_state, expected_reward, expected_done = expected.step(action)
+            np.testing.assert_array_equal(state['market_state'], expected_state['market_state'])
+            np.testing.assert_array_equal(state['env_state'], expected_state['env_state'])
+            self.assertEqual((reward, done), (expected_reward, expected_done))
+
+    def test_env_builds_the_mapping_once(self):
+        api = FakeAPI([make_day(150, seed=1), make_day(150, seed=2)])
+        env = OandaEnv(api)
+        env.initialize(mmap_path=self.path)
+        self.assertIsInstance(env.episodes, MappedDays)
+
+        worker = OandaEnv(api)
+        worker.initialize(mmap_path=self.path)
+        self.assertEqual(api.calls, 1)
+        self.assertEqual(len(worker.episodes), 2)
+
+        worker.initialize(instrument='GBP_USD', mmap_path=self.path)
+        self.assertEqual(api.calls, 2)
+        self.assertEqual(worker.episodes.metadata['instrument'], 'GBP_USD')
+
+    def test_snapshot_restores_episodes_and_parameters(self):
+        api = FakeAPI([make_day(150, seed=1), make_day(150, seed=2)])
+        env = OandaEnv(api)
+        env.initialize(granularity='S5')
+        env.snapshot(self.path)
+
+        started = time.perf_counter()
+        restored = OandaEnv(None).load_snapshot(self.path)
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertEqual(restored.parameters, env.parameters)
+        self.assertEqual(restored.parameters['granularity'], 'S5')
+        self.assertEqual(restored.parameters['indicators']['ao'], {'s': 13, 'l': 35})
+        for expected, day in zip(env.episodes, restored.episodes):
+            pd.testing.assert_frame_equal(expected, day, check_column_type=False)
+
+        # a snapshot also serves as the mapping initialize looks for
+        worker = OandaEnv(api)
+        worker.initialize(granularity='S5', mmap_path=self.path)
+        self.assertEqual(api.calls, 1)
+
+    def test_env_import_leaves_heavy_dependencies_unloaded(self):
+        code = ('import sys, oanda.oanda_env; '
+                'print(",".join(m for m in ("scipy", "statsmodels", "pywt", "ta", "sklearn") if m in sys.modules))')
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        loaded = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                cwd=root, check=True).stdout.strip()
+        self.assertEqual(loaded, '')
+
+
+if __name__ == '__main__':
+    unittest.main()
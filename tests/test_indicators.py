@@ -0,0 +1,69 @@
+import unittest
+import numpy as np
+import pandas as pd
+import ta
+from core.indicators import LiveIndicators, ao, average_true_range, ema, indicators, mid_prices, rsi, stack
+from oanda.preprocessing import add_indicators, add_indicators_to_days
+from oanda.synthetic import make_day
+
+
+def ta_indicators(day):
+    high, low, close = (price.rename(name) for price, name in zip(mid_prices(day), ('high', 'low', 'close')))
+    ao = ta.momentum.ao(high, low, s=13, l=35, fillna=False).rename('ao')
+    rsi = ta.momentum.rsi(close, n=13, fillna=False).rename('rsi')
+    atr = ta.volatility.average_true_range(high, low, close, n=13, fillna=False).rename('atr')
+    ema13 = ta.trend.ema_indicator(close, n=13, fillna=False).rename('ema13')
+    ema35 = ta.trend.ema_indicator(close, n=35, fillna=False).rename('ema35')
+    return pd.concat([day, ao, rsi, atr, ema13, ema35], axis=1).dropna()
+
+
+class TestIndicators(unittest.TestCase):
+
+    def setUp(self):
+        self.days = [make_day(count, seed=seed) for seed, count in enumerate((300, 120, 36, 20))]
+
+    def test_functions_match_ta(self):
+        high, low, close = (price for price in mid_prices(self.days[0]))
+        arrays = [price.to_numpy() for price in (high, low, close)]
+        pairs = [
+            (ao(arrays[0], arrays[1], s=13, l=35), ta.momentum.ao(high, low, s=13, l=35)),
+            (rsi(arrays[2], n=13), ta.momentum.rsi(close, n=13)),
+            (average_true_range(*arrays, n=13), ta.volatility.average_true_range(high, low, close, n=13)),
+            (ema(arrays[2], 13), ta.trend.ema_indicator(close, n=13)),
+            (ema(arrays[2], 35), ta.trend.ema_indicator(close, n=35)),
+        ]
+        for ours, theirs in pairs:
+            np.testing.assert_array_equal(np.isnan(ours), theirs.isna().to_numpy())
+            np.testing.assert_allclose(ours, theirs.to_numpy(), rtol=1e-9, atol=1e-12)
+
+    def test_days_are_enhanced_like_ta(self):
+        for day, enhanced in zip(self.days, add_indicators_to_days(self.days)):
+            expected = ta_indicators(day)
+            self.assertEqual(list(enhanced.columns), list(expected.columns))
+            self.assertTrue(enhanced.index.equals(expected.index))
+            np.testing.assert_allclose(enhanced.to_numpy(), expected.to_numpy(), rtol=1e-9, atol=1e-12)
+        pd.testing.assert_frame_equal(add_indicators(self.days[1]), add_indicators_to_days(self.days)[1])
+
+    def test_stacked_days_match_single_days(self):
+        stacked = indicators(*(stack([price.to_numpy() for price in prices])
+                               for prices in zip(*(mid_prices(day) for day in self.days))))
+        for i, day in enumerate(self.days):
+            single = indicators(*(price.to_numpy() for price in mid_prices(day)))
+            for name, values in single.items():
+                np.testing.assert_array_equal(stacked[name][i, :len(day)], values)
+
+    def test_live_updates_match_the_batch(self):
+        day = self.days[0]
+        batch = indicators(*(price.to_numpy() for price in mid_prices(day)))
+        live = LiveIndicators()
+        for i, candle in enumerate(day.to_dict('records')):
+            row = live.update_candle(candle)
+            for name, values in batch.items():
+                if np.isnan(values[i]):
+                    self.assertTrue(np.isnan(row[name]), (name, i))
+                else:
+                    self.assertAlmostEqual(row[name], values[i], delta=1e-12 * max(1, abs(values[i])))
+
+
+if __name__ == '__main__':
+    unittest.main()
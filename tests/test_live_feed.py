@@ -0,0 +1,100 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from oanda.live_feed import LiveFeed
+from oanda.oanda_candles_api import CandlesAPI, decode_candles
+from oanda.oanda_env import ArrayEpisode
+from oanda.preprocessing import add_indicators
+from oanda.rewards import FinishedTradeRewards
+from oanda.synthetic import ReplayCandleServer, make_candles
+
+
+class TestLiveFeed(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        # the end of one trading day and the start of the next
+        self.candles = make_candles(260, start='2018-01-02T23:50:00', seconds=5, seed=11)
+        self.recording = os.path.join(self.directory.name, 'candles.json')
+        with open(self.recording, 'w') as out:
+            json.dump({'candles': self.candles}, out)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def api(self, server, store):
+        api = CandlesAPI({'token': 'Bearer test', 'inst_base_url': server.url, 'backoff': 0,
+                          'store': os.path.join(self.directory.name, store)})
+        self.addCleanup(api.store.close)
+        return api
+
+    def expected_market_state(self, candles):
+        with contextlib.redirect_stdout(io.StringIO()):
+            episode = ArrayEpisode(add_indicators(decode_candles(candles)), 32, FinishedTradeRewards())
+        episode.current_step = len(episode.values) - 32
+        return episode.market_state()
+
+    def test_polls_append_and_observe(self):
+        for store in ('candles', 'candles.h5'):
+            with ReplayCandleServer(self.recording) as server:
+                api = self.api(server, store)
+                feed = LiveFeed(api, 'EUR_USD', 'S5')
+                arrived = []
+                for _ in range(13):
+                    server.publish(20)
+                    arrived.append(feed.poll())
+                    self.assertEqual(feed.poll(), 0)
+                # the newest candle is still forming
+                self.assertEqual(sum(arrived), 259)
+                self.assertEqual(len(server.requests), 26)
+
+            first, second = api.store.read_days('EUR_USD', 'S5', [20180102, 20180103])
+            pd.testing.assert_frame_equal(first, decode_candles(self.candles[:120]))
+            pd.testing.assert_frame_equal(second, decode_candles(self.candles[120:259]))
+            # finished days are compacted, the running day stays in live parts
+            self.assertTrue(api.store.contains('EUR_USD', 'S5', 20180102))
+            self.assertFalse(api.store.contains('EUR_USD', 'S5', 20180103))
+
+            self.assertTrue(feed.ready())
+            np.testing.assert_array_equal(feed.observe()['market_state'],
+                                          self.expected_market_state(self.candles[120:259]))
+
+    def test_parquet_appends_leave_written_parts_alone(self):
+        with ReplayCandleServer(self.candles, visible=130) as server:
+            api = self.api(server, 'candles')
+            feed = LiveFeed(api, 'EUR_USD', 'S5')
+            feed.poll()
+            parts = api.store.live_parts('EUR_USD', 'S5', 20180103)
+            stats = [os.stat(part).st_mtime_ns for part in parts]
+            server.publish(10)
+            feed.poll()
+            later = api.store.live_parts('EUR_USD', 'S5', 20180103)
+        self.assertEqual(later[:len(parts)], parts)
+        self.assertEqual([os.stat(part).st_mtime_ns for part in parts], stats)
+        self.assertEqual(len(later), len(parts) + 1)
+
+    def test_agent_acts_once_per_bar(self):
+        with ReplayCandleServer(self.candles, visible=250) as server:
+            api = self.api(server, 'candles')
+            feed = LiveFeed(api, 'EUR_USD', 'S5')
+            observations = []
+
+            def agent(observation):
+                observations.append(observation)
+                server.publish(1)
+                return 1 if len(observations) == 1 else 0
+
+            self.assertEqual(feed.run(agent, interval=0, bars=3), 3)
+        self.assertEqual(observations[0]['market_state'].shape, (32, 11))
+        self.assertEqual(observations[0]['env_state'].shape, (32, 4))
+        self.assertEqual(feed.account.current_order.order_type, 1)
+        self.assertTrue(all(latency < 1 for latency in feed.latencies))
+
+
+if __name__ == '__main__':
+    unittest.main()
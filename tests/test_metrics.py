@@ -0,0 +1,130 @@
+import io
+import json
+import os
+import pstats
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+import arrow as time
+import numpy as np
+from oanda.metrics import Metrics
+from oanda.oanda_candles_api import CandlesAPI
+from oanda.oanda_env import Episode, ArrayEpisode, OandaEnv
+from oanda.observation_cache import ObservationCache
+from oanda.preprocessing import add_indicators
+from oanda.rewards import FinishedTradeRewards
+from oanda.synthetic import StubCandleServer, make_day
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.day = add_indicators(make_day(120, seconds=5, seed=5))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_episode(self, episode_type, metrics, steps=20, **kwargs):
+        episode = episode_type(self.day, 16, FinishedTradeRewards(), metrics=metrics, **kwargs)
+        actions = np.random.default_rng(0).choice([0, 1, -1], size=steps)
+        for action in actions:
+            episode.step(int(action))
+        return episode
+
+    def test_disabled_records_and_prints_nothing(self):
+        metrics = Metrics()
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.run_episode(ArrayEpisode, metrics)
+            self.run_episode(Episode, metrics)
+        self.assertEqual(output.getvalue(), '')
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['timers'], {})
+        self.assertEqual(snapshot['counters'], {})
+
+    def test_verbose_prints_new_episodes(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.run_episode(ArrayEpisode, Metrics(verbose=True), steps=1)
+        self.assertEqual(output.getvalue(), 'new episode\n')
+
+    def test_records_step_phases(self):
+        metrics = Metrics(enabled=True)
+        self.run_episode(ArrayEpisode, metrics)
+        self.run_episode(Episode, metrics)
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['counters']['steps'], 40)
+        self.assertEqual(snapshot['counters']['episodes'], 2)
+        for name in ('step', 'order', 'denoise', 'reward'):
+            self.assertEqual(snapshot['timers'][name]['calls'], 40)
+        self.assertGreater(snapshot['timers']['step']['seconds'], 0)
+        self.assertGreater(snapshot['steps_per_second'], 0)
+
+    def test_observation_cache_hit_rate(self):
+        metrics = Metrics(enabled=True)
+        cache = ObservationCache(os.path.join(self.directory.name, 'cache'))
+        self.run_episode(ArrayEpisode, metrics, steps=2, observation_cache=cache)
+        self.run_episode(ArrayEpisode, metrics, steps=2, observation_cache=cache)
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['observation_cache_hit_rate'], 0.5)
+        self.assertEqual(snapshot['timers']['slice']['calls'], 4)
+
+    def test_store_hit_rate_and_http(self):
+        metrics = Metrics(enabled=True)
+        start = time.get('2018-01-02T00:00:00+00:00')
+        end = time.get('2018-01-04T00:00:00+00:00')
+        with StubCandleServer() as server:
+            api = CandlesAPI({'token': 'Bearer test', 'inst_base_url': server.url, 'backoff': 0,
+                              'store': os.path.join(self.directory.name, 'candles')}, metrics=metrics)
+            self.addCleanup(api.store.close)
+            api.load_period('EUR_USD', 'M5', start, end)
+            api.load_period('EUR_USD', 'M5', start, end)
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['store_hit_rate'], 0.5)
+        self.assertEqual(snapshot['counters']['http.requests'], len(server.requests))
+        self.assertGreater(snapshot['counters']['http.bytes'], 0)
+        self.assertGreater(snapshot['http_latency'], 0)
+
+    def test_env_shares_the_api_metrics(self):
+        start = time.get('2018-01-02T00:00:00+00:00')
+        with StubCandleServer() as server:
+            api = CandlesAPI({'token': 'Bearer test', 'inst_base_url': server.url, 'backoff': 0,
+                              'store': os.path.join(self.directory.name, 'candles')},
+                             metrics=Metrics(enabled=True))
+            self.addCleanup(api.store.close)
+            env = OandaEnv(api)
+            env.initialize('EUR_USD', 'M5', start, start)
+        self.assertIs(env.metrics, api.metrics)
+        episode = env.next_episode()
+        for _ in range(5):
+            episode.step(0)
+
+        snapshot = env.metrics.snapshot()
+        self.assertEqual(snapshot['store_hit_rate'], 0.0)
+        self.assertGreater(snapshot['http_latency'], 0)
+        self.assertGreater(snapshot['counters']['http.bytes'], 0)
+        self.assertEqual(snapshot['counters']['steps'], 5)
+
+    def test_json_export(self):
+        metrics = Metrics(enabled=True)
+        self.run_episode(ArrayEpisode, metrics, steps=3)
+        path = os.path.join(self.directory.name, 'metrics.json')
+        metrics.to_json(path)
+        with open(path) as exported:
+            loaded = json.load(exported)
+        self.assertEqual(loaded['counters']['steps'], 3)
+        self.assertEqual(loaded['timers']['step']['calls'], 3)
+
+    def test_profile_writes_stats(self):
+        path = os.path.join(self.directory.name, 'steps.prof')
+        metrics = Metrics()
+        with metrics.profile(path):
+            self.run_episode(ArrayEpisode, metrics, steps=3)
+        functions = [name for _, _, name in pstats.Stats(path).stats]
+        self.assertIn('step', functions)
+
+
+if __name__ == '__main__':
+    unittest.main()
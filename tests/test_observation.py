@@ -0,0 +1,78 @@
+import unittest
+import warnings
+import numpy as np
+from oanda.observation import RollingWindow
+from oanda.oanda_env import ArrayEpisode
+from oanda.preprocessing import add_indicators, scale_array
+from oanda.rewards import FinishedTradeRewards
+from oanda.synthetic import make_day
+
+
+class TestIncrementalMarketSignal(unittest.TestCase):
+
+    def setUp(self):
+        self.day = add_indicators(make_day(200, seed=7))
+        self.actions = np.random.default_rng(3).choice([0, 1, -1], size=300)
+
+    def episodes(self, window_size, mode):
+        return (ArrayEpisode(self.day, window_size, FinishedTradeRewards()),
+                ArrayEpisode(self.day, window_size, FinishedTradeRewards(), signal_mode=mode))
+
+    def test_exact_mode_matches(self):
+        # 32 stays below one wavelet level, 48 denoises every window
+        for window_size in (32, 48):
+            expected, episode = self.episodes(window_size, 'exact')
+            np.testing.assert_array_equal(episode.process_for_agent()['market_state'],
+                                          expected.process_for_agent()['market_state'])
+            for action in self.actions:
+                if expected.done:
+                    break
+                state, _, _ = episode.step(action)
+                expected_state, _, _ = expected.step(action)
+                np.testing.assert_array_equal(state['market_state'], expected_state['market_state'])
+
+    def test_approximate_mode_is_exact_on_refresh(self):
+        expected, episode = self.episodes(48, 'approximate')
+        episode.signal.refresh = 4
+        for action in self.actions:
+            if expected.done:
+                break
+            state, _, _ = episode.step(action)
+            expected_state, _, _ = expected.step(action)
+            self.assertEqual(state['market_state'].shape, expected_state['market_state'].shape)
+            if episode.signal.refreshed == episode.current_step:
+                np.testing.assert_array_equal(state['market_state'], expected_state['market_state'])
+            else:
+                # passthrough indicator columns stay exact between refreshes
+                np.testing.assert_array_equal(state['market_state'][:, :3], expected_state['market_state'][:, :3])
+
+    def test_rolling_window_tracks_min_max(self):
+        rows = np.random.default_rng(5).normal(size=(100, 3))
+        rolling = RollingWindow(10, 3)
+        rolling.fill(rows[:10])
+        for i in range(10, 100):
+            rolling.push(rows[i])
+            np.testing.assert_array_equal(rolling.window(), rows[i - 9:i + 1])
+            np.testing.assert_array_equal(rolling.scaled(), scale_array(rows[i - 9:i + 1]))
+
+    def test_rolling_window_skips_nans(self):
+        rows = np.random.default_rng(6).normal(size=(100, 3))
+        rows[::7, 1] = np.nan
+        # column 2 is all nan for a few windows
+        rows[40:55, 2] = np.nan
+        rolling = RollingWindow(10, 3)
+        rolling.fill(rows[:10])
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            for i in range(10, 100):
+                rolling.push(rows[i])
+                np.testing.assert_array_equal(rolling.scaled(), scale_array(rows[i - 9:i + 1]))
+                # one nan only hides its own value
+                self.assertEqual(np.isnan(rolling.scaled()[:, 1]).sum(), np.isnan(rows[i - 9:i + 1, 1]).sum())
+
+        rolling.set_columns([1], rows[:10, 1:2])
+        np.testing.assert_array_equal(rolling.minimum[1], np.nanmin(rows[:10, 1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+import numpy as np
+from oanda.episode_store import pack_days, save_days
+from oanda.observation_cache import ObservationCache, main
+from oanda.oanda_env import ArrayEpisode
+from oanda.preprocessing import add_indicators
+from oanda.rewards import FinishedTradeRewards
+from oanda.synthetic import make_day
+
+
+class TestObservationCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = ObservationCache(os.path.join(self.directory.name, 'cache'))
+        self.day = add_indicators(make_day(150, seed=11))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_cached_episode_matches_live_observations(self):
+        for window_size in (32, 48):
+            expected = ArrayEpisode(self.day, window_size, FinishedTradeRewards())
+            episode = ArrayEpisode(self.day, window_size, FinishedTradeRewards(), observation_cache=self.cache)
+            self.assertEqual(episode.market_tensor.shape[0], episode.length)
+            np.testing.assert_array_equal(episode.process_for_agent()['market_state'],
+                                          expected.process_for_agent()['market_state'])
+            for action in np.random.default_rng(window_size).choice([0, 1, -1], size=200):
+                if expected.done:
+                    break
+                state, reward, done = episode.step(action)
+                expected_state, expected_reward, _ = expected.step(action)
+                np.testing.assert_array_equal(state['market_state'], expected_state['market_state'])
+                np.testing.assert_array_equal(state['env_state'], expected_state['env_state'])
+                self.assertEqual(reward, expected_reward)
+
+    def test_keys_follow_data_and_parameters(self):
+        key = self.cache.key(self.day, 32)
+        self.assertEqual(key, self.cache.key(self.day.copy(), 32))
+        self.assertNotEqual(key, self.cache.key(self.day, 48))
+        self.assertNotEqual(key, self.cache.key(self.day, 32, wavelet='db4'))
+        changed = self.day.copy()
+        changed.iloc[5, 0] += 1e-5
+        self.assertNotEqual(key, self.cache.key(changed, 32))
+
+    def test_packed_days_are_hashed_once(self):
+        days = pack_days([self.day, add_indicators(make_day(120, seed=12))])
+        key = self.cache.key(days[0], 32)
+        self.assertEqual(key, self.cache.key(self.day, 32))
+        self.assertEqual(len(self.cache.digests[id(days.data)][1]), 1)
+        self.assertEqual(self.cache.key(days[0], 48), self.cache.key(pack_days([self.day])[0], 48))
+        self.assertNotEqual(self.cache.key(days[1], 32), key)
+        self.assertEqual(len(self.cache.digests[id(days.data)][1]), 2)
+        # writeable days may change between episodes and freed days drop out
+        self.cache.key(self.day, 32)
+        self.assertEqual(list(self.cache.digests), [id(days.data)])
+
+    def test_short_days_are_refused(self):
+        with self.assertRaisesRegex(ValueError, 'too short'):
+            self.cache.get(self.day[:32], 32)
+        with self.assertRaisesRegex(ValueError, 'too short'):
+            ArrayEpisode(self.day[:20], 32, FinishedTradeRewards(), observation_cache=self.cache)
+        self.assertEqual(self.cache.get(self.day[:33], 32).shape[0], 1)
+
+    def test_hits_reuse_the_file(self):
+        first = self.cache.get(self.day, 32)
+        os.utime(first.filename, (0, 0))
+        second = self.cache.get(self.day, 32)
+        self.assertEqual(first.filename, second.filename)
+        self.assertGreater(os.stat(second.filename).st_mtime, 0)
+
+    def test_evicts_least_recently_used(self):
+        days = [add_indicators(make_day(150, seed=seed)) for seed in range(3)]
+        paths = [self.cache.get(day, 32).filename for day in days]
+        os.utime(paths[0], (100, 100))
+        os.utime(paths[1], (50, 50))
+        self.cache.max_bytes = self.cache.size() - 1
+        self.cache.evict()
+        self.assertEqual([os.path.exists(path) for path in paths], [True, False, True])
+
+    def test_build_command(self):
+        episodes = os.path.join(self.directory.name, 'episodes.bin')
+        save_days([self.day, add_indicators(make_day(120, seed=12))], episodes)
+        cache = os.path.join(self.directory.name, 'built')
+        out = io.StringIO()
+        with redirect_stdout(out):
+            main(['build', episodes, '--cache', cache, '--window-size', '32'])
+        self.assertEqual(len(ObservationCache(cache).entries()), 2)
+        self.assertIn('day 2/2', out.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
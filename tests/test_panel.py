@@ -0,0 +1,96 @@
+import unittest
+import numpy as np
+import pandas as pd
+from oanda.candle_store import price_names
+from oanda.oanda_env import OandaEnv, ArrayEpisode
+from oanda.panel import PanelLoader, align_days, seconds_of_day
+from oanda.rewards import FinishedTradeRewards
+from oanda.synthetic import make_day
+
+
+class FakeAPI:
+    def __init__(self, days):
+        # days[(instrument, granularity)] is a list of trading days
+        self.days = days
+        self.calls = []
+
+    def load_period(self, instrument, granularity, start, end):
+        self.calls.append((instrument, granularity))
+        return self.days[(instrument, granularity)]
+
+
+def two_days(count, seconds, seed):
+    return [make_day(count, seconds=seconds, seed=seed),
+            make_day(count, seconds=seconds, seed=seed + 1, start='2018-01-03T00:00:00')]
+
+
+def merge_as_of(day, other, seconds, other_seconds):
+    # pandas reference for one day: the last other candle closed by each candle's close
+    left = pd.DataFrame({'close': seconds_of_day(day.index) + seconds})
+    right = pd.DataFrame(other.to_numpy(), columns=price_names)
+    right['close'] = seconds_of_day(other.index) + other_seconds
+    return pd.merge_asof(left, right, on='close')[price_names].to_numpy()
+
+
+class TestPanel(unittest.TestCase):
+
+    def setUp(self):
+        self.base = two_days(400, 30, 0)
+        self.context = two_days(40, 300, 5)
+
+    def test_joins_as_of_candle_closes(self):
+        days = align_days(('S30', self.base), [('EUR_USD', 'M5', self.context)])
+        day = days[0]
+        # the first M5 candle closes with the tenth S30 candle, nothing is known before
+        self.assertTrue(np.isnan(day['EUR_USD_M5_ask_close'].iloc[:9]).all())
+        self.assertEqual(day['EUR_USD_M5_ask_close'].iloc[9], self.context[0]['ask_close'].iloc[0])
+        for i in range(2):
+            expected = merge_as_of(self.base[i], self.context[i], 30, 300)
+            np.testing.assert_array_equal(days[i].iloc[:, len(price_names):].to_numpy(), expected)
+            pd.testing.assert_frame_equal(days[i][price_names], self.base[i], check_column_type=False)
+
+    def test_days_stay_apart(self):
+        # the second day starts without the first day's last candle
+        days = align_days(('S30', self.base), [('EUR_USD', 'M5', self.context)])
+        self.assertFalse(np.isnan(days[0]['EUR_USD_M5_bid_close'].iloc[-1]))
+        self.assertTrue(np.isnan(days[1]['EUR_USD_M5_bid_close'].iloc[0]))
+
+    def test_missing_candles_take_the_last_one(self):
+        gappy = [day.drop(day.index[10:20]) for day in two_days(400, 30, 9)]
+        days = align_days(('S30', self.base), [('GBP_USD', 'S30', gappy)])
+        joined = days[0]['GBP_USD_S30_ask_open'].to_numpy()
+        np.testing.assert_array_equal(joined[:10], gappy[0]['ask_open'].iloc[:10])
+        np.testing.assert_array_equal(joined[10:20], np.full(10, gappy[0]['ask_open'].iloc[9]))
+        np.testing.assert_array_equal(joined[20:], gappy[0]['ask_open'].iloc[10:])
+
+    def test_loader_returns_one_contiguous_array(self):
+        api = FakeAPI({('EUR_USD', 'S30'): self.base, ('GBP_USD', 'S30'): two_days(400, 30, 7),
+                       ('EUR_USD', 'M5'): self.context})
+        days = PanelLoader(api, [('EUR_USD', 'S30'), ('GBP_USD', 'S30'), ('EUR_USD', 'M5')]).load(None, None)
+        self.assertEqual(api.calls, [('EUR_USD', 'S30'), ('GBP_USD', 'S30'), ('EUR_USD', 'M5')])
+        self.assertEqual(len(days), 2)
+        self.assertEqual(days.data.shape, (800, 3 * len(price_names)))
+        self.assertTrue(days.data.flags['C_CONTIGUOUS'])
+        self.assertTrue(np.shares_memory(days[1].to_numpy(), days.data))
+
+    def test_env_steps_with_context(self):
+        api = FakeAPI({('EUR_USD', 'S30'): self.base, ('EUR_USD', 'M5'): self.context})
+        env = OandaEnv(api, window_size=16)
+        env.initialize(granularity='S30', context=[('EUR_USD', 'M5')])
+        self.assertEqual(env.parameters['context'], [['EUR_USD', 'M5']])
+        day = env.next_trading_day()
+        self.assertIn('EUR_USD_M5_ask_close', day.columns)
+        self.assertFalse(day.isna().any().any())
+
+        episode = ArrayEpisode(day, 16, FinishedTradeRewards())
+        state, _, _ = episode.step(1)
+        # 3 indicators, 8 context prices and 8 smoothed diffs
+        self.assertEqual(state['market_state'].shape, (16, 19))
+
+    def test_rejects_uneven_days(self):
+        with self.assertRaises(ValueError):
+            align_days(('S30', self.base), [('EUR_USD', 'M5', self.context[:1])])
+
+
+if __name__ == '__main__':
+    unittest.main()
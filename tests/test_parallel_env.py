@@ -0,0 +1,70 @@
+import unittest
+import numpy as np
+from oanda.oanda_env import OandaEnv, ArrayEpisode
+from oanda.parallel_env import ParallelEnvRunner, WorkerError
+from oanda.preprocessing import add_indicators
+from oanda.rewards import FinishedTradeRewards
+from oanda.synthetic import make_day
+
+
+def trading_days():
+    return [add_indicators(make_day(count, seed=count)) for count in (110, 130)]
+
+
+def make_env():
+    env = OandaEnv(None)
+    env.episodes = trading_days()
+    return env
+
+
+def broken_env():
+    raise RuntimeError('no data')
+
+
+class TestParallelEnvRunner(unittest.TestCase):
+
+    def test_workers_match_in_process_episodes(self):
+        days = trading_days()
+        singles = [ArrayEpisode(day, 32, FinishedTradeRewards()) for day in days]
+        actions = np.random.default_rng(0).choice([0, 1, -1], size=(60, 2))
+
+        with ParallelEnvRunner(make_env, 2) as runner:
+            first = runner.reset()
+            expected = [episode.process_for_agent() for episode in singles]
+            for i in range(2):
+                np.testing.assert_array_equal(first['market_state'][i], expected[i]['market_state'])
+
+            for batch in actions:
+                observations, rewards, dones = runner.step(batch)
+                for i, episode in enumerate(singles):
+                    if episode.done:
+                        continue
+                    state, reward, done = episode.step(batch[i])
+                    self.assertEqual(rewards[i], reward)
+                    self.assertEqual(dones[i], done)
+                    if not done:
+                        np.testing.assert_array_equal(observations['market_state'][i], state['market_state'])
+                        np.testing.assert_array_equal(observations['env_state'][i], state['env_state'])
+
+        self.assertIsNone(runner.block)
+        self.assertFalse(any(process.is_alive() for process in runner.processes))
+
+    def test_worker_errors_surface(self):
+        with self.assertRaises(WorkerError) as raised:
+            ParallelEnvRunner(broken_env, 2)
+        self.assertIn('no data', str(raised.exception))
+
+    def test_dead_workers_surface(self):
+        with ParallelEnvRunner(make_env, 2) as runner:
+            runner.reset()
+            runner.step(np.zeros(2, dtype=int))
+            runner.processes[1].kill()
+            runner.processes[1].join()
+            with self.assertRaises(WorkerError) as raised:
+                runner.step(np.zeros(2, dtype=int))
+            self.assertIn('worker 1 exited with code -9', str(raised.exception))
+        self.assertFalse(any(process.is_alive() for process in runner.processes))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+import arrow as time
+from oanda.request_planner import plan_windows, count_requests, granularity_seconds
+
+
+class TestRequestPlanner(unittest.TestCase):
+
+    def setUp(self):
+        self.start = time.get('2018-01-02T00:00:00+00:00')
+        self.end = self.start.shift(days=1)
+
+    def test_windows_cover_the_range_without_gaps(self):
+        for granularity in granularity_seconds:
+            windows = plan_windows(self.start, self.end, granularity)
+            self.assertEqual(windows[0][0], self.start)
+            self.assertEqual(windows[-1][1], self.end)
+            for (_, stop), (start, _) in zip(windows, windows[1:]):
+                self.assertEqual(stop, start)
+            for start, stop in windows:
+                candles = (stop - start).total_seconds() / granularity_seconds[granularity]
+                self.assertLessEqual(candles, 5000)
+            self.assertEqual(len(windows), count_requests(self.start, self.end, granularity))
+
+    def test_requests_per_day(self):
+        self.assertEqual(len(plan_windows(self.start, self.end, 'S5')), 4)
+        self.assertEqual(len(plan_windows(self.start, self.end, 'S30')), 1)
+        self.assertEqual(len(plan_windows(self.start, self.end, 'M1')), 1)
+        self.assertEqual(len(plan_windows(self.start, self.end, 'S30', limit=100)), 29)
+
+    def test_unknown_granularity(self):
+        with self.assertRaises(ValueError):
+            plan_windows(self.start, self.end, 'W')
+
+    def test_empty_range(self):
+        self.assertEqual(plan_windows(self.end, self.start, 'M5'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
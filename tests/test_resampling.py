@@ -0,0 +1,111 @@
+import unittest
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+import arrow as time
+import numpy as np
+from oanda.candle_store import price_names
+from oanda.panel import seconds_of_day
+from oanda.resampling import resample_days, time_of_day
+from oanda.sessions import SessionCalendar, as_dates, new_york_offset
+from oanda.synthetic import make_day
+
+
+def gappy_day(count, seconds, seed, start='2018-01-02T00:00:00'):
+    day = make_day(count, seconds=seconds, seed=seed, start=start)
+    keep = np.random.default_rng(seed).random(count) > 0.3
+    return day[keep]
+
+
+def reindexed(day, step, method=None, limit=None, start=0, stop=86400):
+    # pandas reference for one day
+    frame = day.copy()
+    frame.index = seconds_of_day(day.index)
+    grid = np.arange(-(-start // step) * step, stop, step)
+    return frame.reindex(grid, method=method, limit=limit).to_numpy()
+
+
+class TestSessionCalendar(unittest.TestCase):
+
+    def test_new_york_offset_matches_zoneinfo(self):
+        dates = np.arange(np.datetime64('2015-01-01'), np.datetime64('2021-01-01'))
+        new_york = ZoneInfo('America/New_York')
+        expected = [
+            -datetime(*map(int, str(date).split('-')), 17, tzinfo=new_york).utcoffset() // timedelta(hours=1)
+            for date in dates
+        ]
+        np.testing.assert_array_equal(new_york_offset(dates), expected)
+
+    def test_sessions(self):
+        calendar = SessionCalendar()
+        days = [20180302, 20180304, 20180305, 20180309, 20180310, 20180311, 20181225, 20181102]
+        opens, closes = calendar.sessions(days)
+        # Friday closes 22:00 UTC in winter, Sunday opens 21:00 UTC once daylight saving started
+        self.assertEqual(list(opens // 3600), [0, 22, 0, 0, 0, 21, 0, 0])
+        self.assertEqual(list(closes // 3600), [22, 24, 24, 22, 0, 24, 0, 21])
+        self.assertEqual(calendar.trading_days(days), [20180302, 20180304, 20180305, 20180309,
+                                                       20180311, 20181102])
+
+    def test_dates_from_arrow(self):
+        dates = as_dates([time.get('2018-01-02T00:00:00+00:00'), 20180103])
+        self.assertEqual(list(dates), [np.datetime64('2018-01-02'), np.datetime64('2018-01-03')])
+
+
+class TestResampling(unittest.TestCase):
+
+    def setUp(self):
+        self.days = [gappy_day(500, 30, seed, start='2018-01-0%dT00:00:00' % (seed + 2)) for seed in range(3)]
+
+    def test_grid_matches_reindex(self):
+        for fill, method, limit in (('ffill', 'ffill', None), ('bfill', 'bfill', None),
+                                    (None, None, None), ('ffill', 'ffill', 2), ('bfill', 'bfill', 1)):
+            days = resample_days(self.days, 'S30', fill=fill, limit=limit)
+            self.assertEqual(len(days), 3)
+            for day, resampled in zip(self.days, days):
+                self.assertEqual(len(resampled), 2880)
+                np.testing.assert_array_equal(resampled.to_numpy(), reindexed(day, 30, method, limit))
+
+    def test_coarser_grid_takes_the_candle_at_or_around_each_step(self):
+        fine = [gappy_day(5000, 5, seed) for seed in range(2)]
+        for fill, method in (('ffill', 'ffill'), ('bfill', 'bfill')):
+            days = resample_days(fine, 'S30', fill=fill)
+            for day, resampled in zip(fine, days):
+                np.testing.assert_array_equal(resampled.to_numpy(), reindexed(day, 30, method))
+
+    def test_index_and_mask(self):
+        days = resample_days(self.days, 'M1', fill='ffill', mark_missing=True)
+        day = days[0]
+        self.assertEqual(list(day.columns), price_names + ['missing'])
+        self.assertEqual(list(day.index[:3]), [0, 100, 200])
+        self.assertEqual(day.index[-1], 235900)
+        present = np.isin(day.index, self.days[0].index)
+        np.testing.assert_array_equal(day['missing'].to_numpy(), (~present).astype(float))
+
+    def test_days_do_not_fill_each_other(self):
+        second = self.days[1].iloc[5:]
+        days = resample_days([self.days[0], second], 'S30', fill='ffill')
+        self.assertTrue(np.isnan(days[1].to_numpy()[:5]).all())
+        days = resample_days([self.days[0].iloc[:-5], second], 'S30', fill='bfill')
+        self.assertTrue(np.isnan(days[0].to_numpy()[-5:]).all())
+
+    def test_sessions_bound_the_grid(self):
+        # Friday 2018-01-05 closes 22:00 UTC, Sunday 2018-01-07 opens then
+        friday = gappy_day(2880, 30, 7, start='2018-01-05T00:00:00')
+        sunday = gappy_day(2880, 30, 8, start='2018-01-07T00:00:00')
+        days = resample_days([friday, sunday], 'S30', dates=[20180105, 20180107],
+                             calendar=SessionCalendar(), fill='ffill')
+        self.assertEqual(len(days[0]), 22 * 120)
+        self.assertEqual(len(days[1]), 2 * 120)
+        self.assertEqual(days[1].index[0], 220000)
+        np.testing.assert_array_equal(days[1].to_numpy(),
+                                      reindexed(sunday, 30, 'ffill', start=22 * 3600))
+
+    def test_time_of_day(self):
+        np.testing.assert_array_equal(time_of_day([0, 59, 3600 + 61, 86399]), [0, 59, 10101, 235959])
+
+    def test_rejects_unknown_fill(self):
+        with self.assertRaises(ValueError):
+            resample_days(self.days, 'S30', fill='linear')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import numpy as np
+from oanda.ledger import Ledger
+from oanda.oanda_env import Account, OandaEnv, quote_signals
+from oanda.rewards import BatchFinishedTradeRewards, EasyTradeRewards, FinishedTradeRewards, batch_policies
+from oanda.synthetic import make_day
+from test_account import act, quotes
+
+
+class TestBatchRewards(unittest.TestCase):
+
+    def setUp(self):
+        self.accounts, self.steps = 5, 300
+        sessions = [quotes(self.steps, seed) for seed in range(self.accounts)]
+        self.markets = [[session[step] for session in sessions] for step in range(self.steps)]
+        self.quotes = np.array([[[market[name] for name in quote_signals] for market in step]
+                                for step in self.markets])
+        self.actions = np.random.default_rng(4).choice([0, 0, 0, 1, -1], (self.steps, self.accounts))
+
+    def scalar_rewards(self, policy_type):
+        # every account on its own Account and reward policy
+        accounts = [Account(1000, 20) for _ in range(self.accounts)]
+        policies = [policy_type() for _ in range(self.accounts)]
+        rewards = np.zeros((self.steps, self.accounts))
+        for step, markets in enumerate(self.markets):
+            for i, (account, policy, market) in enumerate(zip(accounts, policies, markets)):
+                act(account, market, int(self.actions[step, i]))
+                rewards[step, i] = policy.calc_reward(account)
+        return rewards
+
+    def test_steps_match_the_account_policies(self):
+        for policy_type, batch_type in batch_policies.items():
+            expected = self.scalar_rewards(policy_type)
+            ledger, policy = Ledger(self.accounts), batch_type(self.accounts)
+            for step in range(self.steps):
+                ledger.step(self.actions[step], self.quotes[step])
+                np.testing.assert_array_equal(policy.calc_rewards(ledger), expected[step],
+                                              err_msg=policy_type.__name__)
+
+    def test_trajectories_match_the_account_policies(self):
+        trajectory = Ledger(self.accounts).replay(self.actions, self.quotes)
+        for policy_type, batch_type in batch_policies.items():
+            rewards = batch_type(self.accounts).trajectory_rewards(trajectory)
+            self.assertEqual(rewards.shape, (self.steps, self.accounts))
+            np.testing.assert_array_equal(rewards, self.scalar_rewards(policy_type), err_msg=policy_type.__name__)
+
+    def test_reset_isolates_new_episodes(self):
+        ledger, policy = Ledger(2), BatchFinishedTradeRewards(2)
+        ledger.step([1, 1], self.quotes[0, :2])
+        policy.calc_rewards(ledger)
+        # account 0 starts a new episode, so closing the order it still sees pays nothing
+        policy.reset([0])
+        ledger.step([-1, -1], self.quotes[1, :2])
+        np.testing.assert_array_equal(policy.calc_rewards(ledger), [0.0, ledger.closed_pl[1]])
+        self.assertNotEqual(ledger.closed_pl[1], 0.0)
+
+        trajectory = Ledger(self.accounts).replay(self.actions, self.quotes)
+        expected = BatchFinishedTradeRewards(self.accounts).trajectory_rewards(trajectory)
+        starts = np.zeros(expected.shape, dtype=bool)
+        starts[np.flatnonzero(expected.any(axis=1))[0]] = True
+        self.assertTrue(expected[starts].any())
+        expected[starts] = 0.0
+        rewards = BatchFinishedTradeRewards(self.accounts).trajectory_rewards(trajectory, starts)
+        np.testing.assert_array_equal(rewards, expected)
+
+
+class TestEnvRewards(unittest.TestCase):
+
+    def test_every_episode_gets_its_own_policy(self):
+        env = OandaEnv(None)
+        env.set_days([make_day(100, seed=0), make_day(100, seed=1)])
+        first, second = env.next_episode(), env.next_episode()
+        self.assertIsInstance(first.reward_policy, FinishedTradeRewards)
+        self.assertIsNot(first.reward_policy, second.reward_policy)
+
+    def test_instances_are_copied_for_every_episode(self):
+        policy = EasyTradeRewards()
+        env = OandaEnv(None, reward_policy=policy)
+        env.set_days([make_day(100, seed=0), make_day(100, seed=1)])
+        first, second = env.next_episode(), env.next_episode()
+        self.assertIsInstance(first.reward_policy, EasyTradeRewards)
+        self.assertIsNot(first.reward_policy, policy)
+        self.assertIsNot(first.reward_policy, second.reward_policy)
+
+
+if __name__ == '__main__':
+    unittest.main()
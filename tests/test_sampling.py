@@ -0,0 +1,121 @@
+import unittest
+from functools import partial
+import numpy as np
+from oanda.episode_store import pack_days
+from oanda.oanda_env import OandaEnv
+from oanda.preprocessing import add_indicators
+from oanda.sampling import EpisodeSet, Same, Shuffled, Weighted, Curriculum, volatility
+from oanda.synthetic import make_day
+from oanda.vec_env import VecOandaEnv
+
+
+class TestEpisodeSet(unittest.TestCase):
+
+    def setUp(self):
+        self.days = pack_days([make_day(count, seed=count) for count in (100, 45, 130)])
+
+    def test_episodes_within_days(self):
+        episodes = EpisodeSet(self.days, 40, stride=20)
+        # 100 rows hold 4 episodes, 45 rows 1 and 130 rows 5
+        self.assertEqual(list(episodes.starts), [0, 20, 40, 60, 100, 145, 165, 185, 205, 225])
+        for episode in episodes:
+            self.assertEqual(len(episode), 40)
+        self.assertTrue(np.shares_memory(episodes[3].to_numpy(), self.days.data))
+        np.testing.assert_array_equal(episodes.array(5), self.days.array(2)[:40])
+
+    def test_episodes_across_days(self):
+        episodes = EpisodeSet(self.days, 100, cross_days=True)
+        self.assertEqual(list(episodes.starts), [0, 100])
+        np.testing.assert_array_equal(episodes[1].index[:45], self.days[1].index)
+
+    def test_volatility(self):
+        episodes = EpisodeSet(self.days, 30, stride=7)
+        expected = [np.std(np.diff(episodes[i]['ask_close'].to_numpy())) for i in range(len(episodes))]
+        np.testing.assert_allclose(episodes.volatility(), expected, rtol=1e-6, atol=1e-12)
+        np.testing.assert_allclose(volatility(episodes), expected, rtol=1e-6, atol=1e-12)
+
+        expected = [np.std(np.diff(day['ask_close'].to_numpy())) for day in self.days]
+        np.testing.assert_allclose(volatility(self.days), expected, rtol=1e-6, atol=1e-12)
+        with self.assertRaises(ValueError):
+            volatility(list(self.days))
+
+
+class TestSamplers(unittest.TestCase):
+
+    def setUp(self):
+        self.episodes = list(range(10))
+
+    def draw(self, sampler, count):
+        return np.array([sampler.next_index() for _ in range(count)])
+
+    def test_same_cycles_from_its_position(self):
+        self.assertEqual(list(self.draw(Same(self.episodes, position=8), 4)), [8, 9, 0, 1])
+
+    def test_shuffled_visits_every_episode_once_per_pass(self):
+        draws = self.draw(Shuffled(self.episodes, seed=1), 30).reshape(3, 10)
+        for one_pass in draws:
+            self.assertEqual(sorted(one_pass), self.episodes)
+        self.assertNotEqual(list(draws[0]), list(draws[1]))
+        other = self.draw(Shuffled(self.episodes, position=1, seed=1), 10)
+        self.assertNotEqual(list(draws[0]), list(other))
+
+    def test_weighted_follows_the_weights(self):
+        weights = np.arange(10.)
+        draws = self.draw(Weighted(self.episodes, weights, seed=2), 20000)
+        frequencies = np.bincount(draws, minlength=10) / len(draws)
+        self.assertEqual(frequencies[0], 0)
+        np.testing.assert_allclose(frequencies, weights / weights.sum(), atol=0.01)
+
+    def test_curriculum_starts_with_the_easiest(self):
+        difficulty = np.arange(10.)[::-1]
+        sampler = Curriculum(self.episodes, difficulty, seed=3, start=0.2, warmup=1000)
+        # the pool is the easiest 2 episodes at first and only 3 after 20 draws
+        early = self.draw(sampler, 20)
+        self.assertTrue(set(early) <= {7, 8, 9})
+        late = self.draw(sampler, 1000)
+        self.assertEqual(set(late), set(self.episodes))
+
+
+class TestEnvSampling(unittest.TestCase):
+
+    def setUp(self):
+        self.days = [add_indicators(make_day(count, seed=count)) for count in (150, 210, 180)]
+
+    def test_fixed_length_shuffled_episodes(self):
+        env = OandaEnv(None, episode_length=64, episode_stride=32, array_backed=True,
+                       episode_policy=partial(Shuffled, seed=0))
+        env.set_days(pack_days(self.days))
+        self.assertEqual(len(env.episodes), sum((len(day) - 64) // 32 + 1 for day in self.days))
+        starts = set()
+        for _ in range(len(env.episodes)):
+            day = env.next_trading_day()
+            self.assertEqual(len(day), 64)
+            starts.add(day['ask_close'].iloc[-1])
+        self.assertEqual(len(starts), len(env.episodes))
+
+    def test_episodes_must_fit_a_window(self):
+        with self.assertRaises(ValueError):
+            OandaEnv(None, episode_length=20, array_backed=True)
+        env = OandaEnv(None, window_size=16, episode_length=18, array_backed=True)
+        env.set_days(pack_days(self.days))
+        episode, done = env.next_episode(), False
+        while not done:
+            _, _, done = episode.step(0)
+
+    def test_curriculum_over_whole_days(self):
+        env = OandaEnv(None, episode_policy=partial(Curriculum, seed=0))
+        env.set_days(pack_days(self.days))
+        self.assertIn(len(env.next_trading_day()), [len(day) for day in self.days])
+
+    def test_vec_env_draws_from_the_policy(self):
+        env = OandaEnv(None, episode_length=64, episode_policy=partial(Curriculum, seed=0))
+        env.set_days(pack_days(self.days))
+        vec = VecOandaEnv(env, 4)
+        observations = vec.reset()
+        self.assertEqual(observations['market_state'].shape, (4, 32, 11))
+        for _ in range(40):
+            vec.step(np.zeros(4, dtype=int))
+
+
+if __name__ == '__main__':
+    unittest.main()
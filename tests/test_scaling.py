@@ -0,0 +1,88 @@
+import contextlib
+import io
+import unittest
+from functools import partial
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler, StandardScaler, RobustScaler
+from core.dataprep import DataPrep
+from core.scaling import min_max_scale, z_score_scale, robust_scale, get_scaler, scaler_name
+from oanda.oanda_env import ArrayEpisode, Episode
+from oanda.preprocessing import add_indicators
+from oanda.rewards import FinishedTradeRewards
+from oanda.synthetic import make_day
+
+
+def per_column(scaler, window):
+    return np.concatenate([scaler.fit_transform(window[:, [j]]) for j in range(window.shape[1])], axis=1)
+
+
+class TestScaling(unittest.TestCase):
+
+    def setUp(self):
+        self.data = np.random.default_rng(0).normal(size=(5, 32, 4)).cumsum(axis=1)
+        # constant columns must come out finite
+        self.data[1, :, 2] = 5.0
+        self.data[3, :, 0] = 0.0
+
+    def test_matches_sklearn_per_window_and_column(self):
+        for scale, scaler in [(min_max_scale, MinMaxScaler()), (z_score_scale, StandardScaler()),
+                              (robust_scale, RobustScaler())]:
+            expected = np.stack([per_column(scaler, window) for window in self.data])
+            result = scale(self.data, axis=1)
+            self.assertTrue(np.isfinite(result).all())
+            if scale is min_max_scale:
+                np.testing.assert_array_equal(result, expected)
+            else:
+                np.testing.assert_allclose(result, expected, rtol=1e-12, atol=1e-12)
+            np.testing.assert_array_equal(scale(self.data[2], axis=0), result[2])
+
+    def test_writes_into_caller_buffers(self):
+        for scale in (min_max_scale, z_score_scale, robust_scale):
+            expected = scale(self.data, axis=1)
+            buffer = self.data.copy()
+            self.assertIs(scale(buffer, axis=1, out=buffer), buffer)
+            np.testing.assert_array_equal(buffer, expected)
+
+            out = np.empty((10, 32, 4))
+            scale(self.data, axis=1, out=out[2:7])
+            np.testing.assert_array_equal(out[2:7], expected)
+
+    def test_scaler_names(self):
+        self.assertIs(get_scaler('zscore'), z_score_scale)
+        self.assertIs(get_scaler(robust_scale), robust_scale)
+        with self.assertRaises(ValueError):
+            get_scaler('log')
+
+    def test_cache_names_tell_scalers_apart(self):
+        self.assertEqual(scaler_name('robust'), 'robust')
+        self.assertEqual(scaler_name(robust_scale), 'robust')
+        self.assertEqual(scaler_name(per_column), per_column.__module__ + '.per_column')
+        named = partial(robust_scale)
+        named.name = 'robust_partial'
+        self.assertEqual(scaler_name(named), 'robust_partial')
+        for unnamed in (lambda data, axis=0, out=None: data, partial(robust_scale)):
+            with self.assertRaises(ValueError):
+                scaler_name(unnamed)
+        with self.assertRaises(ValueError):
+            scaler_name('log')
+
+    def test_episodes_and_windows_use_the_selected_scaler(self):
+        day = add_indicators(make_day(200, seed=4))
+        windows = DataPrep([day], scaler='zscore').make_windows()
+        np.testing.assert_allclose(windows.mean(axis=1), 0, atol=1e-9)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            frame_episode = Episode(day, 32, FinishedTradeRewards(), scaler='robust')
+            array_episodes = [ArrayEpisode(day, 32, FinishedTradeRewards(), scaler='robust'),
+                              ArrayEpisode(day, 32, FinishedTradeRewards(), signal_mode='exact', scaler='robust')]
+        for action in (1, 0, 0, -1, 0):
+            expected, _, _ = frame_episode.step(action)
+            for episode in array_episodes:
+                state, _, _ = episode.step(action)
+                np.testing.assert_allclose(state['market_state'], expected['market_state'], atol=1e-12)
+                np.testing.assert_allclose(state['env_state'], expected['env_state'], atol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
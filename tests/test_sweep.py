@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from analysis.backtest import sweep
+from analysis.sweep import SweepRunner, backtest_trial, grid, random_search, trial_id
+from oanda.synthetic import make_day
+
+
+# set while a sweep should stop half way
+interrupt = False
+
+
+def interrupted_trial(days, params):
+    if interrupt and params['tp'] > 0.001:
+        raise RuntimeError('interrupted')
+    return backtest_trial(days, params)
+
+
+class TestSweepRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.days = [make_day(1500, seed=seed) for seed in range(3)]
+        self.trials = grid(fast=[5, 13], slow=[35], tp=[0.0005, 0.0009, 0.0012], sl=[0.0003])
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def test_pool_results_match_the_backtest_sweep(self):
+        runner = SweepRunner(self.days, self.temp.name, processes=2, flush_every=2)
+        results = runner.run(self.trials).sort_values(['fast', 'tp']).reset_index(drop=True)
+        expected = sweep(self.days, tps=(0.0005, 0.0009, 0.0012), sls=(0.0003,), spans=((5, 35), (13, 35)))
+        self.assertEqual(len(results), 6)
+        self.assertGreater(len(runner.parts()), 1)
+        for column in ('trades', 'take_profits', 'stop_losses', 'wins'):
+            np.testing.assert_array_equal(results[column].to_numpy(), expected[column].to_numpy())
+        np.testing.assert_allclose(results['realized'].to_numpy(), expected['realized'].to_numpy())
+
+    def test_interrupted_sweeps_resume(self):
+        global interrupt
+        runner = SweepRunner(self.days, self.temp.name, evaluate=interrupted_trial, processes=0, flush_every=1)
+        interrupt = True
+        try:
+            with self.assertRaises(RuntimeError):
+                runner.run(self.trials)
+        finally:
+            interrupt = False
+        finished = runner.completed()
+        self.assertTrue(finished)
+        self.assertTrue(all(params['tp'] < 0.001 for params in runner.results().to_dict('records')))
+
+        runner = SweepRunner(os.path.join(self.temp.name, 'days.bin'), self.temp.name,
+                             evaluate=interrupted_trial, processes=0)
+        self.assertEqual(set(runner.pending(self.trials)), {trial_id(t) for t in self.trials} - finished)
+        results = runner.run(self.trials)
+        self.assertEqual(sorted(results['trial_id']), sorted(trial_id(t) for t in self.trials))
+        self.assertEqual(runner.pending(self.trials), {})
+
+    def test_resuming_needs_the_same_episodes_and_evaluator(self):
+        SweepRunner(self.days, self.temp.name, processes=0).run(self.trials[:2])
+        path = os.path.join(self.temp.name, 'days.bin')
+        before = os.stat(path).st_mtime_ns
+        with self.assertRaises(ValueError):
+            SweepRunner(self.days[:2], self.temp.name, processes=0)
+        self.assertEqual(os.stat(path).st_mtime_ns, before)
+        with self.assertRaises(ValueError):
+            SweepRunner(path, self.temp.name, evaluate=interrupted_trial, processes=0)
+        self.assertEqual(len(SweepRunner(self.days, self.temp.name, processes=0).pending(self.trials)), 4)
+
+    def test_random_search_stays_in_the_space(self):
+        trials = random_search({'fast': (5, 13), 'tp': (0.0003, 0.0015), 'use_extremes': [True, False]}, 50)
+        self.assertEqual(len(trials), 50)
+        self.assertTrue(all(5 <= t['fast'] <= 13 and isinstance(t['fast'], int) for t in trials))
+        self.assertTrue(all(0.0003 <= t['tp'] <= 0.0015 for t in trials))
+        self.assertEqual(trials, random_search({'fast': (5, 13), 'tp': (0.0003, 0.0015),
+                                                'use_extremes': [True, False]}, 50))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import numpy as np
+from oanda.oanda_env import OandaEnv, ArrayEpisode
+from oanda.preprocessing import add_indicators
+from oanda.rewards import FinishedTradeRewards, batch_policies
+from oanda.synthetic import make_day
+from oanda.vec_env import VecOandaEnv
+
+
+class TestVecOandaEnv(unittest.TestCase):
+
+    def setUp(self):
+        self.days = [add_indicators(make_day(count, seed=count)) for count in (110, 130, 150)]
+        self.env = OandaEnv(None)
+        self.env.episodes = self.days
+
+    def test_batch_matches_single_episodes(self):
+        vec = VecOandaEnv(self.env, 3)
+        observations = vec.reset()
+        self.assertEqual(observations['market_state'].shape, (3, 32, 11))
+        self.assertEqual(observations['env_state'].shape, (3, 32, 4))
+
+        singles = [ArrayEpisode(day, 32, FinishedTradeRewards()) for day in self.days]
+        actions = np.random.default_rng(0).choice([0, 1, -1], size=(40, 3))
+        for batch in actions:
+            observations, rewards, dones, infos = vec.step(batch)
+            for i, episode in enumerate(singles):
+                state, reward, done = episode.step(batch[i])
+                np.testing.assert_array_equal(observations['market_state'][i], state['market_state'])
+                np.testing.assert_array_equal(observations['env_state'][i], state['env_state'])
+                self.assertEqual(rewards[i], reward)
+                self.assertEqual(dones[i], done)
+
+    def test_finished_episodes_restart_from_the_pool(self):
+        vec = VecOandaEnv(self.env, 2)
+        vec.reset()
+        first = vec.episodes[0]
+        for _ in range(first.length - 1):
+            observations, rewards, dones, infos = vec.step(np.zeros(2, dtype=int))
+        self.assertTrue(dones[0])
+        self.assertIn('terminal_observation', infos[0])
+        self.assertIsNot(vec.episodes[0], first)
+        self.assertIs(vec.episodes[0].trading_day, self.days[2])
+        self.assertEqual(vec.episodes[0].current_step, 1)
+        fresh = vec.observe([vec.episodes[0]])
+        np.testing.assert_array_equal(observations['market_state'][0], fresh['market_state'][0])
+
+    def test_reward_state_is_per_episode(self):
+        vec = VecOandaEnv(self.env, 2)
+        vec.reset()
+        self.assertIsNot(vec.episodes[0].reward_policy, vec.episodes[1].reward_policy)
+
+    def test_batch_policies_match_per_episode_policies(self):
+        actions = np.random.default_rng(1).choice([0, 0, 1, -1], size=(200, 3))
+        for policy_type, batch_type in batch_policies.items():
+            envs = [OandaEnv(None), OandaEnv(None)]
+            for env in envs:
+                env.episodes = self.days
+            single, batched = VecOandaEnv(envs[0], 3, policy_type), VecOandaEnv(envs[1], 3, batch_type)
+            single.reset()
+            batched.reset()
+            restarts = 0
+            for batch in actions:
+                _, expected, dones, _ = single.step(batch)
+                _, rewards, _, _ = batched.step(batch)
+                np.testing.assert_array_equal(rewards, expected, err_msg=policy_type.__name__)
+                restarts += dones.sum()
+            self.assertGreater(restarts, 3)
+            self.assertIsNone(batched.episodes[0].reward_policy)
+
+
+if __name__ == '__main__':
+    unittest.main()
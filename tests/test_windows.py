@@ -0,0 +1,55 @@
+import unittest
+import numpy as np
+import pandas as pd
+from core.dataprep import DataPrep, Denoiser
+from core.windows import WindowEngine
+from oanda.preprocessing import add_indicators, denoise_frame, scale_frame, make_windows
+from oanda.synthetic import make_day
+
+
+class TestWindowEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.days = [add_indicators(make_day(count, seed=seed)) for seed, count in enumerate((160, 40, 230))]
+
+    def test_preprocessing_windows_match_window_by_window(self):
+        raw_signals = ['ask_close','bid_close','ask_high','bid_high','ask_low','bid_low']
+        drop_signals = raw_signals + ['ask_open', 'bid_open']
+        expected = []
+        for day in self.days:
+            for j in range(1, len(day) - 64, 16):
+                window_x = day.iloc[j-1:j + 64]
+                window_smooth_diff = denoise_frame(window_x[raw_signals]).diff()
+                window_x = pd.concat([window_x, window_smooth_diff], axis=1).drop(drop_signals, axis=1).dropna()
+                expected.append(scale_frame(window_x))
+        windows = make_windows(self.days, window_size=64)
+        self.assertEqual(windows.shape, (len(expected), 64, 11))
+        np.testing.assert_array_equal(windows, np.array(expected))
+
+    def test_batches_stream_the_same_windows(self):
+        prep = DataPrep(self.days)
+        windows = prep.make_windows(window_size=32, step_size=8)
+        batches = list(prep.iter_windows(7, window_size=32, step_size=8))
+        self.assertTrue(all(len(batch) == 7 for batch in batches[:-1]))
+        np.testing.assert_array_equal(np.concatenate(batches), windows)
+
+        batches = list(prep.iter_windows(7, window_size=32, step_size=8, drop_last=True))
+        self.assertEqual(sum(len(batch) for batch in batches), len(windows) // 7 * 7)
+
+    def test_day_windows_are_strided_views(self):
+        engine = WindowEngine(Denoiser(), window_size=32, step_size=16)
+        day = self.days[0]
+        windows = engine.day_windows(day)
+        self.assertEqual(windows.shape, (engine.count(day), 33, day.shape[1]))
+        self.assertFalse(windows.flags.owndata)
+        np.testing.assert_array_equal(windows[2], day.to_numpy()[32:65])
+
+    def test_missing_values_are_rejected(self):
+        day = self.days[0].copy()
+        day.iloc[50, 0] = np.nan
+        with self.assertRaises(ValueError):
+            DataPrep([day]).make_windows()
+
+
+if __name__ == '__main__':
+    unittest.main()